@@ -1,24 +1,80 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import (
+    Flask, render_template, request, jsonify, session, Response, stream_with_context, g, has_request_context, url_for
+)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from datetime import datetime, timedelta
 import os
 import requests
 import json
 import logging
+import time
+import base64
+import uuid
+import atexit
+import queue
+import signal
+import sys
+import threading
+from functools import partial, wraps
+
+from assets import StaticAssets, build_assets
+from config import load_settings
+from llm_client import LLMClient, LLMQueueFull, LLMDeadlineExceeded, LLMCircuitOpen, LLMCancelled
+from llm_scheduler import BACKGROUND, INTERACTIVE, RequestScope, current_scope, disconnect_probe, request_scope
+from response_cache import ResponseCache, make_cache_key
+from chat_jobs import ChatJobQueue, JobQueueFull
+from chat_panel import ChatPanel
+from model_monitor import ModelMonitor
+from notes_search import ensure_note_search, search_notes
+from notes_import import ImportFormatError, import_notes, iter_json_notes, iter_ndjson_notes
+from exports import YIELD_PER, iter_row_dicts, iter_ndjson, iter_csv, iter_gzip, iter_encoded
+from recurrence import InvalidRule, RecurrenceRule
+from conversation_memory import (
+    ConversationState, SummaryWorker, build_summary_prompt, estimate_tokens, fit_history, fit_knowledge,
+    format_history, format_knowledge
+)
+from semantic_index import SemanticIndex
+from metrics import REGISTRY, Counter, Gauge, Histogram
+from change_log import (
+    ENTITIES as SYNC_ENTITIES, changes_since, collection_version, current_token, ensure_change_log, prune_tombstones
+)
+from http_cache import collection_etag, compress_response, is_not_modified, not_modified_response, set_validators
+from serialization import payload_response, projection, rows_to_dicts
+from storage import SQLITE_PRAGMAS, WriteBehindQueue, apply_sqlite_pragmas, sqlite_engine_options
+from task_extraction import (
+    build_extraction_prompt, extract_tasks, merge_tasks, parse_extraction_response, task_key, task_priority
+)
 
 # Konfiguracja logowania
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mentors.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Ustawienia ze zmiennych środowiskowych (config.py) - create_app(config) może je nadpisać
+SETTINGS = load_settings()
+
+# Profil SQLite dla wielu wątków serwera - pragmy na każdym połączeniu, pula połączeń
+DATABASE = {
+    'pragmas': dict(SQLITE_PRAGMAS),
+    'pool_size': 10,  # Stałe połączenia w puli (wątki WSGI + wątki w tle)
+    'max_overflow': 20,  # Dodatkowe połączenia przy szczycie
+    'pool_timeout': 30,  # Sekundy czekania na wolne połączenie
+    # Zapis wiadomości czatu partiami w tle (CHAT_WRITE_BEHIND=1) - jedna transakcja na partię
+    'write_behind': False,
+    'write_batch': 200,  # Maksymalna liczba wiadomości w jednej transakcji
+    'write_delay': 0.05,  # Sekundy zbierania partii od pierwszej wiadomości
+    'write_max_pending': 5000  # Pełna kolejka blokuje zapisujących
+}
+
 # Utworzenie folderu instance jeśli nie istnieje
 os.makedirs('instance', exist_ok=True)
 
-db = SQLAlchemy(app)
+# Rozszerzenie bez aplikacji - create_app() wiąże je z bazą z DATABASE_URL
+db = SQLAlchemy()
 
 # Modele bazy danych
 class Mentor(db.Model):
@@ -35,8 +91,28 @@ class ChatMessage(db.Model):
     user_message = db.Column(db.Text, nullable=False)
     mentor_response = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Kiedy zadania z odpowiedzi zostały wyciągnięte (NULL = jeszcze nie)
+    tasks_extracted_at = db.Column(db.DateTime)
     
     mentor = db.relationship('Mentor', backref=db.backref('messages', lazy=True))
+    
+    # Historia czatu jest zawsze czytana per mentor w kolejności czasu
+    __table_args__ = (
+        db.Index('ix_chat_message_mentor_timestamp', 'mentor_id', 'timestamp'),
+    )
+
+class ConversationMemory(db.Model):
+    """Pamięć rozmowy z mentorem - podsumowanie starszych wymian i kontekst Ollama"""
+    id = db.Column(db.Integer, primary_key=True)
+    mentor_id = db.Column(db.Integer, db.ForeignKey('mentor.id'), nullable=False, unique=True)
+    summary = db.Column(db.Text, default='')
+    # Ostatnia wiadomość ujęta w podsumowaniu - nowsze trafiają do okna
+    summarized_until_id = db.Column(db.Integer, default=0)
+    # Tokeny kontekstu Ollama (JSON) po wiadomości context_message_id
+    context = db.Column(db.Text)
+    context_model = db.Column(db.String(100))
+    context_message_id = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,47 +121,352 @@ class Task(db.Model):
     priority = db.Column(db.String(20), default='medium')
     status = db.Column(db.String(20), default='pending')
     due_date = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     completed_at = db.Column(db.DateTime)
     mentor_id = db.Column(db.Integer, db.ForeignKey('mentor.id'))
+    # Odpowiedź mentora, z której zadanie zostało wyciągnięte automatycznie
+    source_message_id = db.Column(db.Integer, db.ForeignKey('chat_message.id'), index=True)
     
     mentor = db.relationship('Mentor', backref=db.backref('tasks', lazy=True))
 
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    title = db.Column(db.String(200), nullable=False, index=True)
     content = db.Column(db.Text)
     category = db.Column(db.String(50), default='general')
     tags = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    start_date = db.Column(db.DateTime, nullable=False)
-    end_date = db.Column(db.DateTime)
+    start_date = db.Column(db.DateTime, nullable=False, index=True)
+    end_date = db.Column(db.DateTime, index=True)
     event_type = db.Column(db.String(50), default='meeting')
+    # Reguła powtarzania (np. FREQ=WEEKLY;INTERVAL=2) - seria zapisana jako jeden wiersz
+    recurrence = db.Column(db.String(200))
+    # Górna granica końca ostatniego wystąpienia serii (NULL = seria bez końca)
+    recurrence_until = db.Column(db.DateTime, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-# Konfiguracja modeli językowych
+# Konfiguracja modeli językowych (adres, modele i limity - z ustawień, patrz apply_settings)
 LANGUAGE_MODELS = {
     'ollama': {
-        'url': 'http://localhost:11434/api/generate',
-        'model': 'llama3.2:latest',  # Model który na pewno istnieje
-        'backup_models': ['llama2:latest']  # Uproszczona lista backup
+        'base_url': None,  # OLLAMA_URL
+        'url': None,  # {OLLAMA_URL}/api/generate
+        'model': None,  # OLLAMA_MODEL - model który na pewno istnieje
+        'backup_models': [],  # OLLAMA_BACKUP_MODELS
+        'max_in_flight': 2,  # Równoległe generacje na model (LLM_MAX_IN_FLIGHT, w każdym procesie)
+        'max_queue': 8,  # Oczekujący ponad limit dostają 429 (LLM_MAX_QUEUE)
+        'max_queue_per_session': 2,  # Oczekujące zapytania jednej sesji (sesje obsługiwane na zmianę)
+        'promote_after': 30,  # Sekundy, po których zadanie w tle wchodzi przed interaktywne
+        'request_timeout': 30,  # Termin na całe żądanie, wszystkie próby (LLM_REQUEST_TIMEOUT)
+        'shutdown_timeout': 30,  # Ile zamykany proces czeka na trwające generacje (LLM_SHUTDOWN_TIMEOUT)
+        'failure_threshold': 3,  # Błędy z rzędu otwierające bezpiecznik modelu
+        'reset_timeout': 30,  # Po ilu sekundach bezpiecznik przepuszcza próbę
+        'hedge_after': None,  # Sekundy po których startuje backup model (None = wyłączone)
+        'keep_alive': '30m',  # Jak długo Ollama trzyma model w pamięci po użyciu (OLLAMA_KEEP_ALIVE)
+        'embedding_model': None,  # OLLAMA_EMBEDDING_MODEL - embeddingi do wyszukiwania semantycznego
+        'monitor_interval': 15  # Co ile sekund monitor sprawdza dostępne modele
     }
 }
 
-def call_ollama(prompt, model=None, max_retries=3, mentor_name=None):
-    """Wywołanie API Ollama z obsługą błędów i fallback"""
+# Wyszukiwanie semantyczne - mentorzy widzą pasujące notatki, zadania i wcześniejsze rozmowy
+RETRIEVAL = {
+    'enabled': True,  # RETRIEVAL_ENABLED
+    'index_path': os.path.join('instance', 'semantic_index'),  # Pliki .f32 (macierz) i .json
+    'batch_size': 32,  # Teksty na jedno wywołanie /api/embed
+    'poll_interval': 5,  # Co ile sekund indeks sprawdza kolejkę zmian
+    'top_k': 4,
+    'min_score': 0.35,  # Minimalne podobieństwo kosinusowe trafienia
+    'query_timeout': 2,  # Najdłuższe czekanie (s) na embedding pytania - liczone w termin żądania
+    'token_budget': 384  # Część budżetu promptu na znalezione fragmenty
+}
+
+# Zasoby statyczne z hashem treści w nazwie (flask build-assets) - cache przeglądarki bez rewalidacji
+ASSETS = {
+    'enabled': True,  # STATIC_ASSETS - False = pliki źródłowe ze static (praca nad CSS/JS)
+    'output_dir': os.path.join(app.static_folder, 'dist'),
+    'image_widths': (96, 160, 240),  # Zdjęcia mentorów: karty 120 px, awatary 50-80 px, ekrany 2x
+    'max_age': 365 * 24 * 3600  # Cache-Control: max-age dla plików z hashem (immutable)
+}
+
+# Wspólny klient Ollama, monitor modeli i indeks semantyczny - tworzy je create_app()
+llm_client = None
+model_monitor = None
+semantic_index = None
+
+def build_llm_backend():
+    """Klient Ollama (pula połączeń keep-alive, kolejka do modelu), monitor modeli i indeks semantyczny"""
+    global llm_client, model_monitor, semantic_index
+    ollama = LANGUAGE_MODELS['ollama']
+    llm_client = LLMClient(
+        ollama['base_url'],
+        max_in_flight=ollama['max_in_flight'],
+        max_queue=ollama['max_queue'],
+        request_timeout=ollama['request_timeout'],
+        failure_threshold=ollama['failure_threshold'],
+        reset_timeout=ollama['reset_timeout'],
+        max_per_session=ollama['max_queue_per_session'],
+        promote_after=ollama['promote_after']
+    )
+    
+    # Monitor modeli - health z pamięci, rozgrzewanie modeli po starcie
+    model_monitor = ModelMonitor(
+        llm_client,
+        [ollama['model']] + ollama['backup_models'],
+        interval=ollama['monitor_interval'],
+        keep_alive=ollama['keep_alive']
+    )
+    
+    semantic_index = SemanticIndex(
+        partial(llm_client.embed, ollama['embedding_model']),
+        RETRIEVAL['index_path'],
+        ollama['embedding_model'],
+        batch_size=RETRIEVAL['batch_size'],
+        poll_interval=RETRIEVAL['poll_interval']
+    )
+
+# Metryki (/metrics) - opóźnienia per endpoint, zapytania SQL i statystyki generacji z Ollama
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Czas obsługi żądania (dla strumieni - do końca strumienia)',
+    ['method', 'route', 'status']
+)
+DB_QUERY_DURATION = Histogram('db_query_duration_seconds', 'Czas pojedynczego zapytania SQL')
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request', 'Liczba zapytań SQL na żądanie', ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+DB_TIME_PER_REQUEST = Histogram('db_time_per_request_seconds', 'Łączny czas zapytań SQL w żądaniu', ['route'])
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    'llm_time_to_first_token_seconds', 'Czas do pierwszego tokenu odpowiedzi strumieniowej', ['model']
+)
+LLM_GENERATION_DURATION = Histogram(
+    'llm_generation_duration_seconds', 'Czas całej generacji po stronie aplikacji', ['model', 'mode']
+)
+LLM_PROMPT_EVAL_DURATION = Histogram(
+    'llm_prompt_eval_duration_seconds', 'Czas ewaluacji promptu w Ollama (prompt_eval_duration)', ['model']
+)
+LLM_EVAL_DURATION = Histogram(
+    'llm_eval_duration_seconds', 'Czas generowania tokenów w Ollama (eval_duration)', ['model']
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    'llm_tokens_per_second', 'Szybkość generowania (eval_count / eval_duration)', ['model'],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150, 200)
+)
+LLM_PROMPT_TOKENS = Counter('llm_prompt_tokens_total', 'Tokeny promptu ewaluowane przez Ollama', ['model'])
+LLM_GENERATED_TOKENS = Counter('llm_generated_tokens_total', 'Tokeny wygenerowane przez Ollama', ['model'])
+LLM_RETRIES = Counter('llm_retries_total', 'Ponowienia wywołania modelu głównego', ['mentor'])
+LLM_BACKUP_SWITCHES = Counter('llm_backup_switches_total', 'Przełączenia na model zapasowy', ['mentor', 'model'])
+LLM_FALLBACKS = Counter('llm_fallback_responses_total', 'Odpowiedzi awaryjne zamiast odpowiedzi modelu', ['mentor'])
+
+def _llm_queue_values(field):
+    return lambda: {(model, ): stats[field] for model, stats in llm_client.stats().items()}
+
+LLM_IN_FLIGHT = Gauge('llm_in_flight', 'Trwające generacje per model', ['model'], collect=_llm_queue_values('in_flight'))
+LLM_WAITING = Gauge('llm_waiting', 'Żądania czekające na miejsce per model', ['model'], collect=_llm_queue_values('waiting'))
+
+def mentor_label(mentor_name):
+    return mentor_name or 'none'
+
+def record_generation_stats(model, stats, mode, started):
+    """Statystyki generacji z końcowej odpowiedzi Ollama (czasy w nanosekundach)"""
+    LLM_GENERATION_DURATION.observe(time.monotonic() - started, model=model, mode=mode)
+    if stats.get('prompt_eval_count'):
+        LLM_PROMPT_TOKENS.inc(stats['prompt_eval_count'], model=model)
+    if stats.get('prompt_eval_duration'):
+        LLM_PROMPT_EVAL_DURATION.observe(stats['prompt_eval_duration'] / 1e9, model=model)
+    if stats.get('eval_count'):
+        LLM_GENERATED_TOKENS.inc(stats['eval_count'], model=model)
+    if stats.get('eval_duration'):
+        LLM_EVAL_DURATION.observe(stats['eval_duration'] / 1e9, model=model)
+        if stats.get('eval_count'):
+            LLM_TOKENS_PER_SECOND.observe(stats['eval_count'] / (stats['eval_duration'] / 1e9), model=model)
+
+@event.listens_for(Engine, 'connect')
+def _configure_connection(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection, DATABASE['pragmas'])
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics['queries'] += 1
+        g.request_metrics['db_time'] += elapsed
+
+@app.before_request
+def start_request_metrics():
+    g.request_metrics = {'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0}
+
+@app.after_request
+def record_request_metrics(response):
+    state = g.get('request_metrics')
+    if state is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    status = str(response.status_code)
+    
+    # Zamknięcie odpowiedzi następuje po wysłaniu całego strumienia
+    def record():
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - state['started'], method=method, route=route, status=status)
+        DB_QUERIES_PER_REQUEST.observe(state['queries'], route=route)
+        DB_TIME_PER_REQUEST.observe(state['db_time'], route=route)
+    
+    response.call_on_close(record)
+    return response
+
+# Cache odpowiedzi - odpowiedź zależy tylko od mentora, pytania, modelu i parametrów
+RESPONSE_CACHE = {
+    'max_entries': 1000,  # Wpisy w pamięci (LRU)
+    'ttl': 24 * 3600,  # Ważność odpowiedzi w sekundach
+    'sqlite_path': os.path.join('instance', 'response_cache.db'),  # None = tylko pamięć
+    'sqlite_max_entries': 20000
+}
+
+response_cache = ResponseCache(**RESPONSE_CACHE)
+
+# Parametry generowania wspólne dla trybu blokującego i strumieniowego
+OLLAMA_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "num_predict": 200,  # Krótsze odpowiedzi
+    "repeat_penalty": 1.1,
+    "num_ctx": 2048  # Miejsce na historię rozmowy w ramach budżetu poniżej
+}
+
+# Pamięć rozmowy - stały rozmiar promptu niezależnie od długości historii
+CONVERSATION_MEMORY = {
+    'window_turns': 6,  # Najnowsze wymiany wstawiane do promptu dosłownie
+    'prompt_token_budget': 1536,  # Limit tokenów promptu (num_ctx - num_predict - zapas)
+    'summary_token_budget': 256,  # Część budżetu na podsumowanie starszych wymian
+    'summarize_after': 4,  # Tyle wymian spoza okna uruchamia aktualizację podsumowania
+    'summary_batch': 20,  # Maksymalnie tyle wymian na jedną aktualizację
+    'summary_sentences': 5,
+    'reuse_context': True  # Kontynuacja z kontekstu Ollama zamiast ponownej ewaluacji historii
+}
+
+# Fallback responses dla każdego mentora
+FALLBACK_RESPONSES = {
+    'Anna': "Przepraszam za problemy techniczne. Spróbuj zadać pytanie ponownie - jestem tutaj aby Ci pomóc w rozwoju osobistym.",
+    'Marek': "Mam problemy z połączeniem. Spróbuj ponownie za chwilę - chętnie pomogę Ci z treningiem i dietą.",
+    'Kasia': "Chwilowe problemy techniczne. Odśwież stronę i spróbuj ponownie - jestem gotowa na rozmowę o biznesie!",
+    'David': "System ma problemy, ale to nie powód do poddawania się. Spróbuj ponownie - razem przełamiemy każdą barierę!"
+}
+
+DEFAULT_FALLBACK_RESPONSE = "Przepraszam, mam obecnie problemy techniczne. Spróbuj ponownie za chwilę."
+
+def get_fallback_response(prompt):
+    """Odpowiedź awaryjna dopasowana do mentora z promptu"""
+    # Sprawdź który mentor odpowiada na podstawie kontekstu
+    for mentor_name in FALLBACK_RESPONSES.keys():
+        if mentor_name in prompt:
+            return FALLBACK_RESPONSES[mentor_name]
+    
+    return DEFAULT_FALLBACK_RESPONSE
+
+def is_fallback_response(text):
+    """Czy tekst jest odpowiedzią awaryjną (takich nie zapisujemy w cache)"""
+    return text == DEFAULT_FALLBACK_RESPONSE or text in FALLBACK_RESPONSES.values()
+
+def _candidate_data(data, candidate, context):
+    """Dane żądania dla modelu - kontekst Ollama tylko dla modelu, który go wytworzył"""
+    if context and candidate == context['model']:
+        return dict(data, model=candidate, prompt=context['prompt'], context=context['tokens'])
+    return dict(data, model=candidate)
+
+def _generate_text(data, model, deadline, context=None, result=None):
+    """Jedna próba generacji na wskazanym modelu - tekst odpowiedzi albo None"""
+    started = time.monotonic()
+    response = llm_client.generate(_candidate_data(data, model, context), deadline=deadline)
+    
+    if response.status_code != 200:
+        logger.warning(f"Błąd HTTP {response.status_code} od {model}: {response.text}")
+        return None
+    
+    body = response.json()
+    if 'response' not in body:
+        logger.warning(f"Brak pola 'response' w odpowiedzi: {body}")
+        return None
+    
+    logger.info(f"Sukces: Otrzymano odpowiedź od {model}")
+    record_generation_stats(model, body, 'blocking', started)
+    # Przy zapytaniach zabezpieczających zapisuje pierwsza zakończona odpowiedź
+    if result is not None and 'model' not in result:
+        result.update(model=model, context=body.get('context'))
+    return body['response'].strip()
+
+def _call_sequential(data, candidates, max_retries, deadline, context=None, result=None, mentor_name=None):
+    """Kolejne modele po sobie - modele z otwartym bezpiecznikiem są pomijane"""
+    for index, candidate in enumerate(candidates):
+        if index > 0:
+            logger.info(f"Przełączanie na backup model: {candidate}")
+            LLM_BACKUP_SWITCHES.inc(mentor=mentor_label(mentor_name), model=candidate)
+        
+        # Ponawiamy tylko model główny - powtarzające się błędy otworzą bezpiecznik
+        attempts = max_retries + 1 if index == 0 else 1
+        for attempt in range(attempts):
+            if attempt > 0:
+                LLM_RETRIES.inc(mentor=mentor_label(mentor_name))
+            try:
+                logger.info(f"Próba {attempt + 1}: Wywołanie Ollama z modelem {candidate}")
+                text = _generate_text(data, candidate, deadline, context, result)
+                if text is not None:
+                    return text
+            except LLMCircuitOpen as e:
+                logger.warning(f"Bezpiecznik otwarty dla {candidate} - pomijam (próba za {e.retry_in:.0f}s)")
+                break
+            except requests.exceptions.ConnectionError:
+                logger.warning(f"Błąd połączenia z Ollama (próba {attempt + 1}, model {candidate})")
+            except requests.exceptions.Timeout:
+                logger.warning(f"Timeout połączenia z Ollama (próba {attempt + 1}, model {candidate})")
+    
+    return None
+
+def _call_hedged(data, candidates, hedge_after, deadline, context=None, result=None, mentor_name=None):
+    """Backup model startuje po `hedge_after` s - wygrywa pierwsza udana odpowiedź"""
+    outcome = result if result is not None else {}
+    calls = [partial(_generate_text, data, candidate, deadline, context, outcome) for candidate in candidates]
+    try:
+        text = llm_client.hedged(calls, hedge_after, deadline)
+        if text is not None and outcome.get('model') not in (None, candidates[0]):
+            LLM_BACKUP_SWITCHES.inc(mentor=mentor_label(mentor_name), model=outcome['model'])
+        return text
+    except (LLMCircuitOpen, requests.exceptions.RequestException) as e:
+        logger.warning(f"Zapytania zabezpieczające nieudane: {str(e)}")
+        return None
+
+def available_candidates(model):
+    """Model główny i backup - bez modeli, których monitor nie widzi w Ollama"""
+    backup_models = LANGUAGE_MODELS['ollama']['backup_models']
+    candidates = [model] + [m for m in backup_models if m != model]
+    # Nieznany stan (None) nie wyklucza modelu - decyduje wtedy bezpiecznik
+    return [m for m in candidates if model_monitor.is_available(m) is not False]
+
+def call_ollama(prompt, model=None, max_retries=1, mentor_name=None, deadline=None, context=None, result=None):
+    """Wywołanie API Ollama z bezpiecznikiem per model i fallback.
+    
+    Gdy Ollama nie działa, bezpieczniki są otwarte i odpowiedź awaryjna
+    wraca od razu. Wszystkie próby dzielą jeden termin (deadline);
+    przepełniona kolejka modelu kończy się wyjątkiem LLMQueueFull.
+    `context` ({'model', 'tokens', 'prompt'}) kontynuuje rozmowę z kontekstu
+    Ollama, a `result` dostaje model i nowy kontekst udanej odpowiedzi.
+    """
     
     if model is None:
         model = LANGUAGE_MODELS['ollama']['model']
+    if deadline is None:
+        deadline = llm_client.deadline()
     
-    url = LANGUAGE_MODELS['ollama']['url']
-    backup_models = LANGUAGE_MODELS['ollama']['backup_models']
+    candidates = available_candidates(model)
+    hedge_after = LANGUAGE_MODELS['ollama'].get('hedge_after')
     
     # Dodaj identyfikację mentora do promptu
     if mentor_name:
@@ -95,127 +476,723 @@ def call_ollama(prompt, model=None, max_retries=3, mentor_name=None):
         "model": model,
         "prompt": prompt,
         "stream": False,
-        "options": {
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "num_predict": 200,  # Krótsze odpowiedzi
-            "repeat_penalty": 1.1,
-            "num_ctx": 1024  # Mniejszy kontekst = brak pamięci
-        }
+        "keep_alive": LANGUAGE_MODELS['ollama']['keep_alive'],
+        "options": dict(OLLAMA_OPTIONS)
     }
     
-    for attempt in range(max_retries + 1):
-        try:
-            logger.info(f"Próba {attempt + 1}: Wywołanie Ollama z modelem {model}")
-            
-            response = requests.post(url, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'response' in result:
-                    logger.info(f"Sukces: Otrzymano odpowiedź od {model}")
-                    return result['response'].strip()
-                else:
-                    logger.warning(f"Brak pola 'response' w odpowiedzi: {result}")
-            else:
-                logger.warning(f"Błąd HTTP {response.status_code}: {response.text}")
-                
-        except requests.exceptions.ConnectionError:
-            logger.warning(f"Błąd połączenia z Ollama (próba {attempt + 1})")
-        except requests.exceptions.Timeout:
-            logger.warning(f"Timeout połączenia z Ollama (próba {attempt + 1})")
-        except Exception as e:
-            logger.error(f"Nieoczekiwany błąd: {str(e)}")
-        
-        # Próba z backup modelami przy błędach
-        if attempt == max_retries - 1:
-            for backup_model in backup_models:
-                if backup_model != model:
-                    logger.info(f"Przełączanie na backup model: {backup_model}")
-                    # Próba z backup modelem
-                    data["model"] = backup_model
-                    try:
-                        response = requests.post(url, json=data, timeout=30)
-                        if response.status_code == 200:
-                            result = response.json()
-                            if 'response' in result:
-                                logger.info(f"Sukces z backup modelem: {backup_model}")
-                                return result['response'].strip()
-                    except Exception as e:
-                        logger.warning(f"Backup model {backup_model} też nie działa: {str(e)}")
-                        continue
-                    break
+    if not candidates:
+        logger.error("Żaden ze skonfigurowanych modeli nie jest dostępny w Ollama")
+        LLM_FALLBACKS.inc(mentor=mentor_label(mentor_name))
+        return get_fallback_response(prompt)
+    
+    try:
+        if hedge_after is not None and len(candidates) > 1:
+            text = _call_hedged(data, candidates, hedge_after, deadline, context, result, mentor_name)
+        else:
+            text = _call_sequential(data, candidates, max_retries, deadline, context, result, mentor_name)
+        if text is not None:
+            return text
+    except LLMDeadlineExceeded:
+        logger.warning("Przekroczony termin żądania do Ollama")
+    except (LLMQueueFull, LLMCancelled):
+        raise
+    except Exception as e:
+        logger.error(f"Nieoczekiwany błąd: {str(e)}")
     
     # Fallback jeśli wszystko zawiedzie
     logger.error("Wszystkie próby nieudane, używam fallback response")
+    LLM_FALLBACKS.inc(mentor=mentor_label(mentor_name))
+    return get_fallback_response(prompt)
+
+def stream_ollama(prompt, model=None, mentor_name=None, deadline=None, context=None, result=None):
+    """Strumieniowe wywołanie API Ollama - zwraca kolejne fragmenty odpowiedzi.
+    
+    Zamknięcie generatora (np. rozłączenie klienta) zamyka połączenie z Ollama,
+    co przerywa generowanie po stronie serwera modelu. `context` i `result`
+    działają jak w call_ollama.
+    """
+    
+    if model is None:
+        model = LANGUAGE_MODELS['ollama']['model']
+    if deadline is None:
+        deadline = llm_client.deadline()
+    
+    if mentor_name:
+        prompt = f"[MENTOR: {mentor_name}]\n{prompt}"
     
-    # Fallback responses dla każdego mentora
-    fallback_responses = {
-        'Anna': "Przepraszam za problemy techniczne. Spróbuj zadać pytanie ponownie - jestem tutaj aby Ci pomóc w rozwoju osobistym.",
-        'Marek': "Mam problemy z połączeniem. Spróbuj ponownie za chwilę - chętnie pomogę Ci z treningiem i dietą.",
-        'Kasia': "Chwilowe problemy techniczne. Odśwież stronę i spróbuj ponownie - jestem gotowa na rozmowę o biznesie!",
-        'David': "System ma problemy, ale to nie powód do poddawania się. Spróbuj ponownie - razem przełamiemy każdą barierę!"
+    data = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": LANGUAGE_MODELS['ollama']['keep_alive'],
+        "options": dict(OLLAMA_OPTIONS)
     }
     
-    # Sprawdź który mentor odpowiada na podstawie kontekstu
-    for mentor_name in fallback_responses.keys():
-        if mentor_name in prompt:
-            return fallback_responses[mentor_name]
+    # Model główny, potem backup - przełączamy tylko zanim popłynie pierwszy token
+    for index, candidate in enumerate(available_candidates(model)):
+        if index > 0:
+            LLM_BACKUP_SWITCHES.inc(mentor=mentor_label(mentor_name), model=candidate)
+        started = time.monotonic()
+        emitted = False
+        try:
+            logger.info(f"Strumień: wywołanie Ollama z modelem {candidate}")
+            chunks = llm_client.stream(_candidate_data(data, candidate, context), deadline=deadline)
+            try:
+                for chunk in chunks:
+                    token = chunk.get('response', '')
+                    if token:
+                        if not emitted:
+                            logger.info(f"Pierwszy token od {candidate} po {time.monotonic() - started:.2f}s")
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.monotonic() - started, model=candidate)
+                            emitted = True
+                        yield token
+                    if chunk.get('done'):
+                        logger.info(f"Sukces: strumień od {candidate} zakończony po {time.monotonic() - started:.2f}s")
+                        record_generation_stats(candidate, chunk, 'stream', started)
+                        if result is not None:
+                            result.update(model=candidate, context=chunk.get('context'))
+                        return
+            finally:
+                chunks.close()
+            
+            if emitted:
+                return
+        except (GeneratorExit, LLMCancelled):
+            logger.info(f"Klient rozłączony - przerywam generowanie {candidate}")
+            raise
+        except LLMQueueFull:
+            raise
+        except LLMCircuitOpen:
+            logger.warning(f"Bezpiecznik otwarty dla {candidate} - pomijam w strumieniu")
+        except LLMDeadlineExceeded:
+            logger.warning(f"Przekroczony termin strumienia (model {candidate})")
+            break
+        except requests.exceptions.HTTPError as e:
+            logger.warning(str(e))
+        except requests.exceptions.ConnectionError:
+            logger.warning(f"Błąd połączenia z Ollama (strumień, model {candidate})")
+        except requests.exceptions.Timeout:
+            logger.warning(f"Timeout połączenia z Ollama (strumień, model {candidate})")
+        except Exception as e:
+            logger.error(f"Nieoczekiwany błąd strumienia: {str(e)}")
+        
+        # Odpowiedź urwana w połowie - nie doklejamy tekstu innego modelu
+        if emitted:
+            return
     
-    return "Przepraszam, mam obecnie problemy techniczne. Spróbuj ponownie za chwilę."
+    logger.error("Strumień nieudany, używam fallback response")
+    LLM_FALLBACKS.inc(mentor=mentor_label(mentor_name))
+    yield get_fallback_response(prompt)
 
-def generate_mentor_response(mentor_name, user_message, conversation_history=None):
-    """Generowanie odpowiedzi mentora przy użyciu modelu językowego"""
-    
-    # Definicje osobowości mentorów - proste i jasne
-    mentor_personalities = {
-        'Anna': {
-            'prompt_prefix': """Jesteś Anną - psychologiem i ekspertką od rozwoju osobistego. 
+# Definicje osobowości mentorów - proste i jasne
+MENTOR_PERSONALITIES = {
+    'Anna': {
+        'prompt_prefix': """Jesteś Anną - psychologiem i ekspertką od rozwoju osobistego. 
 Jesteś ciepła, wspierająca i pomagasz ludziom w rozwoju. Dajesz konkretne porady psychologiczne.""",
-            'style': 'ciepła psycholog'
-        },
-        'Marek': {
-            'prompt_prefix': """Jesteś Markiem - trenerem personalnym i ekspertem fitness.
+        'style': 'ciepła psycholog'
+    },
+    'Marek': {
+        'prompt_prefix': """Jesteś Markiem - trenerem personalnym i ekspertem fitness.
 Jesteś konkretny, praktyczny i skupiony na wynikach. Dajesz porady treningowe i żywieniowe.""",
-            'style': 'konkretny trener'
-        },
-        'Kasia': {
-            'prompt_prefix': """Jesteś Kasią - business coach i ekspertką od produktywności.
+        'style': 'konkretny trener'
+    },
+    'Kasia': {
+        'prompt_prefix': """Jesteś Kasią - business coach i ekspertką od produktywności.
 Jesteś energiczna, motywująca i nastawiona na sukces. Pomagasz w biznesie i produktywności.""",
-            'style': 'energiczna coach'
-        },
-        'David': {
-            'prompt_prefix': """Jesteś Davidem - mental coach w stylu David Goggins.
+        'style': 'energiczna coach'
+    },
+    'David': {
+        'prompt_prefix': """Jesteś Davidem - mental coach w stylu David Goggins.
 Jesteś bezpośredni, wymagający i nie przyjmujesz wymówek. Motywujesz przez wyzwania.""",
-            'style': 'twardy motywator'
-        }
+        'style': 'twardy motywator'
     }
+}
+
+def build_mentor_prompt(mentor_name, user_message, conversation_history=None, knowledge=None):
+    """Budowanie promptu mentora - zwraca (imię mentora, prompt).
+    
+    Historia (podsumowanie + ostatnie wymiany) jest przycinana tak, żeby
+    cały prompt zmieścił się w CONVERSATION_MEMORY['prompt_token_budget'];
+    `knowledge` to fragmenty z retrieve_knowledge() (już w swoim budżecie).
+    """
     
-    if mentor_name not in mentor_personalities:
+    if mentor_name not in MENTOR_PERSONALITIES:
         mentor_name = 'Anna'  # Default fallback
     
-    mentor_profile = mentor_personalities[mentor_name]
+    mentor_profile = MENTOR_PERSONALITIES[mentor_name]
     
-    # Konstrukcja pełnego promptu - prosty i bez pamięci
-    full_prompt = f"""{mentor_profile['prompt_prefix']}
+    # Konstrukcja pełnego promptu - wiedza i historia wstawiane między profil a pytanie
+    context_blocks = format_knowledge(knowledge)
+    
+    def render(history):
+        blocks = ''.join(block + '\n\n' for block in (context_blocks, history) if block)
+        return f"""{mentor_profile['prompt_prefix']}
 
-AKTUALNE PYTANIE: "{user_message}"
+{blocks}AKTUALNE PYTANIE: "{user_message}"
 
 INSTRUKCJE:
 1. Odpowiedz jako {mentor_name} w swoim stylu
-2. Skoncentruj się tylko na tym pytaniu (ignoruj historię)
+2. Skoncentruj się na aktualnym pytaniu (historii użyj tylko jeśli jest istotna)
 3. Maksymalnie 3-4 zdania
 4. Polski język, konkretnie i pomocnie
 
 {mentor_name}:"""
+    
+    history = ''
+    if conversation_history is not None and not conversation_history.is_empty():
+        budget = CONVERSATION_MEMORY['prompt_token_budget'] - estimate_tokens(render(''))
+        summary, turns = fit_history(conversation_history, budget, CONVERSATION_MEMORY['summary_token_budget'])
+        history = format_history(summary, turns, mentor_name)
+
+    return mentor_name, render(history)
+
+def build_followup_prompt(mentor_name, user_message, knowledge=None):
+    """Krótki prompt kolejnej wymiany - profil i historia są już w kontekście Ollama"""
+    knowledge_block = format_knowledge(knowledge)
+    return f"""{knowledge_block + chr(10) + chr(10) if knowledge_block else ''}AKTUALNE PYTANIE: "{user_message}"
+
+Odpowiedz jako {mentor_name} w swoim stylu, maksymalnie 3-4 zdania.
+
+{mentor_name}:"""
+
+def mentor_context(mentor_name, user_message, conversation_history, knowledge=None):
+    """Kontekst Ollama do kontynuacji rozmowy - None gdy trzeba wysłać pełny prompt"""
+    if not CONVERSATION_MEMORY['reuse_context'] or conversation_history is None:
+        return None
+    if not conversation_history.context:
+        return None
+    followup = build_followup_prompt(mentor_name, user_message, knowledge)
+    # Kontekst rośnie z każdą wymianą - po przekroczeniu budżetu wracamy do podsumowania
+    if len(conversation_history.context) + estimate_tokens(followup) > CONVERSATION_MEMORY['prompt_token_budget']:
+        return None
+    return {
+        'model': conversation_history.context_model,
+        'tokens': conversation_history.context,
+        'prompt': followup
+    }
+
+def mentor_cache_key(mentor_name, user_message, conversation_history=None, knowledge=None):
+    """Klucz cache odpowiedzi dla bieżącego modelu, parametrów, stanu pamięci i wiedzy"""
+    options = dict(OLLAMA_OPTIONS)
+    memory = conversation_history.fingerprint() if conversation_history is not None else None
+    if memory:
+        options['memory'] = memory
+    if knowledge:
+        options['knowledge'] = knowledge
+    return make_cache_key(mentor_name, user_message, LANGUAGE_MODELS['ollama']['model'], options)
+
+def is_cacheable_response(text, generation):
+    """Do cache trafia tylko odpowiedź modelu podstawowego - na nim opiera się klucz (mentor_cache_key).
 
-    return call_ollama(full_prompt, mentor_name=mentor_name)
+    Odpowiedź modelu zapasowego zapisana pod tym kluczem byłaby podawana
+    przez cały TTL, także po powrocie modelu podstawowego.
+    """
+    return not is_fallback_response(text) and generation.get('model') == LANGUAGE_MODELS['ollama']['model']
+
+def retrieve_knowledge(user_message, conversation_history=None, deadline=None):
+    """Fragmenty notatek, zadań i starszych rozmów pasujące do pytania (w budżecie tokenów).
+    
+    Embedding pytania zużywa część terminu żądania (`deadline`) - przy bliskim
+    terminie albo otwartym bezpieczniku modelu odpowiadamy bez wyszukiwania.
+    """
+    if not RETRIEVAL['enabled']:
+        return []
+    timeout = RETRIEVAL['query_timeout']
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        # Wyszukiwanie może zająć najwyżej połowę pozostałego czasu
+        if remaining < 2 * timeout:
+            return []
+        timeout = min(timeout, remaining / 2)
+    if llm_client.breaker(LANGUAGE_MODELS['ollama']['model']).is_open():
+        return []
+    mentor_id = conversation_history.mentor_id if conversation_history is not None else None
+    # Wymiany z okna pamięci są już w prompcie dosłownie
+    exclude = {('chat', message_id) for message_id in conversation_history.message_ids} if conversation_history else None
+    try:
+        hits = semantic_index.search(
+            user_message, k=RETRIEVAL['top_k'], scope=mentor_id, exclude=exclude, min_score=RETRIEVAL['min_score'],
+            timeout=timeout
+        )
+        return fit_knowledge(semantic_index.texts(hits), RETRIEVAL['token_budget'])
+    except Exception as e:
+        logger.error(f"Błąd wyszukiwania semantycznego: {str(e)}")
+        return []
+
+def generate_mentor_response(mentor_name, user_message, conversation_history=None, use_cache=True, result=None):
+    """Generowanie odpowiedzi mentora przy użyciu modelu językowego.
+    
+    Identyczne pytania przy tym samym stanie pamięci są obsługiwane z cache;
+    use_cache=False wymusza świeżą odpowiedź (która zastępuje wpis w cache).
+    `conversation_history` to ConversationState z load_conversation();
+    do promptu trafiają też pasujące notatki, zadania i starsze rozmowy.
+    """
+    # Jeden termin na wyszukiwanie i generację
+    deadline = llm_client.deadline()
+    knowledge = retrieve_knowledge(user_message, conversation_history, deadline)
+    mentor_name, full_prompt = build_mentor_prompt(mentor_name, user_message, conversation_history, knowledge)
+    context = mentor_context(mentor_name, user_message, conversation_history, knowledge)
+    key = mentor_cache_key(mentor_name, user_message, conversation_history, knowledge)
+    # Model, który faktycznie odpowiedział, decyduje o zapisie do cache
+    generation = result if result is not None else {}
+    
+    def compute():
+        return call_ollama(full_prompt, mentor_name=mentor_name, deadline=deadline, context=context, result=generation)
+    
+    if not use_cache:
+        response_cache.record_miss()
+        text = compute()
+        if is_cacheable_response(text, generation):
+            response_cache.put(key, text)
+        return text
+    
+    try:
+        return response_cache.get_or_compute(
+            key, compute, should_cache=lambda text: is_cacheable_response(text, generation)
+        )
+    except LLMCancelled:
+        if current_scope().is_cancelled():
+            raise
+        # Zrezygnował klient identycznego zapytania, na które czekaliśmy - liczymy sami
+        return compute()
+
+def stream_mentor_response(mentor_name, user_message, conversation_history=None, use_cache=True, result=None):
+    """Strumieniowe generowanie odpowiedzi mentora (fragment po fragmencie)"""
+    deadline = llm_client.deadline()
+    knowledge = retrieve_knowledge(user_message, conversation_history, deadline)
+    mentor_name, full_prompt = build_mentor_prompt(mentor_name, user_message, conversation_history, knowledge)
+    context = mentor_context(mentor_name, user_message, conversation_history, knowledge)
+    key = mentor_cache_key(mentor_name, user_message, conversation_history, knowledge)
+    generation = result if result is not None else {}
+    
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    response_cache.record_miss()
+    
+    tokens = []
+    tokens_stream = stream_ollama(full_prompt, mentor_name=mentor_name, deadline=deadline, context=context,
+                                  result=generation)
+    try:
+        for token in tokens_stream:
+            tokens.append(token)
+            yield token
+    finally:
+        tokens_stream.close()
+    
+    # Do cache trafia tylko pełna odpowiedź modelu
+    text = ''.join(tokens).strip()
+    if text and is_cacheable_response(text, generation):
+        response_cache.put(key, text)
+
+def get_conversation_memory(mentor_id):
+    memory = ConversationMemory.query.filter_by(mentor_id=mentor_id).first()
+    if memory is None:
+        memory = ConversationMemory(mentor_id=mentor_id, summary='', summarized_until_id=0)
+        db.session.add(memory)
+    return memory
+
+def load_conversation(mentor_id):
+    """Stan pamięci rozmowy: podsumowanie, okno ostatnich wymian i kontekst Ollama"""
+    chat_log.flush()
+    memory = ConversationMemory.query.filter_by(mentor_id=mentor_id).first()
+    summarized_until = memory.summarized_until_id if memory else 0
+    
+    recent = (ChatMessage.query
+              .filter(ChatMessage.mentor_id == mentor_id, ChatMessage.id > summarized_until)
+              .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+              # Wymiany spoza okna, których jest za mało na podsumowanie, zostają w prompcie dosłownie
+              .limit(CONVERSATION_MEMORY['window_turns'] + CONVERSATION_MEMORY['summarize_after'] - 1)
+              .all())
+    
+    context = context_model = None
+    # Kontekst jest ważny tylko gdy od jego zapisu nie przybyło wiadomości
+    if memory and memory.context and recent and memory.context_message_id == recent[0].id:
+        context = json.loads(memory.context)
+        context_model = memory.context_model
+    
+    return ConversationState(
+        summary=memory.summary if memory else '',
+        turns=[(message.user_message, message.mentor_response) for message in reversed(recent)],
+        context=context,
+        context_model=context_model,
+        mentor_id=mentor_id,
+        message_ids=[message.id for message in recent]
+    )
+
+def remember_context(mentor_id, chat_message, generation):
+    """Kontekst Ollama po ostatniej wymianie - ważny tylko razem z tą wiadomością"""
+    memory = get_conversation_memory(mentor_id)
+    if generation and generation.get('context'):
+        memory.context = json.dumps(generation['context'])
+        memory.context_model = generation['model']
+        memory.context_message_id = chat_message.id
+    else:
+        # Odpowiedź z cache lub awaryjna - kontekst nie odpowiada już rozmowie
+        memory.context = memory.context_model = memory.context_message_id = None
+
+def save_chat_message(mentor_id, user_message, mentor_response, generation=None):
+    """Zapis wymiany razem z kontekstem Ollama; podsumowanie aktualizuje się w tle"""
+    if DATABASE['write_behind']:
+        # Zapis partią w tle - zwracamy niezapisany obiekt z tym samym znacznikiem czasu
+        chat_message = ChatMessage(
+            mentor_id=mentor_id,
+            user_message=user_message,
+            mentor_response=mentor_response,
+            timestamp=datetime.utcnow()
+        )
+        try:
+            chat_log.submit((chat_message, generation))
+            return chat_message
+        except RuntimeError:
+            # Kolejka zatrzymana przy zamykaniu - zapis bezpośredni
+            pass
+    
+    chat_message = ChatMessage(
+        mentor_id=mentor_id,
+        user_message=user_message,
+        mentor_response=mentor_response
+    )
+    db.session.add(chat_message)
+    db.session.flush()
+    remember_context(mentor_id, chat_message, generation)
+    db.session.commit()
+    
+    conversation_summaries.schedule(mentor_id)
+    semantic_index.notify()
+    schedule_task_extraction([chat_message.id])
+    return chat_message
+
+def write_chat_batch(items):
+    """Zapis partii wiadomości (z kolejki lub panelu) w jednej transakcji (jeden commit = jeden fsync).
+
+    Bez skutków ubocznych poza transakcją - kolejka ponawia zapis po błędzie,
+    a wycofana transakcja nie zostawia w bazie żadnej wiadomości z partii.
+    Zwraca (mentor_ids, message_ids) dla after_chat_batch.
+    """
+    with app.app_context():
+        try:
+            latest = {}
+            written = []
+            for pending, generation in items:
+                chat_message = ChatMessage(
+                    mentor_id=pending.mentor_id,
+                    user_message=pending.user_message,
+                    mentor_response=pending.mentor_response,
+                    timestamp=pending.timestamp
+                )
+                db.session.add(chat_message)
+                written.append(chat_message)
+                latest[pending.mentor_id] = (chat_message, generation)
+            # Jeden flush - INSERT wielu wierszy naraz z RETURNING id
+            db.session.flush()
+            for mentor_id, (chat_message, generation) in latest.items():
+                remember_context(mentor_id, chat_message, generation)
+            db.session.commit()
+            return list(latest), [chat_message.id for chat_message in written]
+        except Exception:
+            db.session.rollback()
+            raise
+
+def after_chat_batch(result):
+    """Podsumowania, indeks i wyciąganie zadań po zapisanej partii - uruchamiane raz, poza ponowieniami"""
+    mentor_ids, message_ids = result
+    for mentor_id in mentor_ids:
+        conversation_summaries.schedule(mentor_id)
+    semantic_index.notify()
+    schedule_task_extraction(message_ids)
+
+chat_log = WriteBehindQueue(
+    write_chat_batch,
+    after_write=after_chat_batch,
+    max_batch=DATABASE['write_batch'],
+    max_delay=DATABASE['write_delay'],
+    max_pending=DATABASE['write_max_pending'],
+    name='chat-log'
+)
+# Zaległe wiadomości są zapisywane przed zakończeniem procesu
+atexit.register(chat_log.stop)
+
+def pending_summary_messages(mentor_id, summarized_until):
+    """Najstarsze wymiany spoza okna, jeszcze nieujęte w podsumowaniu (najwyżej summary_batch, od najstarszej)"""
+    # Najstarsza wymiana okna - wszystko przed nią czeka na podsumowanie
+    boundary = (ChatMessage.query
+                .with_entities(ChatMessage.timestamp, ChatMessage.id)
+                .filter(ChatMessage.mentor_id == mentor_id, ChatMessage.id > summarized_until)
+                .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+                .offset(CONVERSATION_MEMORY['window_turns'] - 1)
+                .first())
+    if boundary is None:
+        return []
+    return (ChatMessage.query
+            .filter(ChatMessage.mentor_id == mentor_id, ChatMessage.id > summarized_until,
+                    db.or_(ChatMessage.timestamp < boundary.timestamp,
+                           db.and_(ChatMessage.timestamp == boundary.timestamp, ChatMessage.id < boundary.id)))
+            .order_by(ChatMessage.timestamp, ChatMessage.id)
+            .limit(CONVERSATION_MEMORY['summary_batch'])
+            .all())
+
+def summarize_conversation(mentor_id):
+    """Dołączenie wymian, które wypadły z okna, do podsumowania rozmowy"""
+    with app.app_context():
+        chat_log.flush()
+        memory = get_conversation_memory(mentor_id)
+        
+        mentor = db.session.get(Mentor, mentor_id)
+        # Zaległości od najstarszej, po summary_batch wymian - żadna nie wypada z pamięci
+        while True:
+            pending = pending_summary_messages(mentor_id, memory.summarized_until_id or 0)
+            if len(pending) < CONVERSATION_MEMORY['summarize_after']:
+                db.session.rollback()
+                return
+            
+            prompt = build_summary_prompt(
+                mentor.name if mentor else 'mentor',
+                memory.summary,
+                [(message.user_message, message.mentor_response) for message in pending],
+                CONVERSATION_MEMORY['summary_sentences']
+            )
+            try:
+                with request_scope('system:summaries', BACKGROUND):
+                    summary = call_ollama(prompt)
+            except LLMQueueFull:
+                # Spróbujemy przy następnej wiadomości
+                db.session.rollback()
+                return
+            if is_fallback_response(summary):
+                db.session.rollback()
+                return
+            
+            memory.summary = summary.strip()
+            memory.summarized_until_id = pending[-1].id
+            db.session.commit()
+            logger.info(f"Zaktualizowano podsumowanie rozmowy z mentorem {mentor_id} ({len(pending)} wymian)")
+
+conversation_summaries = SummaryWorker(summarize_conversation)
+
+# Zadania wyciągane z odpowiedzi mentorów w tle - po zapisie wiadomości, partiami
+TASK_EXTRACTION = {
+    'enabled': True,  # TASK_EXTRACTION
+    # Dodatkowe przejście modelem (TASK_EXTRACTION_LLM=1) - jedno wywołanie na partię
+    'use_llm': False,
+    'batch_size': 10,  # Wiadomości w jednej partii (i w jednym prompcie modelu)
+    'batch_delay': 2.0,  # Sekundy zbierania partii od pierwszej wiadomości
+    'max_pending': 10000,  # Ponad limit wiadomości czekają na zaległości po restarcie
+    'max_per_message': 5,  # Najwięcej zadań z jednej odpowiedzi
+    'backlog_window': timedelta(days=1)  # Po starcie: nieprzetworzone wiadomości z tego okna
+}
+
+def extract_tasks_with_model(messages):
+    """Zadania z partii odpowiedzi jednym wywołaniem modelu (pusty wynik gdy model nie odpowiada)"""
+    replies = [(index, message.mentor_response) for index, message in enumerate(messages, 1)]
+    try:
+        with request_scope('system:tasks', BACKGROUND):
+            text = call_ollama(build_extraction_prompt(replies), max_retries=0)
+    except LLMQueueFull:
+        logger.info("Kolejka modelu pełna - zadania tylko z heurystyk")
+        return {}
+    if is_fallback_response(text):
+        return {}
+    parsed = parse_extraction_response(text, [index for index, _ in replies], datetime.utcnow())
+    return {messages[index - 1].id: tasks for index, tasks in parsed.items()}
+
+def extract_tasks_batch(message_ids):
+    """Zadania z partii zapisanych odpowiedzi - heurystyki, potem opcjonalnie model.
+    
+    Znacznik tasks_extracted_at zapisuje się w tej samej transakcji co zadania,
+    a zadanie o tym samym tytule z tej samej wiadomości nie jest dodawane
+    drugi raz - ponowne przetwarzanie niczego nie dubluje.
+    """
+    with app.app_context():
+        try:
+            messages = (ChatMessage.query
+                        .filter(ChatMessage.id.in_(set(message_ids)), ChatMessage.tasks_extracted_at.is_(None))
+                        .order_by(ChatMessage.id)
+                        .all())
+            if not messages:
+                db.session.rollback()
+                return
+            
+            found = {message.id: extract_tasks(message.mentor_response, message.timestamp) for message in messages}
+            if TASK_EXTRACTION['use_llm']:
+                for message_id, tasks in extract_tasks_with_model(messages).items():
+                    found[message_id] = merge_tasks(found[message_id], tasks)
+            
+            existing = {
+                (task.source_message_id, task_key(task.title))
+                for task in Task.query.filter(Task.source_message_id.in_([message.id for message in messages]))
+            }
+            created = 0
+            extracted_at = datetime.utcnow()
+            for message in messages:
+                for task in found[message.id][:TASK_EXTRACTION['max_per_message']]:
+                    if (message.id, task_key(task.title)) in existing:
+                        continue
+                    db.session.add(Task(
+                        title=task.title,
+                        description=task.source if task.source != task.title else None,
+                        priority=task_priority(task, message.timestamp),
+                        due_date=task.due_date,
+                        mentor_id=message.mentor_id,
+                        source_message_id=message.id
+                    ))
+                    created += 1
+                message.tasks_extracted_at = extracted_at
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    if created:
+        logger.info(f"Wyciągnięto {created} zadań z {len(messages)} odpowiedzi mentorów")
+
+task_extractor = WriteBehindQueue(
+    extract_tasks_batch,
+    max_batch=TASK_EXTRACTION['batch_size'],
+    max_delay=TASK_EXTRACTION['batch_delay'],
+    max_pending=TASK_EXTRACTION['max_pending'],
+    name='task-extraction'
+)
+
+def schedule_task_extraction(message_ids):
+    """Zgłoszenie zapisanych wiadomości do wyciągania zadań - bez czekania na kolejkę"""
+    if not TASK_EXTRACTION['enabled']:
+        return
+    for message_id in message_ids:
+        try:
+            task_extractor.submit(message_id, block=False)
+        except (queue.Full, RuntimeError):
+            # Pełna albo zatrzymana kolejka - wiadomość obsłużą zaległości po restarcie
+            logger.warning(f"Pominięto wyciąganie zadań z wiadomości {message_id}")
+
+def schedule_task_extraction_backlog():
+    """Nieprzetworzone wiadomości z ostatniego okna (np. sprzed restartu)"""
+    cutoff = datetime.utcnow() - TASK_EXTRACTION['backlog_window']
+    message_ids = [row.id for row in db.session.query(ChatMessage.id).filter(
+        ChatMessage.tasks_extracted_at.is_(None), ChatMessage.timestamp >= cutoff
+    )]
+    schedule_task_extraction(message_ids)
+
+# Zadania czatu w tle - generowanie nie blokuje workerów WSGI
+CHAT_JOBS = {
+    'max_workers': 4,  # Wątki generujące odpowiedzi
+    'max_pending': 64,  # Oczekujące zadania ponad limit dostają 429
+    'result_ttl': 600,  # Jak długo trzymamy wynik zakończonego zadania (s)
+    'max_poll_wait': 30  # Maksymalny czas long-pollingu (s)
+}
+
+def run_chat_job(job):
+    """Wykonanie zadania czatu w tle - zapis ChatMessage po zakończeniu"""
+    payload = job.payload
+    
+    with app.app_context():
+        conversation = load_conversation(payload['mentor_id'])
+    
+    mentor_response = None
+    generation = {}
+    for attempt in range(3):
+        try:
+            # Zadanie w tle ustępuje czatowi na żywo; anulowanie zadania przerywa generację
+            with request_scope(payload['session_key'], BACKGROUND, job.is_cancelled):
+                mentor_response = generate_mentor_response(
+                    payload['mentor_name'],
+                    payload['message'],
+                    conversation,
+                    use_cache=payload['use_cache'],
+                    result=generation
+                )
+            break
+        except LLMCancelled:
+            return None
+        except LLMQueueFull as e:
+            # Zadanie w tle może poczekać na wolne miejsce zamiast zwracać 429
+            if attempt == 2 or job.is_cancelled():
+                raise
+            time.sleep(e.retry_after)
+    
+    # Anulowanie po tym miejscu nie jest już możliwe - wiadomość nie zapisze się dla anulowanego zadania
+    if not chat_jobs.commit(job):
+        return None
+    
+    with app.app_context():
+        try:
+            chat_message = save_chat_message(
+                payload['mentor_id'], payload['message'], mentor_response, generation
+            )
+            
+            return {
+                'response': mentor_response,
+                'timestamp': chat_message.timestamp.isoformat()
+            }
+        except Exception:
+            db.session.rollback()
+            raise
+
+chat_jobs = ChatJobQueue(
+    run_chat_job,
+    max_workers=CHAT_JOBS['max_workers'],
+    max_pending=CHAT_JOBS['max_pending'],
+    result_ttl=CHAT_JOBS['result_ttl']
+)
+
+# Panel mentorów - jedno pytanie do kilku mentorów równolegle
+CHAT_PANEL = {
+    'max_mentors': 4,  # Mentorów w jednym panelu
+    'max_workers': 8  # Wątki panelu (równoległe generacje ogranicza limit modelu)
+}
+
+chat_panel = ChatPanel(max_workers=CHAT_PANEL['max_workers'])
+
+def generate_panel_answer(mentor_name, user_message, conversation, use_cache):
+    """Odpowiedź jednego mentora panelu - tekst, wynik generacji i czas ukończenia"""
+    generation = {}
+    mentor_response = generate_mentor_response(
+        mentor_name, user_message, conversation, use_cache=use_cache, result=generation
+    )
+    return mentor_response, generation, datetime.utcnow()
+
+def save_panel_messages(user_message, answers):
+    """Zapis wszystkich odpowiedzi panelu w jednej transakcji"""
+    # Wcześniejsze wiadomości z kolejki zapisu w tle trafiają do bazy przed panelem
+    chat_log.flush()
+    after_chat_batch(write_chat_batch([
+        (ChatMessage(mentor_id=mentor_id, user_message=user_message, mentor_response=mentor_response,
+                     timestamp=timestamp), generation)
+        for mentor_id, mentor_response, generation, timestamp in answers
+    ]))
+
+def ensure_columns():
+    """Dodanie nowych kolumn do istniejących tabel (create_all ich nie zmienia)"""
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info(f"Dodano kolumnę {table.name}.{column.name}")
+
+def ensure_indexes():
+    """Dodanie indeksów do istniejących tabel (create_all pomija istniejące tabele)"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
 
 # Inicjalizacja bazy danych
 def init_db():
     """Inicjalizacja bazy danych z danymi mentorów"""
     try:
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
+        ensure_note_search(db.engine)
+        ensure_change_log(db.engine)
+        prune_tombstones(db.engine)
+        if RETRIEVAL['enabled']:
+            semantic_index.setup(db.engine)
         
         # Sprawdź czy mentorowie już istnieją
         if Mentor.query.count() == 0:
@@ -261,6 +1238,281 @@ def init_db():
         logger.error(f"Błąd podczas inicjalizacji bazy danych: {str(e)}")
         db.session.rollback()
 
+def apply_settings(settings):
+    """Przeniesienie ustawień (config.py) do konfiguracji Flask i słowników konfiguracji modułu"""
+    SETTINGS.update(settings)
+    app.config['SECRET_KEY'] = settings['SECRET_KEY']
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings['DATABASE_URL']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(
+        settings['DATABASE_URL'],
+        pool_size=DATABASE['pool_size'],
+        max_overflow=DATABASE['max_overflow'],
+        pool_timeout=DATABASE['pool_timeout'],
+        busy_timeout=DATABASE['pragmas']['busy_timeout']
+    )
+    DATABASE['write_behind'] = settings['CHAT_WRITE_BEHIND']
+    
+    LANGUAGE_MODELS['ollama'].update({
+        'base_url': settings['OLLAMA_URL'],
+        'url': f"{settings['OLLAMA_URL'].rstrip('/')}/api/generate",
+        'model': settings['OLLAMA_MODEL'],
+        'backup_models': list(settings['OLLAMA_BACKUP_MODELS']),
+        'embedding_model': settings['OLLAMA_EMBEDDING_MODEL'],
+        'keep_alive': settings['OLLAMA_KEEP_ALIVE'],
+        'max_in_flight': settings['LLM_MAX_IN_FLIGHT'],
+        'max_queue': settings['LLM_MAX_QUEUE'],
+        'request_timeout': settings['LLM_REQUEST_TIMEOUT'],
+        'shutdown_timeout': settings['LLM_SHUTDOWN_TIMEOUT']
+    })
+    RETRIEVAL['enabled'] = settings['RETRIEVAL_ENABLED']
+    TASK_EXTRACTION['enabled'] = settings['TASK_EXTRACTION']
+    TASK_EXTRACTION['use_llm'] = settings['TASK_EXTRACTION_LLM']
+    ASSETS['enabled'] = settings['STATIC_ASSETS']
+
+apply_settings(SETTINGS)
+
+def create_app(config=None):
+    """Konfiguracja aplikacji: ustawienia ze środowiska nadpisane przez `config`, baza i klient Ollama.
+    
+    Trasy, kolejki i wątki w tle są globalne dla modułu, więc w procesie
+    jest jedna aplikacja - create_app() wywołuje się raz (serwer, wsgi.py,
+    benchmarki). Schematu bazy nie tworzy - to robi init_db() raz przed
+    startem workerów, a wątki w tle uruchamia start_worker() w każdym z nich.
+    """
+    if 'sqlalchemy' in app.extensions:
+        raise RuntimeError("Aplikacja jest już skonfigurowana - create_app() wywołuje się raz na proces")
+    apply_settings(load_settings(config))
+    db.init_app(app)
+    build_llm_backend()
+    static_assets.load(ASSETS['enabled'])
+    return app
+
+def start_worker(run_backlog=True):
+    """Start procesu obsługującego żądania - wątki w tle, zaległe zadania i zamknięcie przy wyjściu.
+    
+    Monitor rozgrzewa modele od razu, zanim pojawią się pierwsi użytkownicy.
+    Zaległości wyciągania zadań zgłasza tylko jeden proces (run_backlog).
+    """
+    model_monitor.ensure_started()
+    with app.app_context():
+        try:
+            if RETRIEVAL['enabled']:
+                semantic_index.ensure_started(db.engine)
+            else:
+                semantic_index.detach(db.engine)
+        except Exception as e:
+            logger.error(f"Błąd przy uruchamianiu indeksu semantycznego: {str(e)}")
+    if run_backlog and TASK_EXTRACTION['enabled']:
+        with app.app_context():
+            try:
+                schedule_task_extraction_backlog()
+            except Exception as e:
+                logger.error(f"Błąd przy zgłaszaniu zaległych wiadomości do wyciągania zadań: {str(e)}")
+                db.session.rollback()
+    atexit.register(shutdown)
+
+_shutdown_lock = threading.Lock()
+_shutdown_done = False
+
+def shutdown(timeout=None):
+    """Łagodne zamknięcie procesu - dokończenie trwających generacji i zapis zaległych danych.
+    
+    Nowe żądania przestaje przyjmować serwer (gunicorn, server.py); tutaj
+    zatrzymujemy producentów pracy w tle, czekamy do `timeout` sekund na
+    generacje w toku (ich odpowiedzi są zapisywane) i opróżniamy kolejki zapisu.
+    """
+    global _shutdown_done
+    with _shutdown_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+    timeout = LANGUAGE_MODELS['ollama']['shutdown_timeout'] if timeout is None else timeout
+    logger.info(f"Zamykanie - czekam do {timeout}s na trwające generacje")
+    
+    # Nowe podsumowania i zadania czatu nie startują; oczekujące zadania czatu są anulowane
+    conversation_summaries.stop()
+    chat_jobs.shutdown(wait=False)
+    if llm_client is not None:
+        llm_client.drain(timeout)
+    # Zadania czatu, które skończyły generację, zapisują odpowiedź
+    chat_jobs.shutdown(wait=True)
+    chat_log.stop()
+    task_extractor.stop(timeout=5)
+    if model_monitor is not None:
+        model_monitor.stop()
+    if semantic_index is not None:
+        semantic_index.stop()
+    logger.info("Zamknięto aplikację")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Utworzenie schematu bazy i danych mentorów (raz, przed startem serwera)"""
+    init_db()
+
+# Paginacja keyset - kursor to pozycja (znacznik czasu, id) ostatniego wiersza
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CHAT_PAGE_SIZE = 30
+
+class InvalidCursor(ValueError):
+    """Kursor paginacji nie daje się odczytać"""
+
+def encode_cursor(timestamp, row_id):
+    # Listy z projekcją kolumn dają znacznik czasu jako tekst z SQLite
+    stamp = timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+    raw = f"{stamp}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise InvalidCursor(cursor)
+
+def keyset_page(query, column, id_column, descending, limit, before=None, after=None, tail=False):
+    """Jedna strona wyników w porządku (column, id).
+    
+    `before` zwraca wiersze przed kursorem, `after` po kursorze (w porządku
+    rosnącym). Bez kursora `tail=True` daje ostatnią stronę zamiast pierwszej.
+    Wynik jest zawsze w naturalnej kolejności listy.
+    Zwraca (wiersze, informacje o stronie).
+    """
+    if before:
+        ts, row_id = decode_cursor(before)
+        query = query.filter(db.or_(column < ts, db.and_(column == ts, id_column < row_id)))
+    if after:
+        ts, row_id = decode_cursor(after)
+        query = query.filter(db.or_(column > ts, db.and_(column == ts, id_column > row_id)))
+    
+    # Pobieramy wiersze najbliższe kursorowi, potem ewentualnie odwracamy
+    fetch_desc = bool(before) or (not after and descending != tail)
+    if fetch_desc:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+    
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if fetch_desc != descending:
+        rows.reverse()
+    
+    key = column.key
+    page = {
+        'limit': limit,
+        'has_more': has_more,
+        'first_cursor': encode_cursor(getattr(rows[0], key), rows[0].id) if rows else None,
+        'last_cursor': encode_cursor(getattr(rows[-1], key), rows[-1].id) if rows else None
+    }
+    return rows, page
+
+def page_args():
+    """Parametry limit/before/after z query stringa (limit=None gdy brak)"""
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return limit, request.args.get('before'), request.args.get('after')
+
+def paginated_query(query, column, id_column, descending):
+    """Lista z paginacją gdy podano limit/kursor, w przeciwnym razie cała kolekcja"""
+    limit, before, after = page_args()
+    if limit is None and not before and not after:
+        if descending:
+            return query.order_by(column.desc(), id_column.desc()).all(), None
+        return query.order_by(column.asc(), id_column.asc()).all(), None
+    return keyset_page(query, column, id_column, descending, limit or DEFAULT_PAGE_SIZE, before, after)
+
+def invalid_cursor_response():
+    response = jsonify({'success': False, 'error': 'Nieprawidłowy kursor paginacji'})
+    response.status_code = 400
+    return response
+
+# Kompresja odpowiedzi JSON - gzip, brotli gdy zainstalowany i akceptowany przez klienta
+COMPRESSION = {
+    'min_size': 1024,  # Mniejsze odpowiedzi nie zyskują na kompresji
+    'gzip_level': 6,
+    'brotli_quality': 5  # 0-11; 5 to dobry kompromis dla odpowiedzi generowanych na żądanie
+}
+
+@app.after_request
+def compress_json_response(response):
+    return compress_response(
+        response, request,
+        min_size=COMPRESSION['min_size'],
+        gzip_level=COMPRESSION['gzip_level'],
+        brotli_quality=COMPRESSION['brotli_quality']
+    )
+
+def conditional_collection(entity):
+    """GET listy z ETag/Last-Modified z dziennika zmian - niezmieniona kolekcja to 304 bez czytania wierszy"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            version, last_modified = collection_version(db.session, entity)
+            etag = collection_etag(version, request)
+            if is_not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified)
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+def serialize_chat_message(message):
+    return {
+        'id': message.id,
+        'mentor_id': message.mentor_id,
+        'user_message': message.user_message,
+        'mentor_response': message.mentor_response,
+        'timestamp': message.timestamp.isoformat()
+    }
+
+static_assets = StaticAssets(app.static_folder, ASSETS['output_dir'], max_age=ASSETS['max_age'])
+
+def asset_url(path):
+    """Adres pliku ze static - wersja z hashem po buildzie, inaczej plik źródłowy"""
+    return url_for('static', filename=static_assets.path(path))
+
+def asset_image(path):
+    """Zdjęcie do <picture>: src, srcset i źródła AVIF/WebP (None gdy pliku nie ma)"""
+    image = static_assets.image(path)
+    if image is None:
+        return None
+    
+    def srcset(entries):
+        return ', '.join(f"{url_for('static', filename=entry)} {width}w" for entry, width in entries)
+    
+    return {
+        'src': url_for('static', filename=image['src']),
+        'srcset': srcset(image['srcset']) if image['srcset'] else None,
+        'sources': [(mimetype, srcset(entries)) for mimetype, entries in image['sources']]
+    }
+
+@app.context_processor
+def inject_assets():
+    return {'asset_url': asset_url, 'asset_image': asset_image}
+
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    """Pliki z buildu - gotowe warianty brotli/gzip i Cache-Control: immutable"""
+    return static_assets.response(filename, request)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Minifikacja i hashowanie CSS/JS, warianty .gz/.br i zdjęcia WebP/AVIF w static/dist"""
+    stats = build_assets(app.static_folder, ASSETS['output_dir'], ASSETS['image_widths'])
+    static_assets.load(ASSETS['enabled'])
+    logger.info(
+        f"CSS/JS/SVG: {stats['files']} plików, {stats['source']} B -> {stats['minified']} B po minifikacji, "
+        f"{stats['.gz']} B gzip, {stats['.br']} B brotli; "
+        f"zdjęcia: {stats['photos_source']} B -> {stats['photos']} B (największy wariant)"
+    )
+
 # Routes
 @app.route('/')
 def index():
@@ -271,11 +1523,16 @@ def index():
 def chat():
     mentor_id = request.args.get('mentor_id', 1, type=int)
     mentor = Mentor.query.get_or_404(mentor_id)
+    chat_log.flush()
     
-    # Pobierz historię rozmów
-    messages = ChatMessage.query.filter_by(mentor_id=mentor_id).order_by(ChatMessage.timestamp).all()
+    # Pobierz tylko najnowszą stronę historii - starsze doładowuje chat.js
+    messages, page = keyset_page(
+        ChatMessage.query.filter_by(mentor_id=mentor_id),
+        ChatMessage.timestamp, ChatMessage.id,
+        descending=False, limit=CHAT_PAGE_SIZE, tail=True
+    )
     
-    return render_template('chat.html', mentor=mentor, messages=messages)
+    return render_template('chat.html', mentor=mentor, messages=messages, page=page)
 
 @app.route('/tasks')
 def tasks():
@@ -290,35 +1547,66 @@ def notes():
     return render_template('notes.html')
 
 # API Routes
+@app.route('/metrics')
+def metrics():
+    """Metryki w formacie tekstowym Prometheus"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health')
 def health_check():
-    """Endpoint sprawdzający status aplikacji i Ollama"""
+    """Endpoint sprawdzający status aplikacji i Ollama.
+    
+    Stan Ollama pochodzi z monitora w tle - endpoint nie odpytuje modelu.
+    """
+    ollama = model_monitor.snapshot()
+    current_model = LANGUAGE_MODELS['ollama']['model']
+    
+    health_status = {
+        'app': 'healthy',
+        'database': 'unknown',
+        'ollama_status': ollama['status'],
+        'ollama': ollama,
+        'available_models': ollama['available_models'] or [],
+        'current_model': current_model,
+        'current_model_available': model_monitor.is_available(current_model),
+        'llm_queues': llm_client.stats(),
+        'circuit_breakers': llm_client.breaker_stats(),
+        'response_cache': response_cache.stats(),
+        'chat_jobs': chat_jobs.stats(),
+        'chat_panel': chat_panel.stats(),
+        'conversation_memory': conversation_summaries.stats(),
+        'semantic_index': semantic_index.stats(),
+        'chat_log': dict(chat_log.stats(), write_behind=DATABASE['write_behind']),
+        'task_extraction': dict(task_extractor.stats(), enabled=TASK_EXTRACTION['enabled'],
+                                use_llm=TASK_EXTRACTION['use_llm'])
+    }
+    
+    # Sprawdź bazę danych
     try:
-        # Test połączenia z Ollama
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            model_names = [m['name'] for m in models]
-            
-            return jsonify({
-                'status': 'healthy',
-                'ollama_status': 'connected',
-                'available_models': model_names,
-                'current_model': LANGUAGE_MODELS['ollama']['model']
-            })
-        else:
-            return jsonify({
-                'status': 'degraded',
-                'ollama_status': 'error',
-                'error': f'HTTP {response.status_code}'
-            })
-            
+        db.session.execute(db.text('SELECT 1'))
+        health_status['database'] = 'healthy'
     except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'ollama_status': 'disconnected',
-            'error': str(e)
-        })
+        health_status['database'] = f'error: {str(e)}'
+        db.session.rollback()
+    
+    if health_status['database'] != 'healthy' or ollama['status'] == 'disconnected':
+        health_status['status'] = 'unhealthy'
+    elif ollama['status'] == 'unknown' or not health_status['current_model_available']:
+        health_status['status'] = 'degraded'
+    else:
+        health_status['status'] = 'healthy'
+    
+    return jsonify(health_status)
+
+@app.route('/api/llm/queue')
+def api_llm_queue():
+    """Kolejki modeli: oczekujący, sesje, czas czekania i generacje w toku per klasa priorytetu"""
+    return jsonify({
+        'success': True,
+        'models': llm_client.stats(),
+        'chat_jobs': chat_jobs.stats(),
+        'chat_panel': chat_panel.stats()
+    })
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
@@ -334,21 +1622,19 @@ def api_chat():
         if not mentor:
             return jsonify({'success': False, 'error': 'Mentor nie został znaleziony'})
         
-        # Generuj odpowiedź używając modelu językowego - bez kontekstu
-        mentor_response = generate_mentor_response(
-            mentor.name, 
-            user_message, 
-            None  # Brak historii - każde pytanie jest nowe
-        )
+        # Generuj odpowiedź używając modelu językowego - z pamięcią rozmowy
+        generation = {}
+        with client_request_scope():
+            mentor_response = generate_mentor_response(
+                mentor.name, 
+                user_message, 
+                load_conversation(mentor.id),
+                use_cache=not wants_fresh_response(data),
+                result=generation
+            )
         
         # Zapisz wiadomość do bazy danych
-        chat_message = ChatMessage(
-            mentor_id=mentor_id,
-            user_message=user_message,
-            mentor_response=mentor_response
-        )
-        db.session.add(chat_message)
-        db.session.commit()
+        chat_message = save_chat_message(mentor.id, user_message, mentor_response, generation)
         
         return jsonify({
             'success': True,
@@ -356,30 +1642,325 @@ def api_chat():
             'timestamp': chat_message.timestamp.isoformat()
         })
         
+    except LLMQueueFull as e:
+        return queue_full_response(e)
+    except LLMCancelled:
+        return cancelled_response()
     except Exception as e:
         logger.error(f"Błąd w API chat: {str(e)}")
         db.session.rollback()
         return jsonify({'success': False, 'error': 'Wystąpił błąd serwera'})
 
+@app.route('/api/chat/panel', methods=['POST'])
+def api_chat_panel():
+    """Jedno pytanie do kilku mentorów naraz (SSE) - odpowiedzi wysyłane w kolejności ukończenia"""
+    data = request.get_json() or {}
+    user_message = data.get('message', '').strip()
+    mentor_ids = data.get('mentor_ids')
+    
+    if not user_message:
+        return jsonify({'success': False, 'error': 'Wiadomość nie może być pusta'})
+    
+    try:
+        # Kolejność z żądania, bez powtórzeń
+        mentor_ids = list(dict.fromkeys(int(mentor_id) for mentor_id in mentor_ids or []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Nieprawidłowa lista mentorów'})
+    if not mentor_ids:
+        return jsonify({'success': False, 'error': 'Wybierz co najmniej jednego mentora'})
+    if len(mentor_ids) > CHAT_PANEL['max_mentors']:
+        return jsonify({'success': False, 'error': f"Panel może liczyć najwyżej {CHAT_PANEL['max_mentors']} mentorów"})
+    
+    mentors = {mentor.id: mentor for mentor in Mentor.query.filter(Mentor.id.in_(mentor_ids))}
+    if len(mentors) != len(mentor_ids):
+        return jsonify({'success': False, 'error': 'Mentor nie został znaleziony'})
+    
+    use_cache = not wants_fresh_response(data)
+    names = {mentor_id: mentors[mentor_id].name for mentor_id in mentor_ids}
+    # Pamięć rozmów czytana w wątku żądania - wątki panelu nie korzystają z sesji bazy
+    calls = {
+        mentor_id: partial(generate_panel_answer, names[mentor_id], user_message, load_conversation(mentor_id), use_cache)
+        for mentor_id in mentor_ids
+    }
+    
+    session_key = llm_session_key()
+    
+    # Szybkie odrzucenie zanim wyślemy nagłówki strumienia
+    try:
+        llm_client.check_capacity(LANGUAGE_MODELS['ollama']['model'], RequestScope(session_key))
+    except LLMQueueFull as e:
+        return queue_full_response(e)
+    
+    def generate():
+        answers = []
+        yield sse_event('start', {'mentors': [{'mentor_id': mentor_id, 'mentor': names[mentor_id]}
+                                              for mentor_id in mentor_ids]})
+        # Wątki panelu dziedziczą sesję klienta i anulowanie po rozłączeniu
+        with client_request_scope():
+            results = chat_panel.run(calls)
+        try:
+            for mentor_id, answer, error in results:
+                if isinstance(error, LLMCancelled):
+                    continue
+                if error is not None:
+                    if isinstance(error, LLMQueueFull):
+                        payload = {'error': 'Mentorzy są teraz zajęci. Spróbuj ponownie za chwilę.',
+                                   'retry_after': error.retry_after}
+                    else:
+                        logger.error(f"Błąd odpowiedzi mentora {names[mentor_id]} w panelu: {str(error)}")
+                        payload = {'error': 'Wystąpił błąd serwera'}
+                    yield sse_event('error', dict(payload, success=False, mentor_id=mentor_id, mentor=names[mentor_id]))
+                    continue
+                
+                mentor_response, generation, timestamp = answer
+                answers.append((mentor_id, mentor_response, generation, timestamp))
+                yield sse_event('answer', {
+                    'mentor_id': mentor_id,
+                    'mentor': names[mentor_id],
+                    'response': mentor_response,
+                    'timestamp': timestamp.isoformat()
+                })
+        finally:
+            # Przy rozłączeniu klienta odpowiedzi, które jeszcze nie wystartowały, są anulowane
+            results.close()
+        
+        try:
+            # Wszystkie wiadomości panelu w jednej transakcji, po ostatniej odpowiedzi
+            if answers:
+                save_panel_messages(user_message, answers)
+            yield sse_event('done', {'success': True, 'saved': len(answers)})
+        except Exception as e:
+            logger.error(f"Błąd przy zapisie odpowiedzi panelu: {str(e)}")
+            db.session.rollback()
+            yield sse_event('error', {'success': False, 'error': 'Wystąpił błąd serwera'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/chat/jobs', methods=['GET', 'POST'])
+def api_chat_jobs():
+    """Kolejkowanie odpowiedzi mentora - zwraca id zadania od razu"""
+    if request.method == 'GET':
+        return jsonify({'success': True, 'queue': chat_jobs.stats()})
+    
+    data = request.get_json() or {}
+    mentor_id = data.get('mentor_id')
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'success': False, 'error': 'Wiadomość nie może być pusta'})
+    
+    mentor = Mentor.query.get(mentor_id)
+    if not mentor:
+        return jsonify({'success': False, 'error': 'Mentor nie został znaleziony'})
+    
+    try:
+        job = chat_jobs.submit({
+            'mentor_id': mentor.id,
+            'mentor_name': mentor.name,
+            'message': user_message,
+            'use_cache': not wants_fresh_response(data),
+            'session_key': llm_session_key()
+        })
+    except JobQueueFull as e:
+        return queue_full_response(e)
+    
+    response = jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/chat/jobs/{job.id}'
+    return response
+
+@app.route('/api/chat/jobs/<job_id>', methods=['GET', 'DELETE'])
+def api_chat_job_detail(job_id):
+    """Stan zadania (z opcjonalnym long-pollingiem ?wait=<s>) lub anulowanie"""
+    if request.method == 'DELETE':
+        job = chat_jobs.cancel(job_id)
+    else:
+        wait = min(request.args.get('wait', 0, type=float), CHAT_JOBS['max_poll_wait'])
+        job = chat_jobs.wait(job_id, wait) if wait > 0 else chat_jobs.get(job_id)
+    
+    if job is None:
+        response = jsonify({'success': False, 'error': 'Zadanie nie zostało znalezione'})
+        response.status_code = 404
+        return response
+    
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/api/chat/history')
+def api_chat_history():
+    """Historia czatu z mentorem stronami (kursor before = starsze wiadomości)"""
+    mentor_id = request.args.get('mentor_id', type=int)
+    if not mentor_id:
+        return jsonify({'success': False, 'error': 'Brak mentor_id'})
+    
+    limit, before, after = page_args()
+    chat_log.flush()
+    
+    try:
+        messages, page = keyset_page(
+            ChatMessage.query.filter_by(mentor_id=mentor_id),
+            ChatMessage.timestamp, ChatMessage.id,
+            descending=False, limit=limit or CHAT_PAGE_SIZE,
+            before=before, after=after, tail=True
+        )
+    except InvalidCursor:
+        return invalid_cursor_response()
+    
+    return jsonify({
+        'success': True,
+        'messages': [serialize_chat_message(message) for message in messages],
+        'page': page
+    })
+
+def llm_session_key():
+    """Klucz sesji w sprawiedliwej kolejce modelu - losowy identyfikator w ciasteczku sesji.
+    
+    Klient bez ciasteczka (skrypt, pierwsze żądanie) dostałby nowy klucz przy
+    każdym żądaniu i omijał limit kolejki na sesję - liczy się wtedy jego adres IP.
+    """
+    if 'llm_session' not in session:
+        session['llm_session'] = uuid.uuid4().hex
+    if app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+        return f'ip:{request.remote_addr}'
+    return session['llm_session']
+
+def client_request_scope():
+    """Wywołania modelu w żądaniu: sesja klienta, klasa interactive, anulowanie po rozłączeniu"""
+    return request_scope(llm_session_key(), INTERACTIVE, disconnect_probe(request.environ))
+
+def cancelled_response():
+    """Klient rozłączył się w trakcie czekania - odpowiedź i tak nie zostanie odebrana"""
+    logger.info("Klient zrezygnował z odpowiedzi mentora - generacja przerwana")
+    response = jsonify({'success': False, 'error': 'Żądanie zostało anulowane'})
+    response.status_code = 499
+    return response
+
+def wants_fresh_response(data):
+    """Czy klient prosi o świeżą odpowiedź z pominięciem cache"""
+    if data.get('fresh'):
+        return True
+    return 'no-cache' in request.headers.get('Cache-Control', '')
+
+def queue_full_response(error):
+    """Odpowiedź 429 gdy kolejka modelu jest pełna"""
+    logger.warning(f"Odrzucono żądanie - {error}")
+    response = jsonify({
+        'success': False,
+        'error': 'Mentorzy są teraz zajęci. Spróbuj ponownie za chwilę.',
+        'retry_after': error.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def sse_event(event, payload):
+    """Formatowanie pojedynczego zdarzenia Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """Czat w trybie strumieniowym (SSE) - tokeny wysyłane na bieżąco"""
+    data = request.get_json() or {}
+    mentor_id = data.get('mentor_id')
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'success': False, 'error': 'Wiadomość nie może być pusta'})
+    
+    mentor = Mentor.query.get(mentor_id)
+    if not mentor:
+        return jsonify({'success': False, 'error': 'Mentor nie został znaleziony'})
+    
+    mentor_name = mentor.name
+    use_cache = not wants_fresh_response(data)
+    conversation = load_conversation(mentor.id)
+    # Ciasteczko sesji musi trafić do nagłówków przed strumieniem
+    session_key = llm_session_key()
+    
+    # Szybkie odrzucenie zanim wyślemy nagłówki strumienia
+    try:
+        llm_client.check_capacity(LANGUAGE_MODELS['ollama']['model'], RequestScope(session_key))
+    except LLMQueueFull as e:
+        return queue_full_response(e)
+    
+    def generate():
+        tokens = []
+        generation = {}
+        tokens_stream = stream_mentor_response(
+            mentor_name, user_message, conversation, use_cache=use_cache, result=generation
+        )
+        try:
+            with client_request_scope():
+                for token in tokens_stream:
+                    tokens.append(token)
+                    yield sse_event('token', {'token': token})
+        except LLMQueueFull as e:
+            yield sse_event('error', {'success': False, 'error': 'Mentorzy są teraz zajęci. Spróbuj ponownie za chwilę.',
+                                      'retry_after': e.retry_after})
+            return
+        except LLMCancelled:
+            logger.info(f"Klient zrezygnował ze strumienia mentora {mentor_name}")
+            return
+        finally:
+            # Przy rozłączeniu klienta zamykamy strumień Ollama natychmiast
+            tokens_stream.close()
+        
+        mentor_response = ''.join(tokens).strip()
+        try:
+            # Zapisz wiadomość dopiero po zakończeniu strumienia
+            chat_message = save_chat_message(mentor.id, user_message, mentor_response, generation)
+            
+            yield sse_event('done', {
+                'success': True,
+                'response': mentor_response,
+                'timestamp': chat_message.timestamp.isoformat()
+            })
+        except Exception as e:
+            logger.error(f"Błąd przy zapisie wiadomości ze strumienia: {str(e)}")
+            db.session.rollback()
+            yield sse_event('error', {'success': False, 'error': 'Wystąpił błąd serwera'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Kolumny list - wiersze jako krotki zamiast obiektów ORM (ten sam kształt co serialize_*)
+TASK_FIELDS = ('id', 'title', 'description', 'priority', 'status', 'due_date', 'created_at', 'completed_at', 'mentor_id')
+TASK_TIMESTAMPS = ('due_date', 'created_at', 'completed_at')
+TASK_DERIVED = {'is_completed': lambda task: task['status'] == 'completed'}
+
+def serialize_task(task):
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'priority': task.priority,
+        'status': task.status,
+        'is_completed': task.status == 'completed',  # Dodaj is_completed dla frontend
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+        'created_at': task.created_at.isoformat(),
+        'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+        'mentor_id': task.mentor_id
+    }
+
 @app.route('/api/tasks', methods=['GET', 'POST'])
+@conditional_collection('tasks')
 def api_tasks():
     if request.method == 'GET':
-        tasks = Task.query.order_by(Task.created_at.desc()).all()
-        tasks_data = []
-        for task in tasks:
-            tasks_data.append({
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'priority': task.priority,
-                'status': task.status,
-                'is_completed': task.status == 'completed',  # Dodaj is_completed dla frontend
-                'due_date': task.due_date.isoformat() if task.due_date else None,
-                'created_at': task.created_at.isoformat(),
-                'completed_at': task.completed_at.isoformat() if task.completed_at else None,
-                'mentor_id': task.mentor_id
-            })
-        return jsonify({'success': True, 'tasks': tasks_data})
+        # Token przed danymi - zmiany w trakcie odczytu klient dostanie z /api/sync
+        sync_token = current_token(db.session)
+        query = db.session.query(*projection(Task, TASK_FIELDS, TASK_TIMESTAMPS))
+        try:
+            rows, page = paginated_query(query, Task.created_at, Task.id, descending=True)
+        except InvalidCursor:
+            return invalid_cursor_response()
+        tasks_data = rows_to_dicts(rows, TASK_FIELDS, TASK_TIMESTAMPS, TASK_DERIVED)
+        return payload_response({'success': True, 'tasks': tasks_data, 'page': page, 'sync_token': sync_token}, request)
     
     elif request.method == 'POST':
         try:
@@ -457,22 +2038,32 @@ def api_task_complete(task_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': 'Błąd podczas aktualizacji'})
 
+NOTE_FIELDS = ('id', 'title', 'content', 'category', 'tags', 'created_at', 'updated_at')
+NOTE_TIMESTAMPS = ('created_at', 'updated_at')
+
+def serialize_note(note):
+    return {
+        'id': note.id,
+        'title': note.title,
+        'content': note.content,
+        'category': note.category,
+        'tags': note.tags,
+        'created_at': note.created_at.isoformat(),
+        'updated_at': note.updated_at.isoformat()
+    }
+
 @app.route('/api/notes', methods=['GET', 'POST'])
+@conditional_collection('notes')
 def api_notes():
     if request.method == 'GET':
-        notes = Note.query.order_by(Note.updated_at.desc()).all()
-        notes_data = []
-        for note in notes:
-            notes_data.append({
-                'id': note.id,
-                'title': note.title,
-                'content': note.content,
-                'category': note.category,
-                'tags': note.tags,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat()
-            })
-        return jsonify({'success': True, 'notes': notes_data})
+        sync_token = current_token(db.session)
+        query = db.session.query(*projection(Note, NOTE_FIELDS, NOTE_TIMESTAMPS))
+        try:
+            rows, page = paginated_query(query, Note.updated_at, Note.id, descending=True)
+        except InvalidCursor:
+            return invalid_cursor_response()
+        notes_data = rows_to_dicts(rows, NOTE_FIELDS, NOTE_TIMESTAMPS)
+        return payload_response({'success': True, 'notes': notes_data, 'page': page, 'sync_token': sync_token}, request)
     
     elif request.method == 'POST':
         try:
@@ -495,6 +2086,64 @@ def api_notes():
             db.session.rollback()
             return jsonify({'success': False, 'error': 'Błąd podczas dodawania notatki'})
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+@app.route('/api/notes/import', methods=['POST'])
+def api_notes_import():
+    """Import notatek z eksportu JSON lub NDJSON - parsowanie strumieniowe, zapis paczkami"""
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'ndjson' if request.mimetype in NDJSON_MIMETYPES else 'json'
+    dedupe = request.args.get('dedupe', 'true').lower() not in ('0', 'false', 'no')
+    
+    items = iter_ndjson_notes(request.stream) if fmt == 'ndjson' else iter_json_notes(request.stream)
+    
+    try:
+        counts = import_notes(db.session, Note.__table__, items, dedupe=dedupe)
+    except ImportFormatError as e:
+        db.session.rollback()
+        logger.warning(f"Nieprawidłowy plik importu notatek: {str(e)}")
+        return jsonify({'success': False, 'error': f'Nieprawidłowy format pliku: {str(e)}'})
+    except Exception as e:
+        logger.error(f"Błąd przy imporcie notatek: {str(e)}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'Błąd podczas importu notatek'})
+    
+    logger.info(f"Import notatek: {counts}")
+    return jsonify(dict(counts, success=True))
+
+@app.route('/api/notes/search')
+def api_notes_search():
+    """Wyszukiwanie pełnotekstowe notatek (FTS5, ranking bm25)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Podaj frazę do wyszukania'})
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    
+    try:
+        results, has_more = search_notes(
+            db.session, query,
+            category=request.args.get('category') or None,
+            tag=request.args.get('tag') or None,
+            limit=limit, offset=offset
+        )
+    except Exception as e:
+        logger.error(f"Błąd wyszukiwania notatek: {str(e)}")
+        return jsonify({'success': False, 'error': 'Błąd podczas wyszukiwania'})
+    
+    return jsonify({
+        'success': True,
+        'notes': results,
+        'page': {
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more,
+            'next_offset': offset + limit if has_more else None
+        }
+    })
+
 @app.route('/api/notes/<int:note_id>', methods=['PUT', 'DELETE'])
 def api_note_detail(note_id):
     note = Note.query.get_or_404(note_id)
@@ -528,80 +2177,361 @@ def api_note_detail(note_id):
             db.session.rollback()
             return jsonify({'success': False, 'error': 'Błąd podczas usuwania'})
 
+# Zakresy dat kalendarza
+MAX_EVENT_RANGE_DAYS = 366
+UPCOMING_DAYS = 7
+UPCOMING_LIMIT = 20
+
+EVENT_FIELDS = ('id', 'title', 'description', 'start_date', 'end_date', 'event_type', 'recurrence', 'created_at')
+EVENT_TIMESTAMPS = ('start_date', 'end_date', 'created_at')
+EVENT_DERIVED = {'series_start': lambda event: event['start_date'] if event['recurrence'] else None}
+
+def serialize_event(event, start=None):
+    """Wydarzenie jako słownik; dla serii `start` to początek konkretnego wystąpienia"""
+    start = start or event.start_date
+    end = event.end_date + (start - event.start_date) if event.end_date else None
+    return {
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat() if end else None,
+        'event_type': event.event_type,
+        'recurrence': event.recurrence,
+        'series_start': event.start_date.isoformat() if event.recurrence else None,
+        'created_at': event.created_at.isoformat()
+    }
+
+def events_in_range(range_start, range_end):
+    """Wydarzenia nachodzące na okno [range_start, range_end) z rozwiniętymi seriami.
+
+    Serie cykliczne są zapisane raz i rozwijane tylko w obrębie okna.
+    """
+    # Dwa zapytania zamiast OR, żeby każde używało własnego indeksu: wydarzenia
+    # zaczynające się w oknie (start_date) i trwające od wcześniej (end_date)
+    # Pojedyncze wydarzenia (większość wyników) jako krotki kolumn - bez obiektów ORM
+    columns = projection(Event, EVENT_FIELDS, EVENT_TIMESTAMPS)
+    starting = db.session.query(*columns).filter(
+        Event.recurrence.is_(None),
+        Event.start_date >= range_start,
+        Event.start_date < range_end
+    )
+    ongoing = db.session.query(*columns).filter(
+        Event.recurrence.is_(None),
+        Event.end_date >= range_start,
+        Event.start_date < range_start
+    )
+    events = rows_to_dicts(starting.all() + ongoing.all(), EVENT_FIELDS, EVENT_TIMESTAMPS, EVENT_DERIVED)
+
+    series = Event.query.filter(
+        Event.recurrence.isnot(None),
+        Event.start_date < range_end,
+        db.or_(Event.recurrence_until.is_(None), Event.recurrence_until >= range_start)
+    )
+    for event in series:
+        events.extend(expand_series(event, range_start, range_end))
+
+    events.sort(key=lambda item: (item['start_date'], item['id']))
+    return events
+
+def expand_series(event, range_start, range_end):
+    """Wystąpienia serii cyklicznej w oknie [range_start, range_end)"""
+    try:
+        rule = RecurrenceRule.parse(event.recurrence)
+    except InvalidRule:
+        logger.warning(f"Pominięto wydarzenie {event.id} z nieprawidłową regułą: {event.recurrence}")
+        return []
+    duration = (event.end_date - event.start_date) if event.end_date else timedelta(0)
+    return [serialize_event(event, occurrence)
+            for occurrence in rule.between(event.start_date, duration, range_start, range_end)]
+
+def event_in_range(event, range_start, range_end):
+    """Jedno wydarzenie w oknie - te same warunki co events_in_range"""
+    if event.recurrence:
+        return expand_series(event, range_start, range_end)
+    starts_inside = range_start <= event.start_date < range_end
+    ongoing = event.start_date < range_start and event.end_date is not None and event.end_date >= range_start
+    return [serialize_event(event)] if starts_inside or ongoing else []
+
+def apply_event_data(event, data):
+    """Przepisanie pól z żądania; reguła powtarzania jest normalizowana i walidowana"""
+    event.title = data.get('title', event.title)
+    event.description = data.get('description', event.description or '')
+    event.event_type = data.get('event_type', event.event_type or 'meeting')
+    if data.get('start_date'):
+        event.start_date = datetime.fromisoformat(data['start_date'])
+    if 'end_date' in data:
+        event.end_date = datetime.fromisoformat(data['end_date']) if data['end_date'] else None
+
+    if 'recurrence' in data:
+        event.recurrence = RecurrenceRule.parse(data['recurrence']).to_string() if data['recurrence'] else None
+
+    event.recurrence_until = None
+    if event.recurrence:
+        last = RecurrenceRule.parse(event.recurrence).last_occurrence(event.start_date)
+        if last is not None:
+            event.recurrence_until = last + ((event.end_date - event.start_date) if event.end_date else timedelta(0))
+
+def event_range_args():
+    """Okno from/to z query stringa (ValueError z komunikatem dla klienta)"""
+    try:
+        range_start = parse_range_bound(request.args.get('from'))
+        range_end = parse_range_bound(request.args.get('to'), end=True)
+    except ValueError:
+        range_start = range_end = None
+    if range_start is None or range_end is None or range_end <= range_start:
+        raise ValueError('Podaj poprawny zakres dat from i to')
+    if range_end - range_start > timedelta(days=MAX_EVENT_RANGE_DAYS):
+        raise ValueError(f'Zakres nie może przekraczać {MAX_EVENT_RANGE_DAYS} dni')
+    return range_start, range_end
+
+def invalid_range_response(error):
+    response = jsonify({'success': False, 'error': str(error)})
+    response.status_code = 400
+    return response
+
+def invalid_rule_response(error):
+    response = jsonify({'success': False, 'error': f'Nieprawidłowa reguła powtarzania: {str(error)}'})
+    response.status_code = 400
+    return response
+
 @app.route('/api/events', methods=['GET', 'POST'])
+@conditional_collection('events')
 def api_events():
     if request.method == 'GET':
-        events = Event.query.order_by(Event.start_date).all()
-        events_data = []
-        for event in events:
-            events_data.append({
-                'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'start_date': event.start_date.isoformat(),
-                'end_date': event.end_date.isoformat() if event.end_date else None,
-                'event_type': event.event_type,
-                'created_at': event.created_at.isoformat()
-            })
-        return jsonify({'success': True, 'events': events_data})
+        sync_token = current_token(db.session)
+        if 'from' in request.args or 'to' in request.args:
+            try:
+                range_start, range_end = event_range_args()
+            except ValueError as e:
+                return invalid_range_response(e)
+            return payload_response({
+                'success': True,
+                'events': events_in_range(range_start, range_end),
+                'range': {'from': range_start.isoformat(), 'to': range_end.isoformat()},
+                'sync_token': sync_token
+            }, request)
+
+        query = db.session.query(*projection(Event, EVENT_FIELDS, EVENT_TIMESTAMPS))
+        try:
+            rows, page = paginated_query(query, Event.start_date, Event.id, descending=False)
+        except InvalidCursor:
+            return invalid_cursor_response()
+        events_data = rows_to_dicts(rows, EVENT_FIELDS, EVENT_TIMESTAMPS, EVENT_DERIVED)
+        return payload_response({'success': True, 'events': events_data, 'page': page, 'sync_token': sync_token}, request)
     
     elif request.method == 'POST':
         try:
             data = request.get_json()
             
-            event = Event(
-                title=data.get('title'),
-                description=data.get('description', ''),
-                start_date=datetime.fromisoformat(data['start_date']),
-                end_date=datetime.fromisoformat(data['end_date']) if data.get('end_date') else None,
-                event_type=data.get('event_type', 'meeting')
-            )
+            event = Event()
+            apply_event_data(event, data)
             
             db.session.add(event)
             db.session.commit()
             
             return jsonify({'success': True, 'event_id': event.id})
             
+        except InvalidRule as e:
+            db.session.rollback()
+            return invalid_rule_response(e)
         except Exception as e:
             logger.error(f"Błąd przy dodawaniu wydarzenia: {str(e)}")
             db.session.rollback()
             return jsonify({'success': False, 'error': 'Błąd podczas dodawania wydarzenia'})
 
-@app.route('/api/health')
-def api_health():
-    """Endpoint do sprawdzania zdrowia aplikacji i dostępności Ollama"""
-    health_status = {
-        'app': 'healthy',
-        'database': 'unknown',
-        'ollama': 'unknown'
-    }
+@app.route('/api/events/upcoming')
+def api_events_upcoming():
+    """Najbliższe wydarzenia (domyślnie 7 dni) razem z wystąpieniami serii"""
+    days = min(max(request.args.get('days', UPCOMING_DAYS, type=int), 1), MAX_EVENT_RANGE_DAYS)
+    limit = min(max(request.args.get('limit', UPCOMING_LIMIT, type=int), 1), MAX_PAGE_SIZE)
+    now = datetime.now()
+    events = events_in_range(now, now + timedelta(days=days))
+    return jsonify({'success': True, 'events': events[:limit], 'has_more': len(events) > limit})
+
+@app.route('/api/events/<int:event_id>', methods=['PUT', 'DELETE'])
+def api_event_detail(event_id):
+    event = Event.query.get_or_404(event_id)
     
-    # Sprawdź bazę danych
-    try:
-        db.session.execute('SELECT 1')
-        health_status['database'] = 'healthy'
-    except Exception as e:
-        health_status['database'] = f'error: {str(e)}'
+    if request.method == 'PUT':
+        try:
+            apply_event_data(event, request.get_json())
+            db.session.commit()
+            return jsonify({'success': True})
+            
+        except InvalidRule as e:
+            db.session.rollback()
+            return invalid_rule_response(e)
+        except Exception as e:
+            logger.error(f"Błąd przy aktualizacji wydarzenia: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Błąd podczas aktualizacji'})
+    
+    elif request.method == 'DELETE':
+        try:
+            db.session.delete(event)
+            db.session.commit()
+            return jsonify({'success': True})
+            
+        except Exception as e:
+            logger.error(f"Błąd przy usuwaniu wydarzenia: {str(e)}")
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Błąd podczas usuwania'})
+
+# Źródła eksportu: model, kolumna filtrowania po dacie i pola wyliczane
+EXPORT_SOURCES = {
+    'chat': {'model': ChatMessage, 'date_column': 'timestamp'},
+    'tasks': {
+        'model': Task,
+        'date_column': 'created_at',
+        'derived': TASK_DERIVED
+    },
+    'notes': {'model': Note, 'date_column': 'updated_at'},
+    'events': {'model': Event, 'date_column': 'start_date'}
+}
+
+def parse_range_bound(value, end=False):
+    """Granica zakresu dat z query stringa; sama data jako koniec obejmuje cały dzień"""
+    if not value:
+        return None
+    bound = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return bound
+
+# Synchronizacja przyrostowa - klient pobiera tylko zmiany od ostatniego tokenu
+SYNC_PAGE_SIZE = 500
+
+SYNC_SERIALIZERS = {
+    'tasks': (Task, serialize_task),
+    'notes': (Note, serialize_note),
+    'events': (Event, serialize_event)
+}
+
+@app.route('/api/sync')
+def api_sync():
+    """Zmiany zadań, notatek i wydarzeń od tokenu `since` (z listami usuniętych id).
+
+    Klient usuwa lokalnie elementy z `ids` i dodaje `upserted`. Z parametrami
+    from/to wydarzenia przychodzą jako wystąpienia w tym oknie (jak w /api/events).
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'success': False, 'error': 'Podaj token since z poprzedniej odpowiedzi'})
+    
+    requested = request.args.get('entities')
+    entities = [name.strip() for name in requested.split(',')] if requested else list(SYNC_ENTITIES)
+    if not entities or any(name not in SYNC_ENTITIES for name in entities):
+        return jsonify({'success': False, 'error': f"Dostępne encje: {', '.join(SYNC_ENTITIES)}"})
+    
+    event_range = None
+    if 'events' in entities and ('from' in request.args or 'to' in request.args):
+        try:
+            event_range = event_range_args()
+        except ValueError as e:
+            return invalid_range_response(e)
+    
+    limit = max(1, min(request.args.get('limit', SYNC_PAGE_SIZE, type=int), SYNC_PAGE_SIZE))
+    changes, token, has_more, reset = changes_since(db.session, since, entities, limit)
+    
+    result = {name: {'ids': [], 'upserted': [], 'deleted': []} for name in entities}
+    changed = {}
+    for entity, item_id, deleted in changes:
+        result[entity]['ids'].append(item_id)
+        if deleted:
+            result[entity]['deleted'].append(item_id)
+        else:
+            changed.setdefault(entity, []).append(item_id)
+    
+    for entity, ids in changed.items():
+        model, serialize = SYNC_SERIALIZERS[entity]
+        for item in model.query.filter(model.id.in_(ids)):
+            if entity == 'events' and event_range:
+                result[entity]['upserted'].extend(event_in_range(item, *event_range))
+            else:
+                result[entity]['upserted'].append(serialize(item))
+    
+    return jsonify({
+        'success': True,
+        'token': token,
+        'has_more': has_more,
+        'reset': reset,
+        'changes': result
+    })
+
+@app.route('/api/export/<entity>')
+def api_export(entity):
+    """Strumieniowy eksport (NDJSON/CSV, opcjonalnie gzip) ze stałym zużyciem pamięci"""
+    source = EXPORT_SOURCES.get(entity)
+    if source is None:
+        response = jsonify({'success': False, 'error': 'Nieznany typ eksportu'})
+        response.status_code = 404
+        return response
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        response = jsonify({'success': False, 'error': 'Obsługiwane formaty: ndjson, csv'})
+        response.status_code = 400
+        return response
     
-    # Sprawdź Ollama
     try:
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
-        if response.status_code == 200:
-            health_status['ollama'] = 'healthy'
-            models = response.json()
-            health_status['available_models'] = [model.get('name', 'unknown') for model in models.get('models', [])]
+        date_from = parse_range_bound(request.args.get('from'))
+        date_to = parse_range_bound(request.args.get('to'), end=True)
+    except ValueError:
+        response = jsonify({'success': False, 'error': 'Nieprawidłowy format daty (oczekiwano ISO 8601)'})
+        response.status_code = 400
+        return response
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    if entity == 'chat':
+        chat_log.flush()
+    table = source['model'].__table__
+    date_column = table.c[source['date_column']]
+    derived = source.get('derived', {})
+    columns = [column.name for column in table.columns]
+    
+    stmt = db.select(table).order_by(date_column, table.c.id)
+    if date_from:
+        stmt = stmt.where(date_column >= date_from)
+    if date_to:
+        stmt = stmt.where(date_column < date_to)
+    if entity == 'chat' and request.args.get('mentor_id', type=int):
+        stmt = stmt.where(table.c.mentor_id == request.args.get('mentor_id', type=int))
+    
+    def generate():
+        # yield_per - wiersze pobierane z kursora partiami, nie cała tabela naraz
+        result = db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+        items = iter_row_dicts(result, columns, derived)
+        if fmt == 'ndjson':
+            chunks = iter_ndjson(items)
         else:
-            health_status['ollama'] = f'http_error: {response.status_code}'
-    except Exception as e:
-        health_status['ollama'] = f'connection_error: {str(e)}'
+            chunks = iter_csv(items, columns + list(derived))
+        yield from (iter_gzip(chunks) if compress else iter_encoded(chunks))
     
-    return jsonify(health_status)
+    filename = f"{entity}_{datetime.utcnow().strftime('%Y-%m-%d')}.{fmt}"
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 if __name__ == '__main__':
+    # Serwer deweloperski - produkcyjnie wielu workerów uruchamia server.py
+    create_app()
     with app.app_context():
         init_db()
+    start_worker()
+    
+    # SIGTERM kończy proces przez SystemExit - handlery atexit dokańczają generacje i zapisują wiadomości
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     logger.info("Uruchamianie aplikacji Flask...")
     logger.info("Sprawdź status Ollama: http://localhost:5002/api/health")
     
-    app.run(debug=True, host='0.0.0.0', port=5002)
+    # Bez debugera i reloadera - reloader uruchamiałby start_worker() i handlery sygnałów drugi raz
+    app.run(host='0.0.0.0', port=5002)
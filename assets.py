@@ -0,0 +1,250 @@
+"""Zasoby statyczne z odciskiem treści - minifikacja CSS/JS, warianty gzip/brotli i zdjęcia WebP/AVIF.
+
+Build (flask --app wsgi build-assets) zapisuje do static/dist pliki z hashem
+treści w nazwie (css/chat.3f2a9c81d0e4.css) i manifest.json, z którego
+szablony biorą adresy. Zmiana pliku daje nowy adres, więc odpowiedzi mogą
+mieć Cache-Control: immutable. Pliki tekstowe mają obok gotowe warianty
+.gz i .br, a zdjęcia są przeskalowane do kilku szerokości w AVIF, WebP i JPEG.
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import shutil
+
+from flask import send_from_directory
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny - bez niego build tworzy tylko warianty .gz
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:  # rcssmin jest opcjonalny - CSS dostaje tylko hash i kompresję
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # rjsmin jest opcjonalny - JS dostaje tylko hash i kompresję
+    rjsmin = None
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow jest opcjonalny - zdjęcia są kopiowane z hashem bez przeskalowania
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE = ('.css', '.js', '.svg')
+PHOTOS = ('.jpg', '.jpeg', '.png')
+# Format obrazu -> (typ MIME, parametry zapisu Pillow); kolejność = kolejność <source>
+IMAGE_FORMATS = {
+    'avif': ('image/avif', {'quality': 55}),
+    'webp': ('image/webp', {'quality': 78, 'method': 6}),
+    'jpeg': ('image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True})
+}
+
+
+def minify(relpath, data):
+    """Minifikacja CSS/JS (bez zmian, gdy brak minifikatora albo inny typ pliku)"""
+    extension = os.path.splitext(relpath)[1]
+    if extension == '.css' and rcssmin is not None:
+        return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+    if extension == '.js' and rjsmin is not None:
+        return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def fingerprint(relpath, data):
+    """Ścieżka z hashem treści przed rozszerzeniem: css/chat.css -> css/chat.3f2a9c81d0e4.css"""
+    stem, extension = os.path.splitext(relpath)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f'{stem}.{digest}{extension}'
+
+
+def _write(output_dir, relpath, data):
+    path = os.path.join(output_dir, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _precompress(output_dir, relpath, data, stats):
+    """Warianty .gz i .br obok pliku - zapisywane tylko, gdy są mniejsze od oryginału"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            _write(output_dir, relpath + suffix, compressed)
+            stats[suffix] += len(compressed)
+        else:
+            stats[suffix] += len(data)
+
+
+def _image_formats():
+    if Image is None:
+        return []
+    return [name for name in IMAGE_FORMATS if name == 'jpeg' or features.check(name)]
+
+
+def _photo_variants(source_path, relpath, output_dir, widths):
+    """Zdjęcie przeskalowane do `widths` w dostępnych formatach: format -> [(ścieżka, szerokość)]"""
+    variants = {}
+    with Image.open(source_path) as original:
+        image = original.convert('RGB')
+    stem = os.path.splitext(relpath)[0]
+    # Szerokości większe od oryginału nic nie dają - zostaje najwyżej oryginalna
+    targets = sorted({min(width, image.width) for width in widths})
+    for width in targets:
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for name in _image_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, format=name.upper(), **IMAGE_FORMATS[name][1])
+            data = buffer.getvalue()
+            variant = fingerprint(f'{stem}-{width}.{"jpg" if name == "jpeg" else name}', data)
+            _write(output_dir, variant, data)
+            variants.setdefault(name, []).append((variant, width))
+    return variants
+
+
+def build_assets(static_dir, output_dir, image_widths=(96, 160, 240)):
+    """Zbudowanie static/dist od nowa; zwraca statystyki rozmiarów (bajty) do porównania"""
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    manifest = {'files': {}, 'images': {}}
+    stats = {'files': 0, 'source': 0, 'minified': 0, '.gz': 0, '.br': 0, 'photos': 0, 'photos_source': 0}
+
+    for root, dirs, files in os.walk(static_dir):
+        # Katalog wynikowy leży w static - nie przetwarzamy poprzedniego buildu
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != os.path.normpath(output_dir))
+        for name in sorted(files):
+            source_path = os.path.join(root, name)
+            relpath = os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+            extension = os.path.splitext(name)[1].lower()
+            with open(source_path, 'rb') as f:
+                data = f.read()
+
+            if extension in PHOTOS and Image is not None:
+                variants = _photo_variants(source_path, relpath, output_dir, image_widths)
+                fallback = variants['jpeg'][-1][0]
+                manifest['files'][relpath] = fallback
+                manifest['images'][relpath] = variants
+                stats['photos_source'] += len(data)
+                # Największy wariant w najlepszym formacie - tyle pobiera przeglądarka z AVIF/WebP
+                best = variants[_image_formats()[0]][-1][0]
+                stats['photos'] += os.path.getsize(os.path.join(output_dir, best))
+                continue
+
+            output = minify(relpath, data)
+            hashed = fingerprint(relpath, output)
+            _write(output_dir, hashed, output)
+            manifest['files'][relpath] = hashed
+            if extension in COMPRESSIBLE:
+                stats['files'] += 1
+                stats['source'] += len(data)
+                stats['minified'] += len(output)
+                _precompress(output_dir, hashed, output, stats)
+
+    with open(os.path.join(output_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if rcssmin is None or rjsmin is None:
+        logger.info("Brak rcssmin/rjsmin - część plików bez minifikacji")
+    if Image is None:
+        logger.info("Brak Pillow - zdjęcia bez wariantów WebP/AVIF")
+    return stats
+
+
+class StaticAssets:
+    """Adresy zasobów z manifestu buildu i serwowanie ich z gotową kompresją.
+
+    Bez manifestu (brak buildu albo enabled=False) adresy wskazują pliki
+    źródłowe w static - wygodne przy pracy nad CSS/JS.
+    """
+
+    def __init__(self, static_dir, output_dir, max_age=365 * 24 * 3600):
+        self.static_dir = static_dir
+        self.output_dir = output_dir
+        self.max_age = max_age
+        self.prefix = os.path.relpath(output_dir, static_dir).replace(os.sep, '/')
+        self._files = {}
+        self._images = {}
+
+    @property
+    def built(self):
+        return bool(self._files)
+
+    def load(self, enabled=True):
+        """Wczytanie manifestu; False gdy zasoby będą serwowane z plików źródłowych"""
+        self._files, self._images = {}, {}
+        path = os.path.join(self.output_dir, MANIFEST)
+        if not enabled:
+            return False
+        if not os.path.exists(path):
+            logger.info("Brak zbudowanych zasobów statycznych (flask build-assets) - używam plików źródłowych")
+            return False
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self._files = manifest.get('files', {})
+        self._images = manifest.get('images', {})
+        return True
+
+    def path(self, relpath):
+        """Ścieżka względem static do użycia w url_for('static', filename=...)"""
+        hashed = self._files.get(relpath)
+        return f'{self.prefix}/{hashed}' if hashed else relpath
+
+    def image(self, relpath):
+        """Warianty zdjęcia do <picture>: src, srcset i źródła [(typ MIME, srcset)] ze ścieżkami względem static.
+
+        None gdy pliku nie ma - szablon pokazuje wtedy zastępczą grafikę.
+        """
+        variants = self._images.get(relpath)
+        if variants is None:
+            if not os.path.isfile(os.path.join(self.static_dir, relpath)):
+                return None
+            return {'src': self.path(relpath), 'srcset': None, 'sources': []}
+
+        def srcset(entries):
+            return [(f'{self.prefix}/{path}', width) for path, width in entries]
+
+        return {
+            'src': f"{self.prefix}/{variants['jpeg'][-1][0]}",
+            'srcset': srcset(variants['jpeg']),
+            'sources': [(IMAGE_FORMATS[name][0], srcset(variants[name]))
+                        for name in IMAGE_FORMATS if name != 'jpeg' and name in variants]
+        }
+
+    def response(self, filename, request):
+        """Plik z katalogu buildu - wariant .br/.gz wg Accept-Encoding, Cache-Control: immutable"""
+        if filename == MANIFEST:
+            # Manifest nie ma hasha w nazwie i czyta go tylko serwer - nie może trafić do cache na rok
+            raise NotFound()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        compressible = filename.endswith(COMPRESSIBLE)
+        if compressible:
+            accepted = request.accept_encodings
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if accepted.quality(candidate) > 0 and os.path.isfile(os.path.join(self.output_dir, filename + suffix)):
+                    encoding = candidate
+                    filename += suffix
+                    break
+
+        response = send_from_directory(self.output_dir, filename, mimetype=mimetype, max_age=self.max_age)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
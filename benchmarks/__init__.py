@@ -0,0 +1 @@
+"""Benchmarki obciążeniowe aplikacji z atrapą serwera Ollama"""
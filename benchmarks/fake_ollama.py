@@ -0,0 +1,236 @@
+"""Atrapa serwera Ollama - /api/tags, /api/generate (strumień i bez), /api/embed.
+
+Czas do pierwszego tokenu, szybkość generowania oraz odsetek błędów
+i timeoutów są konfigurowalne, więc wyniki nie zależą od GPU.
+
+    python -m benchmarks.fake_ollama --port 11435 --first-token-delay 0.2 --tokens-per-second 40
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ['To', ' jest', ' odpowiedź', ' mentora', ' z', ' atrapy', ' Ollama', '.', ' Trzymaj', ' się', ' planu', '!']
+
+
+class FakeOllamaConfig:
+    def __init__(self, first_token_delay=0.1, tokens_per_second=50.0, response_tokens=40, error_rate=0.0,
+                 timeout_rate=0.0, timeout_delay=120.0, models=('llama3.2:latest', 'llama2:latest', 'nomic-embed-text:latest'),
+                 embedding_dim=256, seed=None):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.models = list(models)
+        self.embedding_dim = embedding_dim
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self):
+        """'error', 'timeout' albo None - losowanie pod blokadą (powtarzalne przy danym seed)"""
+        with self.lock:
+            value = self.random.random()
+        if value < self.error_rate:
+            return 'error'
+        if value < self.error_rate + self.timeout_rate:
+            return 'timeout'
+        return None
+
+    def to_dict(self):
+        return {
+            'first_token_delay': self.first_token_delay,
+            'tokens_per_second': self.tokens_per_second,
+            'response_tokens': self.response_tokens,
+            'error_rate': self.error_rate,
+            'timeout_rate': self.timeout_rate,
+            'models': self.models
+        }
+
+
+def _embedding(text, dim):
+    """Deterministyczny wektor z hasha tekstu"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    values = []
+    while len(values) < dim:
+        for byte in digest:
+            values.append(byte / 255.0 - 0.5)
+        digest = hashlib.sha256(digest).digest()
+    return values[:dim]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/api/tags'):
+            self._send_json({'models': [{'name': name} for name in self.config.models]})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path.startswith('/api/embed'):
+            inputs = payload.get('input') or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json({'embeddings': [_embedding(text, self.config.embedding_dim) for text in inputs]})
+            return
+        if not self.path.startswith('/api/generate'):
+            self._send_json({'error': 'not found'}, status=404)
+            return
+
+        if payload.get('model') not in self.config.models:
+            self._send_json({'error': f"model '{payload.get('model')}' not found"}, status=404)
+            return
+        # Pusty prompt = ładowanie modelu (warm-up)
+        if not payload.get('prompt'):
+            self._send_json({'model': payload['model'], 'response': '', 'done': True})
+            return
+
+        outcome = self.config.roll()
+        if outcome == 'timeout':
+            time.sleep(self.config.timeout_delay)
+        if outcome is not None:
+            self._send_json({'error': 'simulated failure'}, status=500)
+            return
+
+        if payload.get('stream', True):
+            self._stream(payload)
+        else:
+            self._blocking(payload)
+
+    def _stats(self, payload, started, eval_started):
+        prompt_tokens = len(payload.get('prompt', '')) // 4
+        now = time.perf_counter()
+        context = list(payload.get('context') or [])[-2048:] + list(range(prompt_tokens + self.config.response_tokens))
+        return {
+            'model': payload['model'],
+            'done': True,
+            'context': context[-4096:],
+            'total_duration': int((now - started) * 1e9),
+            'load_duration': 0,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int((eval_started - started) * 1e9),
+            'eval_count': self.config.response_tokens,
+            'eval_duration': int((now - eval_started) * 1e9)
+        }
+
+    def _tokens(self):
+        return [WORDS[i % len(WORDS)] for i in range(self.config.response_tokens)]
+
+    def _blocking(self, payload):
+        started = time.perf_counter()
+        time.sleep(self.config.first_token_delay)
+        eval_started = time.perf_counter()
+        time.sleep(self.config.response_tokens / self.config.tokens_per_second)
+        self._send_json(dict(self._stats(payload, started, eval_started), response=''.join(self._tokens())))
+
+    def _stream(self, payload):
+        started = time.perf_counter()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def chunk(obj):
+            data = (json.dumps(obj) + '\n').encode('utf-8')
+            self.wfile.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+
+        time.sleep(self.config.first_token_delay)
+        eval_started = time.perf_counter()
+        interval = 1.0 / self.config.tokens_per_second
+        try:
+            for token in self._tokens():
+                chunk({'model': payload['model'], 'response': token, 'done': False})
+                time.sleep(interval)
+            chunk(dict(self._stats(payload, started, eval_started), response=''))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient przerwał strumień
+            pass
+
+
+class FakeOllamaServer:
+    """Serwer w wątku w tle - start() zwraca bazowy URL"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or FakeOllamaConfig()
+        handler = type('Handler', (_Handler,), {'config': self.config})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_arguments(parser):
+    parser.add_argument('--first-token-delay', type=float, default=0.1, help='Sekundy do pierwszego tokenu')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--response-tokens', type=int, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Odsetek odpowiedzi HTTP 500')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Odsetek odpowiedzi po --timeout-delay')
+    parser.add_argument('--timeout-delay', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=1234)
+
+
+def config_from_args(args):
+    return FakeOllamaConfig(
+        first_token_delay=args.first_token_delay,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_delay=args.timeout_delay,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"Atrapa Ollama nasłuchuje na {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
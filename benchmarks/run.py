@@ -0,0 +1,313 @@
+"""Benchmark obciążeniowy - scenariusze HTTP na bazach z 1k/100k/1M wierszy.
+
+    python -m benchmarks.run --rows 1000 100000 --duration 20 --concurrency 8 --output bench.json
+
+Dla każdego rozmiaru bazy uruchamia aplikację (benchmarks.serve) z atrapą
+Ollama, wykonuje scenariusze w pętli zamkniętej (`concurrency` klientów
+przez `duration` sekund) i zapisuje percentyle opóźnień, przepustowość,
+błędy oraz szczytowe RSS procesu aplikacji jako JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.fake_ollama import FakeOllamaServer, add_arguments, config_from_args
+from benchmarks.seed import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MENTORS = 4
+
+
+def _month_range():
+    start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start.date().isoformat(), (start + timedelta(days=31)).date().isoformat()
+
+
+def chat_api(session, base_url, rng):
+    return session.post(f'{base_url}/api/chat', json={
+        'mentor_id': rng.randint(1, MENTORS),
+        'message': f'Jak mam zaplanować tydzień? ({rng.random():.6f})',
+        'fresh': True
+    })
+
+
+def chat_page(session, base_url, rng):
+    return session.get(f'{base_url}/chat', params={'mentor_id': rng.randint(1, MENTORS)})
+
+
+def tasks_api(session, base_url, rng):
+    return session.get(f'{base_url}/api/tasks', params={'limit': 50})
+
+
+def notes_api(session, base_url, rng):
+    return session.get(f'{base_url}/api/notes', params={'limit': 50})
+
+
+def events_api(session, base_url, rng):
+    range_start, range_end = _month_range()
+    return session.get(f'{base_url}/api/events', params={'from': range_start, 'to': range_end})
+
+
+SCENARIOS = {
+    'api_chat': chat_api,
+    'chat_page': chat_page,
+    'api_tasks': tasks_api,
+    'api_notes': notes_api,
+    'api_events': events_api
+}
+
+
+def percentile(values, fraction):
+    """Percentyl z interpolacją liniową (wartości posortowane)"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _is_success(response):
+    if response.status_code >= 400:
+        return False
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        return response.json().get('success', True) is not False
+    return True
+
+
+def run_scenario(base_url, request_fn, concurrency, duration, warmup, timeout, seed_value):
+    """Pętla zamknięta - każdy klient wysyła kolejne żądanie po odpowiedzi na poprzednie"""
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def client(index):
+        rng = random.Random(seed_value + index)
+        session = requests.Session()
+        session.request = _with_timeout(session.request, timeout)
+        while True:
+            request_started = time.perf_counter()
+            if request_started >= stop_at:
+                break
+            try:
+                response = request_fn(session, base_url, rng)
+                error = None if _is_success(response) else f'HTTP {response.status_code}'
+            except (requests.RequestException, ValueError) as e:
+                error = type(e).__name__
+            finished = time.perf_counter()
+            if request_started < measure_from or finished > stop_at:
+                continue
+            with lock:
+                if error is None:
+                    latencies.append(finished - request_started)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    failed = sum(errors.values())
+    result = {
+        'requests': len(latencies) + failed,
+        'errors': failed,
+        'error_types': errors,
+        'throughput_rps': round(len(latencies) / duration, 2)
+    }
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        value = percentile(latencies, fraction)
+        result[f'{name}_ms'] = round(value * 1000, 2) if value is not None else None
+    result['mean_ms'] = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None
+    result['max_ms'] = round(latencies[-1] * 1000, 2) if latencies else None
+    return result
+
+
+def _with_timeout(request, timeout):
+    def wrapper(method, url, **kwargs):
+        kwargs.setdefault('timeout', timeout)
+        return request(method, url, **kwargs)
+    return wrapper
+
+
+def peak_rss(pid):
+    """Szczytowe RSS procesu w bajtach (VmHWM z /proc, None poza Linuksem)"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """Aplikacja w osobnym procesie z własnym katalogiem roboczym (instance/, cache)"""
+
+    def __init__(self, db_path, ollama_url, workdir, retrieval=False, write_behind=False):
+        self.port = _free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        env = dict(os.environ)
+        env['DATABASE_URL'] = f'sqlite:///{os.path.abspath(db_path)}'
+        env['OLLAMA_URL'] = ollama_url
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        command = [sys.executable, '-m', 'benchmarks.serve', '--port', str(self.port)]
+        if retrieval:
+            command.append('--retrieval')
+        if write_behind:
+            command.append('--write-behind')
+        os.makedirs(workdir, exist_ok=True)
+        self.log = open(os.path.join(workdir, 'app.log'), 'w')
+        self.process = subprocess.Popen(command, cwd=workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Aplikacja zakończyła się przy starcie (log: {self.log.name})")
+            try:
+                if requests.get(f'{self.base_url}/api/health', timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Aplikacja nie wystartowała w {timeout}s (log: {self.log.name})")
+
+    def peak_rss(self):
+        return peak_rss(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_size(rows, args, ollama_url):
+    db_path = os.path.join(args.data_dir, f'bench-{rows}.db')
+    seed_seconds = seed_database(db_path, rows)
+    app_process = AppProcess(db_path, ollama_url, os.path.join(args.data_dir, f'app-{rows}'),
+                             args.retrieval, args.write_behind)
+    try:
+        app_process.wait_ready()
+        scenarios = {}
+        for name in args.scenarios:
+            print(f"[{rows}] {name}...", file=sys.stderr)
+            scenarios[name] = run_scenario(
+                app_process.base_url, SCENARIOS[name], args.concurrency, args.duration, args.warmup,
+                args.request_timeout, args.seed
+            )
+            # VmHWM rośnie monotonicznie - szczyt procesu do końca tego scenariusza
+            scenarios[name]['peak_rss_bytes'] = app_process.peak_rss()
+        peak = app_process.peak_rss()
+    finally:
+        app_process.stop()
+    if peak is None:
+        # Bez /proc: maksimum ze wszystkich zakończonych procesów potomnych (KiB na Linuksie)
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return {
+        'rows': rows,
+        'seed_seconds': round(seed_seconds, 2),
+        'db_size_bytes': os.path.getsize(db_path),
+        'peak_rss_bytes': peak,
+        'scenarios': scenarios
+    }
+
+
+def seed_database(db_path, rows):
+    """Seedowanie w osobnym procesie - create_app() konfiguruje aplikację raz na proces"""
+    started = time.perf_counter()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run([sys.executable, '-m', 'benchmarks.seed', '--db', os.path.abspath(db_path),
+                        '--rows', str(rows)], cwd=workdir, env=env, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='Rozmiary bazy (wiersze w każdej tabeli)')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8, help='Równolegli klienci')
+    parser.add_argument('--duration', type=float, default=20.0, help='Sekundy pomiaru na scenariusz')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Sekundy rozgrzewki (bez pomiaru)')
+    parser.add_argument('--request-timeout', type=float, default=60.0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'ai-mentors-bench'),
+                        help='Katalog na bazy (używane ponownie między uruchomieniami)')
+    parser.add_argument('--retrieval', action='store_true', help='Włącz wyszukiwanie semantyczne w aplikacji')
+    parser.add_argument('--write-behind', action='store_true', help='Zapis wiadomości czatu partiami w tle')
+    parser.add_argument('--output', help='Plik wynikowy JSON (domyślnie stdout)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    fake_ollama = FakeOllamaServer(config_from_args(args))
+    ollama_url = fake_ollama.start()
+    try:
+        results = [benchmark_size(rows, args, ollama_url) for rows in args.rows]
+    finally:
+        fake_ollama.stop()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'started_at': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'write_behind': args.write_behind,
+            'fake_ollama': fake_ollama.config.to_dict()
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Baza SQLite do benchmarków - schemat aplikacji i N wierszy w każdej tabeli.
+
+    python -m benchmarks.seed --db /tmp/bench-100000.db --rows 100000
+
+Schemat (z indeksami i FTS5) tworzy init_db z app.py, wiersze wstawia
+executemany w partiach. Istniejąca baza z tą samą liczbą wierszy jest
+używana ponownie.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+BATCH = 10000
+# Stałe ziarno - ta sama liczba wierszy daje tę samą bazę
+SEED = 20240101
+
+PRIORITIES = ['low', 'medium', 'high']
+STATUSES = ['pending', 'in_progress', 'completed']
+CATEGORIES = ['general', 'work', 'health', 'ideas', 'learning']
+EVENT_TYPES = ['meeting', 'task', 'reminder', 'personal']
+RECURRENCES = [None] * 17 + ['daily', 'weekly', 'monthly']
+WORDS = (
+    'plan cel nawyk trening praca projekt spotkanie zdrowie sen nauka książka budżet '
+    'motywacja rozwój kariera termin raport rodzina odpoczynek dieta bieganie medytacja'
+).split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def create_schema(db_path):
+    """Schemat z app.py"""
+    import app as application
+    application.create_app({'DATABASE_URL': f'sqlite:///{os.path.abspath(db_path)}', 'RETRIEVAL_ENABLED': False})
+    with application.app.app_context():
+        application.init_db()
+        return application.Mentor.query.count()
+
+
+def seeded_rows(db_path):
+    """Liczba wierszy zapisana przy poprzednim seedowaniu (None = baza do odtworzenia)"""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        with sqlite3.connect(db_path) as conn:
+            row = conn.execute('SELECT rows FROM benchmark_seed').fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def _batches(rows, make_row):
+    for start in range(0, rows, BATCH):
+        yield [make_row(index) for index in range(start, min(start + BATCH, rows))]
+
+
+def seed(db_path, rows, force=False):
+    """Wypełnienie bazy; zwraca czas seedowania w sekundach (0 gdy baza była gotowa)"""
+    if not force and seeded_rows(db_path) == rows:
+        return 0.0
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    started = time.perf_counter()
+    mentors = create_schema(db_path)
+    rng = random.Random(SEED)
+    now = datetime.utcnow().replace(microsecond=0)
+    # Dane rozłożone na rok wstecz i rok naprzód (zdarzenia)
+    span = 365 * 24 * 3600
+
+    def past(index):
+        return now - timedelta(seconds=span * index // max(rows, 1))
+
+    def task_row(index):
+        status = rng.choice(STATUSES)
+        created = past(index)
+        return (
+            _text(rng, 4).capitalize(), _text(rng, 20), rng.choice(PRIORITIES), status,
+            created + timedelta(days=rng.randint(1, 30)), created,
+            created + timedelta(days=1) if status == 'completed' else None, rng.randint(1, mentors)
+        )
+
+    def note_row(index):
+        created = past(index)
+        return (
+            _text(rng, 4).capitalize(), _text(rng, 60), rng.choice(CATEGORIES),
+            ','.join(rng.sample(WORDS, 2)), created, created
+        )
+
+    def event_row(index):
+        start = now - timedelta(days=365) + timedelta(seconds=2 * span * index // max(rows, 1))
+        start = start.replace(minute=0, second=0)
+        recurrence = rng.choice(RECURRENCES)
+        until = start + timedelta(days=90) if recurrence else None
+        return (
+            _text(rng, 3).capitalize(), _text(rng, 10), start, start + timedelta(hours=1),
+            rng.choice(EVENT_TYPES), recurrence, until, start
+        )
+
+    def chat_row(index):
+        return (
+            index % mentors + 1, _text(rng, 12) + '?', _text(rng, 60) + '.', past(rows - index)
+        )
+
+    statements = [
+        ('INSERT INTO task (title, description, priority, status, due_date, created_at, completed_at, mentor_id) '
+         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', task_row),
+        ('INSERT INTO note (title, content, category, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+         note_row),
+        ('INSERT INTO event (title, description, start_date, end_date, event_type, recurrence, recurrence_until, '
+         'created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', event_row),
+        ('INSERT INTO chat_message (mentor_id, user_message, mentor_response, timestamp) VALUES (?, ?, ?, ?)',
+         chat_row)
+    ]
+
+    # Format daty jak w SQLAlchemy (porównania w SQLite są tekstowe)
+    sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('PRAGMA synchronous = OFF')
+        for statement, make_row in statements:
+            for batch in _batches(rows, make_row):
+                conn.executemany(statement, batch)
+        conn.execute('CREATE TABLE benchmark_seed (rows INTEGER NOT NULL)')
+        conn.execute('INSERT INTO benchmark_seed (rows) VALUES (?)', (rows,))
+        conn.execute('ANALYZE')
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='Ścieżka pliku SQLite')
+    parser.add_argument('--rows', type=int, required=True, help='Wiersze w każdej tabeli')
+    parser.add_argument('--force', action='store_true', help='Odtwórz bazę nawet gdy istnieje')
+    args = parser.parse_args()
+
+    elapsed = seed(args.db, args.rows, force=args.force)
+    if elapsed:
+        print(f"Zapisano {args.rows} wierszy na tabelę w {elapsed:.1f}s: {args.db}", file=sys.stderr)
+    else:
+        print(f"Baza {args.db} jest już wypełniona ({args.rows} wierszy)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Aplikacja uruchomiona do benchmarku - wielowątkowy serwer Flask bez debugera.
+
+Baza i adres Ollama pochodzą z DATABASE_URL i OLLAMA_URL (ustawia je run.py).
+"""
+import argparse
+import logging
+import signal
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--retrieval', action='store_true',
+                        help='Włącz wyszukiwanie semantyczne (domyślnie wyłączone - indeksowanie N wierszy)')
+    parser.add_argument('--write-behind', action='store_true', help='Zapis wiadomości czatu partiami w tle')
+    args = parser.parse_args()
+
+    import app as application
+    application.create_app({'RETRIEVAL_ENABLED': args.retrieval, 'CHAT_WRITE_BEHIND': args.write_behind})
+    with application.app.app_context():
+        application.init_db()
+    application.start_worker()
+
+    # Log każdego żądania zafałszowałby pomiar
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    # terminate() z run.py - trwające generacje i zaległe wiadomości kończą handlery atexit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    application.app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
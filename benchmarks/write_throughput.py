@@ -0,0 +1,130 @@
+"""Przepustowość zapisu wiadomości czatu przy wielu równoległych wątkach.
+
+    python -m benchmarks.write_throughput --threads 8 --messages 500
+
+Każdy tryb działa w osobnym procesie na świeżej bazie i wywołuje
+save_chat_message z app.py (bez modelu - mierzony jest tylko zapis):
+
+- baseline      - domyślny dziennik SQLite (journal_mode=DELETE, synchronous=FULL)
+- wal           - profil DATABASE['pragmas'] (WAL, synchronous=NORMAL, busy_timeout, mmap, cache)
+- write_behind  - profil WAL + zapis partiami w tle (jedna transakcja na partię)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.run import ROOT, percentile
+
+MODES = ('baseline', 'wal', 'write_behind')
+# Domyślne ustawienia SQLite sprzed profilu produkcyjnego
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def run_worker(mode, threads, messages):
+    """Pomiar w bieżącym procesie - baza z DATABASE_URL"""
+    import app as application
+
+    application.create_app({'RETRIEVAL_ENABLED': False, 'CHAT_WRITE_BEHIND': mode == 'write_behind'})
+    # Podsumowania wołałyby model - tu mierzymy tylko zapis
+    application.CONVERSATION_MEMORY['summarize_after'] = 10 ** 9
+    if mode == 'baseline':
+        application.DATABASE['pragmas'] = dict(BASELINE_PRAGMAS)
+    with application.app.app_context():
+        application.init_db()
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def writer(index):
+        mentor_id = index % 4 + 1
+        own = []
+        for number in range(messages):
+            started = time.perf_counter()
+            try:
+                with application.app.app_context():
+                    application.save_chat_message(mentor_id, f'Pytanie {index}/{number}', 'Odpowiedź mentora. ' * 20)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=writer, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # Wiadomości są trwałe dopiero po zapisie ostatniej partii
+    application.chat_log.flush()
+    elapsed = time.perf_counter() - started
+
+    with application.app.app_context():
+        stored = application.ChatMessage.query.count()
+        journal_mode = application.db.session.execute(application.db.text('PRAGMA journal_mode')).scalar()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'journal_mode': journal_mode,
+        'threads': threads,
+        'messages': threads * messages,
+        'stored': stored,
+        'errors': len(errors),
+        'error_sample': errors[:3],
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(stored / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'chat_log': application.chat_log.stats()
+    }
+
+
+def run_mode(mode, threads, messages):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'write.db')}"
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.write_throughput', '--worker', mode,
+             '--threads', str(threads), '--messages', str(messages)],
+            cwd=workdir, env=env, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=500, help='Wiadomości na wątek')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='Plik wynikowy JSON (domyślnie stdout)')
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.threads, args.messages)))
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"{mode}...", file=sys.stderr)
+        results.append(run_mode(mode, args.threads, args.messages))
+    output = json.dumps({'results': results}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
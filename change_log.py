@@ -0,0 +1,148 @@
+"""Dziennik zmian do synchronizacji przyrostowej - triggery SQLite zapisują zmiany i usunięcia.
+
+Każdy wiersz dziennika to ostatnia zmiana jednego elementu (zadania,
+notatki, wydarzenia). Identyfikator wiersza (AUTOINCREMENT) rośnie
+monotonicznie i jest tokenem synchronizacji - klient pyta o zmiany
+z identyfikatorem większym niż ostatnio widziany.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Encja w API -> tabela
+ENTITIES = {
+    'tasks': 'task',
+    'notes': 'note',
+    'events': 'event'
+}
+
+# Jak długo trzymamy znaczniki usunięć; starszy token wymaga pełnego przeładowania
+TOMBSTONE_TTL = timedelta(days=30)
+
+
+def _setup_statements():
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """,
+        # Jeden wiersz na element - starszy wpis jest usuwany przy każdej zmianie
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_change_log_item ON change_log (entity, item_id)",
+        # Ostatnia zmiana encji (wersja kolekcji do ETag) bez skanowania dziennika
+        "CREATE INDEX IF NOT EXISTS ix_change_log_entity ON change_log (entity, id)",
+        """
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pruned_until INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT OR IGNORE INTO change_log_state (id, pruned_until) VALUES (1, 0)"
+    ]
+    for entity, table in ENTITIES.items():
+        for event, row, deleted in (('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)):
+            statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS change_log_{table}_{event.lower()} AFTER {event} ON {table} BEGIN
+                DELETE FROM change_log WHERE entity = '{entity}' AND item_id = {row}.id;
+                INSERT INTO change_log (entity, item_id, deleted) VALUES ('{entity}', {row}.id, {deleted});
+            END
+            """)
+    return statements
+
+
+def ensure_change_log(engine):
+    """Tabela dziennika i triggery (istniejące wiersze są w pełnym przeładowaniu klienta)"""
+    with engine.begin() as conn:
+        for statement in _setup_statements():
+            conn.execute(text(statement))
+
+
+def current_token(session):
+    """Token odpowiadający aktualnemu stanowi bazy (najnowsza zmiana).
+
+    Licznik AUTOINCREMENT nie cofa się po usunięciu wierszy z dziennika.
+    """
+    return session.execute(
+        text("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'change_log'")
+    ).scalar()
+
+
+def collection_version(session, entity):
+    """Wersja kolekcji i czas jej ostatniej zmiany (None gdy dziennik jest pusty).
+
+    Wersja obejmuje `pruned_until` - po czyszczeniu znaczników usunięć
+    najnowszy wpis encji może zniknąć, a wersja nie może wrócić do starej wartości.
+    """
+    row = session.execute(
+        text("""
+            SELECT latest.id, latest.changed_at, state.pruned_until
+            FROM change_log_state AS state
+            LEFT JOIN (
+                SELECT id, changed_at FROM change_log WHERE entity = :entity ORDER BY id DESC LIMIT 1
+            ) AS latest ON 1
+            WHERE state.id = 1
+        """),
+        {'entity': entity}
+    ).one()
+    changed_at = datetime.strptime(row.changed_at, '%Y-%m-%d %H:%M:%S.%f') if row.changed_at else None
+    return f"{row.id or 0}.{row.pruned_until or 0}", changed_at
+
+
+def changes_since(session, since, entities, limit):
+    """Zmiany po tokenie `since` w kolejności zapisu.
+
+    Zwraca (zmiany, następny token, czy jest więcej, czy potrzebne pełne
+    przeładowanie). Zmiana to krotka (encja, id elementu, czy usunięty).
+    """
+    pruned_until = session.execute(text("SELECT pruned_until FROM change_log_state WHERE id = 1")).scalar() or 0
+    # Token czytany przed zmianami - zmiany zapisane w międzyczasie trafią do następnej synchronizacji
+    token = current_token(session)
+    if since < pruned_until or since > token:
+        # Usunięcia sprzed tokenu klienta mogły już zniknąć z dziennika (albo token z innej bazy)
+        return [], token, False, True
+
+    placeholders = ', '.join(f':entity{index}' for index in range(len(entities)))
+    params = {f'entity{index}': entity for index, entity in enumerate(entities)}
+    rows = session.execute(
+        text(f"""
+            SELECT id, entity, item_id, deleted FROM change_log
+            WHERE id > :since AND id <= :token AND entity IN ({placeholders})
+            ORDER BY id LIMIT :limit
+        """),
+        dict(params, since=since, token=token, limit=limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        token = rows[-1].id
+    return [(row.entity, row.item_id, bool(row.deleted)) for row in rows], token, has_more, False
+
+
+def prune_tombstones(engine, ttl=TOMBSTONE_TTL):
+    """Usunięcie starych znaczników usunięć; klienci ze starszym tokenem dostaną reset"""
+    cutoff = (datetime.utcnow() - ttl).strftime('%Y-%m-%d %H:%M:%f')
+    with engine.begin() as conn:
+        pruned = conn.execute(
+            text("SELECT MAX(id) FROM change_log WHERE deleted = 1 AND changed_at < :cutoff"),
+            {'cutoff': cutoff}
+        ).scalar()
+        if pruned is None:
+            return 0
+        removed = conn.execute(
+            text("DELETE FROM change_log WHERE deleted = 1 AND id <= :pruned"), {'pruned': pruned}
+        ).rowcount
+        conn.execute(
+            text("UPDATE change_log_state SET pruned_until = MAX(pruned_until, :pruned) WHERE id = 1"),
+            {'pruned': pruned}
+        )
+    if removed:
+        logger.info(f"Usunięto {removed} starych znaczników usunięć z dziennika zmian")
+    return removed
@@ -0,0 +1,206 @@
+"""Kolejka zadań czatu - generowanie odpowiedzi poza wątkiem żądania HTTP"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Zbyt wiele oczekujących zadań"""
+
+    def __init__(self, retry_after):
+        super().__init__("Kolejka zadań czatu jest pełna")
+        self.retry_after = retry_after
+
+
+class ChatJob:
+    """Pojedyncze zadanie generowania odpowiedzi"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = self.QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        # Zadanie zapisuje wynik - od tej chwili anulowanie nic nie zmienia
+        self.committed = False
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def is_cancelled(self):
+        return self.status == self.CANCELLED
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.started_at is not None:
+            data['wait_time'] = round(self.started_at - self.created_at, 3)
+        if self.status == self.DONE:
+            data['result'] = self.result
+        if self.status == self.FAILED:
+            data['error'] = self.error
+        return data
+
+
+class ChatJobQueue:
+    """Pula wątków z ograniczoną kolejką, long-pollingiem i anulowaniem"""
+
+    def __init__(self, handler, max_workers=4, max_pending=64, result_ttl=600):
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-job')
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._wait_times = []
+        self._completed = 0
+
+    def submit(self, payload):
+        """Dodanie zadania - zwraca ChatJob od razu"""
+        with self._condition:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job.status == ChatJob.QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(self._retry_after(pending))
+            job = ChatJob(payload)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self._condition:
+            if job.is_cancelled():
+                # Anulowane w kolejce - zakończone już przez cancel() lub shutdown()
+                return
+            job.status = ChatJob.RUNNING
+            job.started_at = time.time()
+            self._wait_times.append(job.started_at - job.created_at)
+            del self._wait_times[:-100]
+
+        try:
+            result = self.handler(job)
+            with self._condition:
+                if not job.is_cancelled():
+                    job.status = ChatJob.DONE
+                    job.result = result
+        except Exception as e:
+            logger.error(f"Błąd zadania czatu {job.id}: {str(e)}")
+            with self._condition:
+                if not job.is_cancelled():
+                    job.status = ChatJob.FAILED
+                    job.error = str(e)
+        finally:
+            with self._condition:
+                self._finish(job)
+
+    def _finish(self, job):
+        """Zamknięcie zadania - raz na zadanie, pod blokadą"""
+        job.finished_at = time.time()
+        self._completed += 1
+        self._condition.notify_all()
+
+    def commit(self, job):
+        """Ostatnie sprawdzenie anulowania przed zapisem wyniku - atomowe względem cancel().
+
+        True: zadanie nie zostało anulowane i już nie będzie (handler może zapisać
+        wynik); False: klient anulował zadanie, wynik trzeba odrzucić.
+        """
+        with self._condition:
+            if job.is_cancelled():
+                return False
+            job.committed = True
+            return True
+
+    def get(self, job_id):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Long-polling: czeka aż zadanie się zakończy lub minie timeout"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            job = self._jobs.get(job_id)
+            while job is not None and not job.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return job
+
+    def cancel(self, job_id):
+        """Anulowanie zadania - oczekujące nie wystartuje, wynik trwającego zostanie odrzucony.
+
+        Zadanie po commit() kończy się normalnie - zwracany stan nie jest wtedy CANCELLED.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished or job.committed:
+                # Wynik zatwierdzonego zadania jest już zapisywany - zostanie zwrócony
+                return job
+            running = job.status == ChatJob.RUNNING
+            job.status = ChatJob.CANCELLED
+            if running:
+                # Trwające zadanie zamknie wątek roboczy po powrocie z handlera
+                self._condition.notify_all()
+            else:
+                if job.future is not None:
+                    job.future.cancel()
+                self._finish(job)
+            return job
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _retry_after(self, pending):
+        avg_wait = sum(self._wait_times) / len(self._wait_times) if self._wait_times else 5.0
+        return max(1, int(round(avg_wait + pending / self.max_workers)))
+
+    def stats(self):
+        with self._condition:
+            statuses = [job.status for job in self._jobs.values()]
+            waiting = [time.time() - job.created_at for job in self._jobs.values() if job.status == ChatJob.QUEUED]
+            return {
+                'queued': statuses.count(ChatJob.QUEUED),
+                'running': statuses.count(ChatJob.RUNNING),
+                'completed': self._completed,
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'oldest_wait': round(max(waiting), 3) if waiting else 0.0,
+                'avg_wait': round(sum(self._wait_times) / len(self._wait_times), 3) if self._wait_times else None
+            }
+
+    def shutdown(self, wait=True):
+        """Zamknięcie puli; bez czekania oczekujące zadania są anulowane"""
+        if not wait:
+            with self._condition:
+                for job in self._jobs.values():
+                    if job.status == ChatJob.QUEUED:
+                        job.status = ChatJob.CANCELLED
+                        self._finish(job)
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
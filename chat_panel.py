@@ -0,0 +1,63 @@
+"""Panel mentorów - jedno pytanie do kilku mentorów naraz, odpowiedzi w kolejności ukończenia"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+
+class ChatPanel:
+    """Równoległe wywołania dla wielu mentorów na wspólnej puli wątków.
+
+    Pula ogranicza tylko liczbę wątków - liczbę równoległych generacji
+    pilnuje limit modelu w LLMClient, więc nadmiarowe wywołania czekają
+    w jego kolejce tak jak pojedyncze żądania czatu.
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-panel')
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+
+    def run(self, calls):
+        """Start wszystkich wywołań i generator (klucz, wynik, błąd) w kolejności ich zakończenia.
+
+        `calls` to słownik klucz -> funkcja bez argumentów. Wywołania startują
+        od razu i dziedziczą kontekst wywołującego (sesję i priorytet kolejki
+        modelu). Zamknięcie generatora (np. rozłączenie klienta) anuluje
+        wywołania, które jeszcze nie wystartowały; trwające kończą się w tle.
+        """
+        futures = {
+            self._executor.submit(contextvars.copy_context().run, self._call, call): key
+            for key, call in calls.items()
+        }
+        return self._results(futures)
+
+    def _results(self, futures):
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            cancelled = sum(1 for future in futures if future.cancel())
+            if cancelled:
+                logger.info(f"Panel przerwany - anulowano {cancelled} oczekujących odpowiedzi")
+
+    def _call(self, call):
+        with self._lock:
+            self._active += 1
+        try:
+            return call()
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {'active': self._active, 'completed': self._completed, 'max_workers': self.max_workers}
@@ -0,0 +1,65 @@
+"""Konfiguracja aplikacji ze zmiennych środowiskowych (z wartościami domyślnymi do uruchomienia lokalnego)"""
+import os
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off')
+
+# Nazwa (zmienna środowiskowa i klucz w create_app(config)) -> (typ, wartość domyślna)
+SETTINGS = {
+    'SECRET_KEY': (str, 'your-secret-key-here'),
+    'DATABASE_URL': (str, 'sqlite:///mentors.db'),
+    'OLLAMA_URL': (str, 'http://localhost:11434'),
+    'OLLAMA_MODEL': (str, 'llama3.2:latest'),
+    'OLLAMA_BACKUP_MODELS': (list, ['llama2:latest']),
+    'OLLAMA_EMBEDDING_MODEL': (str, 'nomic-embed-text:latest'),
+    'OLLAMA_KEEP_ALIVE': (str, '30m'),
+    'LLM_MAX_IN_FLIGHT': (int, 2),
+    'LLM_MAX_QUEUE': (int, 8),
+    'LLM_REQUEST_TIMEOUT': (float, 30.0),
+    # Ile sekund zamykany proces czeka na trwające generacje
+    'LLM_SHUTDOWN_TIMEOUT': (float, 30.0),
+    'CHAT_WRITE_BEHIND': (bool, False),
+    'RETRIEVAL_ENABLED': (bool, True),
+    'TASK_EXTRACTION': (bool, True),
+    'TASK_EXTRACTION_LLM': (bool, False),
+    # Pliki z static/dist (flask build-assets); wyłączone = pliki źródłowe ze static
+    'STATIC_ASSETS': (bool, True),
+}
+
+
+def _parse(name, kind, value):
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in _TRUE:
+            return True
+        if str(value).strip().lower() in _FALSE:
+            return False
+        raise ValueError(f"{name}: oczekiwano wartości logicznej, otrzymano {value!r}")
+    if kind is list:
+        if isinstance(value, (list, tuple)):
+            return list(value)
+        return [item.strip() for item in str(value).split(',') if item.strip()]
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: nieprawidłowa wartość {value!r}")
+
+
+def load_settings(overrides=None, environ=None):
+    """Ustawienia: wartości domyślne, potem zmienne środowiskowe, potem `overrides`"""
+    environ = os.environ if environ is None else environ
+    overrides = overrides or {}
+    unknown = set(overrides) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f"Nieznane ustawienia: {', '.join(sorted(unknown))}")
+
+    settings = {}
+    for name, (kind, default) in SETTINGS.items():
+        if name in overrides:
+            settings[name] = _parse(name, kind, overrides[name])
+        elif environ.get(name, '') != '':
+            settings[name] = _parse(name, kind, environ[name])
+        else:
+            settings[name] = list(default) if kind is list else default
+    return settings
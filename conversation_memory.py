@@ -0,0 +1,171 @@
+"""Pamięć rozmowy z mentorem - okno ostatnich wymian i kroczące podsumowanie"""
+import hashlib
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Przybliżenie liczby tokenów bez tokenizera modelu (tekst polski ~3-4 znaki na token)
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text):
+    return int(len(text or '') / CHARS_PER_TOKEN) + 1
+
+
+class ConversationState:
+    """Stan pamięci przekazywany do budowania promptu.
+
+    `turns` to pary (pytanie, odpowiedź) od najstarszej, `message_ids` ich
+    identyfikatory ChatMessage, `context` to tokeny kontekstu Ollama po
+    ostatniej wymianie (ważne tylko dla `context_model`).
+    """
+
+    def __init__(self, summary='', turns=None, context=None, context_model=None, mentor_id=None,
+                 message_ids=None):
+        self.summary = summary or ''
+        self.turns = list(turns or [])
+        self.context = context
+        self.context_model = context_model
+        self.mentor_id = mentor_id
+        self.message_ids = list(message_ids or [])
+
+    def is_empty(self):
+        return not self.summary and not self.turns
+
+    def fingerprint(self):
+        """Skrót stanu do klucza cache (pusta pamięć = None, klucz jak bez pamięci)"""
+        if self.is_empty():
+            return None
+        digest = hashlib.sha256(self.summary.encode('utf-8'))
+        for user_message, mentor_response in self.turns:
+            digest.update(b'\x00' + user_message.encode('utf-8'))
+            digest.update(b'\x01' + mentor_response.encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+
+def _truncate(text, max_tokens):
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    # Zostaje początek tekstu (w podsumowaniu: najstarsze, już skondensowane fakty)
+    return text[:max_chars].rsplit(' ', 1)[0] + '…'
+
+
+def fit_history(state, budget, summary_budget):
+    """Podsumowanie i najnowsze wymiany mieszczące się w budżecie tokenów"""
+    summary = _truncate(state.summary, min(summary_budget, budget)) if state.summary else ''
+    remaining = budget - (estimate_tokens(summary) if summary else 0)
+
+    turns = []
+    for user_message, mentor_response in reversed(state.turns):
+        cost = estimate_tokens(user_message) + estimate_tokens(mentor_response) + 4
+        if cost > remaining:
+            break
+        turns.append((user_message, mentor_response))
+        remaining -= cost
+    turns.reverse()
+    return summary, turns
+
+
+def format_history(summary, turns, mentor_name):
+    """Blok historii do promptu mentora (pusty gdy nie ma pamięci)"""
+    parts = []
+    if summary:
+        parts.append(f"PODSUMOWANIE WCZEŚNIEJSZEJ ROZMOWY: {summary}")
+    if turns:
+        lines = ["OSTATNIE WIADOMOŚCI:"]
+        for user_message, mentor_response in turns:
+            lines.append(f"Użytkownik: {user_message}")
+            lines.append(f"{mentor_name}: {mentor_response}")
+        parts.append('\n'.join(lines))
+    return '\n\n'.join(parts)
+
+
+def fit_knowledge(texts, budget):
+    """Fragmenty z notatek/zadań/rozmów przycięte do budżetu tokenów (najtrafniejsze pierwsze)"""
+    items = []
+    remaining = budget
+    for value in texts:
+        if remaining <= 16:
+            break
+        value = ' '.join(value.split())
+        value = _truncate(value, remaining)
+        items.append(value)
+        remaining -= estimate_tokens(value) + 2
+    return items
+
+
+def format_knowledge(items):
+    """Blok wiedzy o użytkowniku do promptu (pusty gdy nie ma trafień)"""
+    if not items:
+        return ''
+    lines = ["CO WIESZ O UŻYTKOWNIKU (z jego notatek, zadań i wcześniejszych rozmów):"]
+    lines.extend(f"- {item}" for item in items)
+    return '\n'.join(lines)
+
+
+def build_summary_prompt(mentor_name, summary, turns, max_sentences):
+    """Prompt aktualizujący podsumowanie o nowe wymiany (bez przepisywania całej historii)"""
+    exchanges = '\n'.join(
+        f"Użytkownik: {user_message}\n{mentor_name}: {mentor_response}"
+        for user_message, mentor_response in turns
+    )
+    return f"""Streszczasz rozmowę użytkownika z mentorem {mentor_name}.
+
+DOTYCHCZASOWE PODSUMOWANIE: {summary or '(brak)'}
+
+NOWE WYMIANY:
+{exchanges}
+
+Zaktualizuj podsumowanie o nowe wymiany. Zachowaj fakty o użytkowniku, jego cele,
+problemy i ustalenia. Maksymalnie {max_sentences} zdań, po polsku, bez wstępu.
+
+PODSUMOWANIE:"""
+
+
+class SummaryWorker:
+    """Wątek w tle aktualizujący podsumowania - poza ścieżką żądania.
+
+    Zlecenia dla tego samego klucza (mentora) są łączone, więc seria
+    wiadomości powoduje co najwyżej jedno oczekujące podsumowanie.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._thread = None
+
+    def schedule(self, key):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if not self._started:
+                self._started = True
+                self._thread = threading.Thread(target=self._run, name='summary-worker', daemon=True)
+                self._thread.start()
+        self._queue.put(key)
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            with self._lock:
+                self._pending.discard(key)
+            try:
+                self.handler(key)
+            except Exception as e:
+                logger.error(f"Błąd przy aktualizacji podsumowania rozmowy ({key}): {str(e)}")
+
+    def stop(self):
+        self._queue.put(None)
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending)}
@@ -0,0 +1,71 @@
+"""Eksport danych - strumieniowe NDJSON/CSV prosto z kursora bazy"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+# Ile wierszy pobieramy z kursora naraz i ile łączymy w jeden fragment odpowiedzi
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 200
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_row_dicts(result, columns, derived=None):
+    """Wiersze kursora jako słowniki; `derived` dokłada pola wyliczane (np. is_completed)"""
+    for row in result:
+        item = {name: _plain(value) for name, value in zip(columns, row)}
+        if derived:
+            for name, compute in derived.items():
+                item[name] = compute(item)
+        yield item
+
+
+def iter_ndjson(items):
+    """Jeden obiekt JSON na linię, fragmenty po ROWS_PER_CHUNK wierszy"""
+    lines = []
+    for item in items:
+        lines.append(json.dumps(item, ensure_ascii=False))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_csv(items, fieldnames):
+    """CSV z nagłówkiem, fragmenty po ROWS_PER_CHUNK wierszy"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for item in items:
+        writer.writerow(item)
+        count += 1
+        if count >= ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_gzip(chunks, level=6):
+    """Kompresja gzip w locie - bez buforowania całej odpowiedzi"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_encoded(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
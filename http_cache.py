@@ -0,0 +1,78 @@
+"""Warunkowe GET (ETag/Last-Modified) i kompresja odpowiedzi JSON (gzip, brotli)"""
+import gzip
+import hashlib
+from datetime import timezone
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny - bez niego odpowiedzi są kompresowane tylko gzipem
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/msgpack')
+
+
+def collection_etag(version, request):
+    """Słaby ETag: wersja kolekcji + parametry zapytania (strona, zakres dat) i format (Accept)"""
+    digest = hashlib.sha1(request.query_string)
+    digest.update(request.headers.get('Accept', '').encode('latin-1'))
+    return f"{version}-{digest.hexdigest()[:12]}"
+
+
+def is_not_modified(request, etag, last_modified):
+    """Czy kopia klienta jest aktualna (If-None-Match ma pierwszeństwo przed If-Modified-Since)"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        # Nagłówek HTTP ma rozdzielczość sekundy
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # Przeglądarka trzyma odpowiedź, ale przed użyciem zawsze pyta serwer (304 bez treści)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+def negotiate_encoding(request):
+    """Najlepsze kodowanie akceptowane przez klienta: br, potem gzip (None = bez kompresji)"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, request, min_size=1024, gzip_level=6, brotli_quality=5):
+    """Kompresja dużych odpowiedzi JSON/MessagePack (strumienie i odpowiedzi już skompresowane są pomijane)"""
+    if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    encoding = negotiate_encoding(request)
+    if encoding == 'br':
+        data = brotli.compress(data, quality=brotli_quality)
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=gzip_level)
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
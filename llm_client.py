@@ -0,0 +1,421 @@
+"""Klient HTTP do Ollama - wspólna pula połączeń i limit równoległych generacji"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_scheduler import FairQueue, QueueRejected, RequestCancelled, current_scope
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+LLM_QUEUE_WAIT = Histogram(
+    'llm_queue_wait_seconds', 'Czas oczekiwania na wolne miejsce generacji dla modelu', ['model']
+)
+LLM_QUEUE_REJECTED = Counter(
+    'llm_queue_rejected_total', 'Żądania odrzucone przy pełnej kolejce modelu', ['model']
+)
+
+# Co ile sekund strumień sprawdza, czy klient nadal czeka na odpowiedź
+CANCEL_CHECK_INTERVAL = 0.25
+
+# Klient zrezygnował - w kolejce albo w trakcie generacji
+LLMCancelled = RequestCancelled
+
+
+class LLMQueueFull(Exception):
+    """Kolejka oczekujących na model jest pełna - klient powinien spróbować później"""
+
+    def __init__(self, model, retry_after):
+        super().__init__(f"Kolejka modelu {model} jest pełna")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class LLMDeadlineExceeded(Exception):
+    """Upłynął czas przeznaczony na obsługę żądania"""
+
+
+class LLMQueueTimeout(LLMDeadlineExceeded):
+    """Termin minął w kolejce do modelu - zajętość, nie awaria modelu"""
+
+
+class LLMCircuitOpen(Exception):
+    """Bezpiecznik modelu jest otwarty - nie wysyłamy żądań do czasu próby"""
+
+    def __init__(self, model, retry_in):
+        super().__init__(f"Bezpiecznik modelu {model} jest otwarty")
+        self.model = model
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Bezpiecznik dla jednego modelu: closed -> open -> half_open -> closed.
+
+    Po `failure_threshold` kolejnych błędach żądania są odrzucane od razu.
+    Po `reset_timeout` sekundach przepuszczamy jedno żądanie próbne.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def before_call(self, model):
+        """Sprawdzenie czy można wysłać żądanie - w przeciwnym razie LLMCircuitOpen"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return
+            raise LLMCircuitOpen(model, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def is_open(self):
+        """Czy żądania są teraz odrzucane (otwarty, jeszcze przed próbą)"""
+        with self.lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def release_probe(self):
+        """Zwolnienie próby bez rozstrzygania o stanie modelu"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        with self.lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+class _CollectedResponse:
+    """Odpowiedź /api/generate złożona ze strumienia - interfejs jak requests.Response"""
+
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self._body
+
+
+class LLMClient:
+    """Klient Ollama ze współdzieloną sesją keep-alive i kolejką per model"""
+
+    def __init__(self, base_url, max_in_flight=2, max_queue=8, request_timeout=30,
+                 connect_timeout=3, pool_size=16, failure_threshold=3, reset_timeout=30,
+                 max_per_session=2, promote_after=30):
+        self.base_url = base_url.rstrip('/')
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.promote_after = promote_after
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+
+        # Wątki dla zapytań zabezpieczających (hedged requests)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='llm-hedge')
+
+    def deadline(self, timeout=None):
+        """Absolutny termin (time.monotonic) dla nowego żądania"""
+        return time.monotonic() + (timeout if timeout is not None else self.request_timeout)
+
+    def _model_slots(self, model):
+        with self._slots_lock:
+            slots = self._slots.get(model)
+            if slots is None:
+                slots = self._slots[model] = FairQueue(
+                    self.max_in_flight, self.max_queue,
+                    max_per_session=self.max_per_session, promote_after=self.promote_after
+                )
+            return slots
+
+    def breaker(self, model):
+        """Bezpiecznik przypisany do modelu"""
+        with self._slots_lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _retry_after(self, slots):
+        """Szacowany czas (s) po którym w kolejce zwolni się miejsce"""
+        avg = slots.avg_duration or float(self.request_timeout) / 3
+        return max(1, int(round(avg * (slots.waiting + 1) / self.max_in_flight)))
+
+    def check_capacity(self, model, scope=None):
+        """Szybkie odrzucenie zanim zaczniemy odpowiadać (np. strumieniem)"""
+        slots = self._model_slots(model)
+        try:
+            slots.check(scope or current_scope())
+        except QueueRejected:
+            LLM_QUEUE_REJECTED.inc(model=model)
+            raise LLMQueueFull(model, self._retry_after(slots))
+
+    @contextmanager
+    def slot(self, model, deadline):
+        """Zajęcie miejsca na generację w sprawiedliwej kolejce modelu.
+
+        Sesja i klasa priorytetu pochodzą z bieżącego request_scope();
+        oczekujący, którego klient zrezygnował, dostaje RequestCancelled.
+        """
+        slots = self._model_slots(model)
+        scope = current_scope()
+        wait_started = time.monotonic()
+        try:
+            acquired = slots.acquire(scope, deadline)
+        except QueueRejected:
+            LLM_QUEUE_REJECTED.inc(model=model)
+            raise LLMQueueFull(model, self._retry_after(slots))
+
+        if not acquired:
+            raise LLMQueueTimeout(f"Brak wolnego miejsca dla modelu {model} przed upływem terminu")
+
+        started = time.monotonic()
+        LLM_QUEUE_WAIT.observe(started - wait_started, model=model)
+        try:
+            yield
+        finally:
+            slots.release(scope.priority, time.monotonic() - started)
+
+    def _chunks(self, response, model):
+        """Kolejne obiekty JSON strumienia - przerwane, gdy klient zrezygnował z odpowiedzi"""
+        scope = current_scope()
+        checked = time.monotonic()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if scope.cancellable and time.monotonic() - checked >= CANCEL_CHECK_INTERVAL:
+                checked = time.monotonic()
+                if scope.is_cancelled():
+                    self._model_slots(model).record_cancelled(scope.priority)
+                    # Zamknięcie połączenia przerywa generowanie po stronie Ollama
+                    raise RequestCancelled("Klient zrezygnował w trakcie generacji")
+            yield json.loads(line)
+
+    def _collect(self, payload, deadline):
+        """Generacja strumieniem złożona w jedną odpowiedź - da się ją przerwać, gdy klient zrezygnuje"""
+        with self.session.post(
+            f"{self.base_url}/api/generate",
+            json=dict(payload, stream=True),
+            stream=True,
+            timeout=self._timeout(deadline)
+        ) as response:
+            if response.status_code != 200:
+                # Treść błędu czytana przed zamknięciem połączenia
+                response.content
+                return response
+            parts = []
+            last = {}
+            for chunk in self._chunks(response, payload['model']):
+                parts.append(chunk.get('response', ''))
+                last = chunk
+        return _CollectedResponse(dict(last, response=''.join(parts)))
+
+    def _timeout(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # Termin zużyty przed wysłaniem żądania (np. w kolejce) - model nie był pytany
+            raise LLMQueueTimeout("Termin żądania minął")
+        return (min(self.connect_timeout, remaining), remaining)
+
+    def generate(self, payload, deadline=None):
+        """Blokujące wywołanie /api/generate - zwraca obiekt Response"""
+        if deadline is None:
+            deadline = self.deadline()
+        breaker = self.breaker(payload['model'])
+        breaker.before_call(payload['model'])
+        try:
+            with self.slot(payload['model'], deadline):
+                if current_scope().cancellable:
+                    response = self._collect(payload, deadline)
+                else:
+                    response = self.session.post(
+                        f"{self.base_url}/api/generate",
+                        json=dict(payload, stream=False),
+                        timeout=self._timeout(deadline)
+                    )
+        except (LLMQueueFull, LLMQueueTimeout, RequestCancelled):
+            # Zajętość ani rezygnacja klienta nie świadczą o awarii modelu
+            breaker.release_probe()
+            raise
+        except Exception:
+            # Błąd połączenia, timeout odczytu albo uszkodzona odpowiedź - także rozstrzyga próbę
+            breaker.record_failure()
+            raise
+
+        if response.status_code == 200:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return response
+
+    def hedged(self, calls, hedge_after, deadline):
+        """Zapytanie zabezpieczające: kolejne wywołanie startuje po `hedge_after` s.
+
+        `calls` to lista funkcji bez argumentów; zwracany jest wynik pierwszej,
+        która zakończy się sukcesem (wynik różny od None). Przegrane wywołania
+        kończą się w tle. Gdy wszystkie zawiodą, rzucany jest ostatni błąd.
+        """
+        pending = set()
+        remaining_calls = list(calls)
+        last_error = None
+
+        while remaining_calls or pending:
+            if remaining_calls:
+                # Wątek puli dziedziczy sesję i priorytet wywołującego
+                pending.add(self._executor.submit(contextvars.copy_context().run, remaining_calls.pop(0)))
+            timeout = max(0.0, deadline - time.monotonic())
+            if remaining_calls:
+                timeout = min(timeout, hedge_after)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if result is not None:
+                    return result
+
+            if not done and not remaining_calls:
+                # Termin minął a nic nie skończyło się sukcesem
+                break
+
+        if last_error is not None:
+            raise last_error
+        raise LLMDeadlineExceeded("Żadne z zapytań nie zakończyło się przed terminem")
+
+    def stream(self, payload, deadline=None):
+        """Strumieniowe /api/generate - generator kolejnych obiektów JSON.
+
+        Miejsce w limicie jest trzymane do zamknięcia generatora.
+        """
+        if deadline is None:
+            deadline = self.deadline()
+        breaker = self.breaker(payload['model'])
+        breaker.before_call(payload['model'])
+        try:
+            with self.slot(payload['model'], deadline):
+                with self.session.post(
+                    f"{self.base_url}/api/generate",
+                    json=dict(payload, stream=True),
+                    stream=True,
+                    timeout=self._timeout(deadline)
+                ) as response:
+                    if response.status_code != 200:
+                        raise requests.exceptions.HTTPError(
+                            f"Błąd HTTP {response.status_code}: {response.text}", response=response
+                        )
+                    first = True
+                    for chunk in self._chunks(response, payload['model']):
+                        if first:
+                            # Model odpowiada - nawet jeśli klient przerwie strumień
+                            breaker.record_success()
+                            first = False
+                        yield chunk
+        except (LLMQueueFull, LLMQueueTimeout, RequestCancelled, GeneratorExit):
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+
+    def warm_up(self, model, keep_alive, timeout=300):
+        """Załadowanie modelu do pamięci (pusty prompt) i utrzymanie go przez keep_alive"""
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={'model': model, 'prompt': '', 'stream': False, 'keep_alive': keep_alive},
+            timeout=(self.connect_timeout, timeout)
+        )
+        response.raise_for_status()
+
+    def embed(self, model, texts, timeout=60):
+        """Embeddingi wielu tekstów jednym wywołaniem /api/embed"""
+        response = self.session.post(
+            f"{self.base_url}/api/embed",
+            json={'model': model, 'input': list(texts)},
+            timeout=(min(self.connect_timeout, timeout), timeout)
+        )
+        response.raise_for_status()
+        return response.json()['embeddings']
+
+    def list_models(self, timeout=5):
+        """Lista nazw modeli dostępnych w Ollama (/api/tags)"""
+        response = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return [m.get('name', 'unknown') for m in response.json().get('models', [])]
+
+    def breaker_stats(self):
+        """Stan bezpieczników per model - do endpointu health"""
+        with self._slots_lock:
+            items = list(self._breakers.items())
+        return {model: breaker.snapshot() for model, breaker in items}
+
+    def drain(self, timeout):
+        """Czekanie na koniec trwających i oczekujących generacji (przy zamykaniu); False gdy minął timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._slots_lock:
+                queues = list(self._slots.values())
+            busy = sum(slots.in_flight + slots.waiting for slots in queues)
+            if not busy:
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning(f"Zamykanie bez czekania na {busy} generacji (minęło {timeout}s)")
+                return False
+            time.sleep(0.1)
+
+    def stats(self):
+        """Stan kolejek per model (z podziałem na klasy priorytetu) - do health i /api/llm/queue"""
+        with self._slots_lock:
+            items = list(self._slots.items())
+        return {model: slots.stats() for model, slots in items}
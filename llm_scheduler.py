@@ -0,0 +1,270 @@
+"""Sprawiedliwa kolejka do modelu - klasy priorytetu, kolejka per sesja i anulowanie porzuconych żądań"""
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+# Kolejność obsługi - wcześniejsza klasa dostaje wolne miejsce pierwsza
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class RequestCancelled(Exception):
+    """Klient zrezygnował (rozłączenie, anulowane zadanie) - generacja jest porzucana"""
+
+
+class QueueRejected(Exception):
+    """Brak miejsca w kolejce modelu (całej, klasy albo sesji)"""
+
+
+class RequestScope:
+    """Kto pyta o model: klucz sesji, klasa priorytetu i sprawdzenie, czy klient nadal czeka"""
+
+    def __init__(self, session_key, priority=INTERACTIVE, cancelled=None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Nieznana klasa priorytetu: {priority}")
+        self.session_key = session_key
+        self.priority = priority
+        self._cancelled = cancelled
+
+    @property
+    def cancellable(self):
+        return self._cancelled is not None
+
+    def is_cancelled(self):
+        if self._cancelled is None:
+            return False
+        try:
+            return bool(self._cancelled())
+        except Exception:
+            return False
+
+
+# Wywołania poza żądaniem HTTP (podsumowania, zadania w tle) - najniższy priorytet
+BACKGROUND_SCOPE = RequestScope('system', BACKGROUND)
+
+_scope = ContextVar('llm_request_scope', default=BACKGROUND_SCOPE)
+
+
+def current_scope():
+    return _scope.get()
+
+
+@contextmanager
+def request_scope(session_key, priority=INTERACTIVE, cancelled=None):
+    """Wywołania modelu w bloku należą do sesji `session_key` w klasie `priority`"""
+    token = _scope.set(RequestScope(session_key, priority, cancelled))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+def disconnect_probe(environ):
+    """Funkcja sprawdzająca, czy klient zamknął połączenie (None gdy serwer WSGI nie daje gniazda).
+
+    Ciało żądania jest już przeczytane, więc gniazdo gotowe do odczytu
+    bez danych oznacza zamknięcie połączenia przez klienta.
+    """
+    sock = environ.get('werkzeug.socket') or environ.get('gunicorn.socket')
+    if sock is None:
+        return None
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+    return disconnected
+
+
+class _Ticket:
+    __slots__ = ('scope', 'enqueued_at', 'granted')
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class FairQueue:
+    """Miejsca na generacje dla jednego modelu.
+
+    Wolne miejsce dostaje najpierw klasa interactive, potem background;
+    zadanie w tle czekające dłużej niż `promote_after` s wchodzi przed
+    interaktywne (bez zagłodzenia). W obrębie klasy sesje są obsługiwane
+    na zmianę, więc sesja z wieloma pytaniami nie wyprzedza pozostałych.
+    Oczekujący sprawdzają co `poll_interval` s, czy klient nadal czeka.
+    """
+
+    def __init__(self, max_in_flight, max_queue, max_per_session=2, max_background=None,
+                 promote_after=30.0, poll_interval=0.25):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        # Zadania w tle zajmują najwyżej połowę kolejki - reszta czeka na użytkowników
+        self.max_background = max_background if max_background is not None else max(1, max_queue // 2)
+        self.promote_after = promote_after
+        self.poll_interval = poll_interval
+
+        self._condition = threading.Condition()
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._depth = {priority: 0 for priority in PRIORITIES}
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._avg_wait = {priority: None for priority in PRIORITIES}
+        self._cancelled = {priority: 0 for priority in PRIORITIES}
+        # Średni czas generacji (EWMA) - do wyliczania Retry-After
+        self.avg_duration = None
+
+    @property
+    def in_flight(self):
+        return sum(self._in_flight.values())
+
+    @property
+    def waiting(self):
+        return sum(self._depth.values())
+
+    def _rejection(self, scope):
+        """Powód odrzucenia nowego oczekującego (None = jest miejsce)"""
+        if self.waiting >= self.max_queue:
+            return "Kolejka modelu jest pełna"
+        if scope.priority == BACKGROUND and self._depth[BACKGROUND] >= self.max_background:
+            return "Kolejka zadań w tle jest pełna"
+        if len(self._queues[scope.priority].get(scope.session_key, ())) >= self.max_per_session:
+            return "Sesja ma już maksymalną liczbę oczekujących zapytań"
+        return None
+
+    def check(self, scope):
+        """Szybkie odrzucenie, gdy nowe zapytanie nie zmieściłoby się w kolejce"""
+        with self._condition:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                return
+            reason = self._rejection(scope)
+            if reason:
+                raise QueueRejected(reason)
+
+    def acquire(self, scope, deadline):
+        """Czekanie na miejsce - True po przydziale, False po upływie terminu.
+
+        Rzuca QueueRejected przy pełnej kolejce i RequestCancelled, gdy klient
+        zrezygnował w trakcie czekania.
+        """
+        with self._condition:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self._in_flight[scope.priority] += 1
+                self._record_wait(scope.priority, 0.0)
+                return True
+            reason = self._rejection(scope)
+            if reason:
+                raise QueueRejected(reason)
+
+            ticket = _Ticket(scope)
+            self._queues[scope.priority].setdefault(scope.session_key, deque()).append(ticket)
+            self._depth[scope.priority] += 1
+            try:
+                while not ticket.granted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    if scope.is_cancelled():
+                        self._cancelled[scope.priority] += 1
+                        raise RequestCancelled("Klient zrezygnował w kolejce do modelu")
+                    self._condition.wait(min(remaining, self.poll_interval))
+                return True
+            finally:
+                if not ticket.granted:
+                    self._remove(ticket)
+
+    def release(self, priority, duration):
+        with self._condition:
+            self._in_flight[priority] -= 1
+            if self.avg_duration is None:
+                self.avg_duration = duration
+            else:
+                self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+            self._dispatch()
+
+    def record_cancelled(self, priority):
+        """Generacja przerwana w trakcie, bo klient zrezygnował"""
+        with self._condition:
+            self._cancelled[priority] += 1
+
+    def _record_wait(self, priority, waited):
+        avg = self._avg_wait[priority]
+        self._avg_wait[priority] = waited if avg is None else 0.8 * avg + 0.2 * waited
+
+    def _remove(self, ticket):
+        sessions = self._queues[ticket.scope.priority]
+        tickets = sessions.get(ticket.scope.session_key)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        if not tickets:
+            del sessions[ticket.scope.session_key]
+        self._depth[ticket.scope.priority] -= 1
+
+    def _next_session(self):
+        """Klasa i sesja, której pierwszy oczekujący dostanie miejsce"""
+        now = time.monotonic()
+        for priority in PRIORITIES[1:]:
+            for session_key, tickets in self._queues[priority].items():
+                if now - tickets[0].enqueued_at >= self.promote_after:
+                    return priority, session_key
+        for priority in PRIORITIES:
+            if self._queues[priority]:
+                return priority, next(iter(self._queues[priority]))
+        return None
+
+    def _dispatch(self):
+        """Przydział wolnych miejsc oczekującym (wywoływane pod blokadą)"""
+        granted = False
+        while self.in_flight < self.max_in_flight:
+            selected = self._next_session()
+            if selected is None:
+                break
+            priority, session_key = selected
+            sessions = self._queues[priority]
+            tickets = sessions[session_key]
+            ticket = tickets.popleft()
+            if tickets:
+                # Następne zapytanie tej sesji ustawia się za innymi sesjami
+                sessions.move_to_end(session_key)
+            else:
+                del sessions[session_key]
+            self._depth[priority] -= 1
+            self._in_flight[priority] += 1
+            self._record_wait(priority, time.monotonic() - ticket.enqueued_at)
+            ticket.granted = True
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            classes = {}
+            for priority in PRIORITIES:
+                sessions = self._queues[priority]
+                oldest = min((tickets[0].enqueued_at for tickets in sessions.values()), default=None)
+                classes[priority] = {
+                    'depth': self._depth[priority],
+                    'sessions': len(sessions),
+                    'in_flight': self._in_flight[priority],
+                    'oldest_wait': round(now - oldest, 3) if oldest is not None else None,
+                    'avg_wait': round(self._avg_wait[priority], 3) if self._avg_wait[priority] is not None else None,
+                    'cancelled': self._cancelled[priority]
+                }
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'max_per_session': self.max_per_session,
+                'avg_duration': round(self.avg_duration, 3) if self.avg_duration is not None else None,
+                'classes': classes
+            }
@@ -0,0 +1,154 @@
+"""Metryki w formacie tekstowym Prometheus - liczniki, histogramy i wskaźniki bez zależności"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Przedziały czasu (s) od pojedynczych zapytań SQL po pełne generacje modelu
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Registry:
+    """Zbiór metryk renderowanych przez endpoint /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metryka {metric.name} jest już zarejestrowana")
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: oczekiwane etykiety {self.labelnames}, podano {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Wartość tylko rosnąca (np. liczba ponowień)"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Wartość chwilowa; `collect` to funkcja zwracająca {krotka etykiet: wartość} przy odczycie"""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, collect=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.collect is not None:
+            items = sorted(self.collect().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Rozkład wartości w przedziałach (kwantyle liczy Prometheus z *_bucket)"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state['count']}")
+        return lines
@@ -0,0 +1,132 @@
+"""Monitor dostępności modeli Ollama - odpytywanie w tle i rozgrzewanie modeli"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _base_name(model):
+    """Nazwa modelu bez domyślnego tagu ':latest'"""
+    return model[:-len(':latest')] if model.endswith(':latest') else model
+
+
+class ModelMonitor:
+    """Cyklicznie sprawdza /api/tags i trzyma wynik w pamięci.
+
+    Endpoint health czyta tylko ten stan, więc sondy load balancera
+    nie obciążają hosta z modelami.
+    """
+
+    def __init__(self, client, models, interval=15, keep_alive='30m', warm_up=True):
+        self.client = client
+        self.models = list(dict.fromkeys(models))
+        self.interval = interval
+        self.keep_alive = keep_alive
+        self.warm_up_enabled = warm_up
+
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._warm_up_thread = None
+        self._warmed = set()
+        self._snapshot = {
+            'status': 'unknown',
+            'available_models': None,
+            'latency_ms': None,
+            'checked_at': None,
+            'error': None
+        }
+
+    def ensure_started(self):
+        """Uruchomienie wątku monitora (tylko raz na proces)"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._thread = threading.Thread(target=self._run, name='model-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            if self.warm_up_enabled:
+                self._start_warm_up()
+            self._stop.wait(self.interval)
+
+    def check(self):
+        """Jednorazowe sprawdzenie Ollama - aktualizuje stan w pamięci"""
+        started = time.monotonic()
+        try:
+            models = self.client.list_models(timeout=5)
+            snapshot = {
+                'status': 'connected',
+                'available_models': models,
+                'latency_ms': round((time.monotonic() - started) * 1000, 1),
+                'checked_at': time.time(),
+                'error': None
+            }
+        except Exception as e:
+            snapshot = {
+                'status': 'disconnected',
+                'available_models': None,
+                'latency_ms': None,
+                'checked_at': time.time(),
+                'error': str(e)
+            }
+            # Po restarcie Ollama modele trzeba załadować ponownie
+            with self._lock:
+                self._warmed.clear()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _start_warm_up(self):
+        """Rozgrzewanie w osobnym wątku - ładowanie modelu trwa minuty, a /api/tags ma być odpytywane co `interval`"""
+        with self._lock:
+            if self._warm_up_thread is not None and self._warm_up_thread.is_alive():
+                return
+            # Modele ładowane po kolei - równoległe ładowanie walczyłoby o pamięć hosta
+            self._warm_up_thread = threading.Thread(target=self._warm_up_missing, name='model-warm-up', daemon=True)
+            self._warm_up_thread.start()
+
+    def _warm_up_missing(self):
+        for model in self.models:
+            if self._stop.is_set():
+                return
+            with self._lock:
+                if model in self._warmed:
+                    continue
+            if self.is_available(model) is not True:
+                continue
+            try:
+                started = time.monotonic()
+                self.client.warm_up(model, self.keep_alive)
+                logger.info(f"Model {model} załadowany w {time.monotonic() - started:.1f}s")
+                with self._lock:
+                    self._warmed.add(model)
+            except Exception as e:
+                logger.warning(f"Nie udało się rozgrzać modelu {model}: {str(e)}")
+
+    def is_available(self, model):
+        """True/False gdy znamy listę modeli, None gdy stan jest nieznany"""
+        with self._lock:
+            available = self._snapshot['available_models']
+        if available is None:
+            return None
+        names = {_base_name(name) for name in available}
+        return _base_name(model) in names
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot['warmed_models'] = sorted(self._warmed)
+        if snapshot['checked_at'] is not None:
+            snapshot['age'] = round(time.time() - snapshot['checked_at'], 1)
+        return snapshot
@@ -0,0 +1,206 @@
+"""Import notatek - przyrostowe parsowanie JSON/NDJSON i zapis paczkami"""
+import codecs
+import json
+import logging
+import re
+from datetime import datetime
+
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s*')
+_DECODER = json.JSONDecoder()
+
+
+class ImportFormatError(ValueError):
+    """Plik importu nie jest poprawnym JSON/NDJSON"""
+
+
+class _StreamReader:
+    """Bufor nad strumieniem bajtów - dekoduje kolejne wartości JSON bez wczytywania całości"""
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buf += self.decoder.decode(b'', final=True)
+            return False
+        # Odrzuć przetworzoną część bufora
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += self.decoder.decode(chunk)
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos] if self.pos < len(self.buf) else ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ImportFormatError(f"Oczekiwano '{char}' na pozycji {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Niepełna wartość - doczytaj kolejny fragment
+                if self.fill():
+                    continue
+                raise ImportFormatError(str(e))
+            # Liczba na końcu bufora mogła zostać ucięta
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+    def array_items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ImportFormatError(f"Nieoczekiwany znak '{char}' w tablicy notatek")
+
+
+def iter_json_notes(stream):
+    """Notatki z eksportu JSON: {"notes": [...]} albo sama tablica [...]"""
+    reader = _StreamReader(stream)
+    first = reader.peek()
+
+    if first == '[':
+        yield from reader.array_items()
+        return
+    if first != '{':
+        raise ImportFormatError("Plik musi zawierać obiekt z polem 'notes' lub tablicę notatek")
+
+    reader.pos += 1
+    while True:
+        char = reader.peek()
+        if char == '}':
+            return
+        key = reader.value()
+        reader.expect(':')
+        if key == 'notes' and reader.peek() == '[':
+            yield from reader.array_items()
+        else:
+            reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+
+
+def iter_ndjson_notes(stream):
+    """Notatki z NDJSON - jeden obiekt JSON w każdej linii"""
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.decode('utf-8-sig').strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f"Linia {line_number}: {str(e)}")
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def note_row(item, now):
+    """Słownik kolumn tabeli note z obiektu importu - None gdy notatka jest niepoprawna"""
+    if not isinstance(item, dict):
+        return None
+    title = (item.get('title') or '').strip()
+    if not title:
+        return None
+
+    tags = item.get('tags') or ''
+    if isinstance(tags, (list, tuple)):
+        tags = ','.join(str(tag).strip() for tag in tags)
+
+    created_at = _parse_datetime(item.get('created_at')) or now
+    return {
+        'title': title[:200],
+        'content': item.get('content') or '',
+        'category': item.get('category') or 'general',
+        'tags': str(tags)[:500],
+        'created_at': created_at,
+        'updated_at': _parse_datetime(item.get('updated_at')) or created_at
+    }
+
+
+def _existing_keys(session, table, titles):
+    """Pary (tytuł, treść) notatek o podanych tytułach już zapisanych w bazie"""
+    rows = session.execute(
+        select(table.c.title, table.c.content).where(table.c.title.in_(titles))
+    )
+    return {(title, content or '') for title, content in rows}
+
+
+def import_notes(session, table, items, batch_size=1000, dedupe=True):
+    """Zapis notatek paczkami (executemany, commit co paczkę).
+
+    Przy dedupe=True pomijane są notatki o tym samym tytule i treści co
+    istniejące - także te z wcześniejszych paczek tego samego importu.
+    Zwraca słownik z licznikami imported/skipped/invalid.
+    """
+    counts = {'imported': 0, 'skipped': 0, 'invalid': 0}
+    now = datetime.utcnow()
+    batch = []
+
+    def flush():
+        rows = batch
+        if dedupe and rows:
+            existing = _existing_keys(session, table, list({row['title'] for row in rows}))
+            unique = []
+            for row in rows:
+                key = (row['title'], row['content'])
+                if key in existing:
+                    counts['skipped'] += 1
+                    continue
+                existing.add(key)
+                unique.append(row)
+            rows = unique
+        if rows:
+            session.execute(table.insert(), rows)
+            session.commit()
+            counts['imported'] += len(rows)
+
+    for item in items:
+        row = note_row(item, now)
+        if row is None:
+            counts['invalid'] += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+
+    flush()
+    return counts
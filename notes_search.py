@@ -0,0 +1,144 @@
+"""Wyszukiwanie pełnotekstowe notatek - indeks SQLite FTS5 synchronizowany triggerami"""
+import html
+import logging
+import re
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# unicode61 ignoruje wielkość liter ("zdrowie" = "Zdrowie"), remove_diacritics 2
+# zrównuje znaki diakrytyczne ("ćwiczenia" = "cwiczenia"; litera "ł" zostaje bez zmian)
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Wagi bm25 dla kolumn: title, content, tags
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Znaczniki podświetlenia - zamieniane na <mark> dopiero po escapowaniu HTML
+_HL_START = '\x02'
+_HL_END = '\x03'
+
+_SETUP_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+        title, content, tags,
+        content='note', content_rowid='id',
+        tokenize='{FTS_TOKENIZER}'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+        INSERT INTO note_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """
+]
+
+
+def ensure_note_search(engine):
+    """Utworzenie indeksu FTS5 i triggerów; przy pierwszym utworzeniu indeksuje istniejące notatki"""
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'")
+        ).first() is not None
+        for statement in _SETUP_STATEMENTS:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')"))
+            logger.info("Utworzono indeks wyszukiwania notatek (FTS5)")
+
+
+def build_match_query(query, tag=None):
+    """Zamiana tekstu użytkownika na bezpieczne zapytanie FTS5.
+
+    Każde słowo jest frazą w cudzysłowie (bez składni FTS5 od użytkownika),
+    ostatnie słowo pasuje prefiksowo, żeby wyniki pojawiały się w trakcie pisania.
+    """
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    if not terms:
+        return None
+    parts = [f'"{term}"' for term in terms]
+    parts[-1] += '*'
+    match = ' '.join(parts)
+    if tag:
+        tag_terms = re.findall(r'\w+', tag, flags=re.UNICODE)
+        if tag_terms:
+            match = f"({match}) AND tags : \"{' '.join(tag_terms)}\""
+    return match
+
+
+def _highlight(value):
+    """Escapowanie HTML i zamiana znaczników FTS5 na <mark>"""
+    if value is None:
+        return None
+    escaped = html.escape(value)
+    return escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>')
+
+
+def _iso(value):
+    """Data z SQLite ('YYYY-MM-DD HH:MM:SS') w formacie ISO jak w pozostałych API"""
+    return value.replace(' ', 'T', 1) if value else value
+
+
+def search_notes(session, query, category=None, tag=None, limit=20, offset=0):
+    """Wyszukiwanie notatek posortowanych wg trafności (bm25).
+
+    Zwraca (lista wyników, czy są kolejne wyniki).
+    """
+    match = build_match_query(query, tag)
+    if match is None:
+        return [], False
+
+    sql = f"""
+        SELECT n.id, n.title, n.category, n.tags, n.created_at, n.updated_at,
+               highlight(note_fts, 0, :hl_start, :hl_end) AS title_highlight,
+               snippet(note_fts, 1, :hl_start, :hl_end, '…', 24) AS snippet,
+               bm25(note_fts, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS score
+        FROM note_fts
+        JOIN note n ON n.id = note_fts.rowid
+        WHERE note_fts MATCH :match
+        {'AND n.category = :category' if category else ''}
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """
+    params = {
+        'match': match,
+        'hl_start': _HL_START,
+        'hl_end': _HL_END,
+        'limit': limit + 1,
+        'offset': offset
+    }
+    if category:
+        params['category'] = category
+
+    rows = session.execute(text(sql), params).mappings().all()
+    has_more = len(rows) > limit
+
+    results = []
+    for row in rows[:limit]:
+        results.append({
+            'id': row['id'],
+            'title': row['title'],
+            'title_highlight': _highlight(row['title_highlight']),
+            'snippet': _highlight(row['snippet']),
+            'category': row['category'],
+            'tags': row['tags'],
+            'created_at': _iso(row['created_at']),
+            'updated_at': _iso(row['updated_at']),
+            'score': round(-row['score'], 4)
+        })
+    return results, has_more
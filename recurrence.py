@@ -0,0 +1,139 @@
+"""Wydarzenia cykliczne - reguły w stylu RRULE rozwijane tylko w żądanym oknie"""
+import calendar
+from datetime import datetime, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+
+# Skróty akceptowane z formularza kalendarza
+_SHORTCUTS = {'daily': 'FREQ=DAILY', 'weekly': 'FREQ=WEEKLY', 'monthly': 'FREQ=MONTHLY'}
+
+
+class InvalidRule(ValueError):
+    """Nieprawidłowa reguła powtarzania"""
+
+
+class RecurrenceRule:
+    """FREQ=DAILY|WEEKLY|MONTHLY;INTERVAL=n;COUNT=n;UNTIL=YYYYMMDD[THHMMSS]"""
+
+    def __init__(self, freq, interval=1, count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, value):
+        value = _SHORTCUTS.get(value.strip().lower(), value.strip())
+        parts = {}
+        for part in value.upper().split(';'):
+            if not part:
+                continue
+            if '=' not in part:
+                raise InvalidRule(f"Nieprawidłowy fragment reguły: {part}")
+            key, val = part.split('=', 1)
+            parts[key.strip()] = val.strip()
+
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise InvalidRule(f"Obsługiwane częstotliwości: {', '.join(FREQUENCIES)}")
+        try:
+            interval = int(parts.get('INTERVAL', 1))
+            count = int(parts['COUNT']) if 'COUNT' in parts else None
+            until = _parse_until(parts['UNTIL']) if 'UNTIL' in parts else None
+        except ValueError as e:
+            raise InvalidRule(str(e))
+        if interval < 1 or (count is not None and count < 1):
+            raise InvalidRule("INTERVAL i COUNT muszą być dodatnie")
+        return cls(freq, interval, count, until)
+
+    def to_string(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%dT%H%M%S')}")
+        return ';'.join(parts)
+
+    def occurrence(self, start, index):
+        """Początek wystąpienia o numerze `index` (None gdy taki dzień nie istnieje)"""
+        if self.freq == 'DAILY':
+            return start + timedelta(days=index * self.interval)
+        if self.freq == 'WEEKLY':
+            return start + timedelta(weeks=index * self.interval)
+        month_index = start.month - 1 + index * self.interval
+        year = start.year + month_index // 12
+        month = month_index % 12 + 1
+        # Np. 31. dnia miesiąca - miesiące bez tego dnia są pomijane
+        if start.day > calendar.monthrange(year, month)[1]:
+            return None
+        return start.replace(year=year, month=month)
+
+    def _skips(self, start):
+        """Czy seria pomija niektóre wystąpienia (miesięczna od 29. dnia wzwyż)"""
+        return self.freq == 'MONTHLY' and start.day > 28
+
+    def _first_index(self, start, moment):
+        """Najmniejszy numer wystąpienia, które może zaczynać się po `moment`"""
+        if moment <= start:
+            return 0
+        if self.freq == 'MONTHLY':
+            months = (moment.year - start.year) * 12 + moment.month - start.month
+            return max(0, months // self.interval - 1)
+        step = timedelta(days=self.interval) if self.freq == 'DAILY' else timedelta(weeks=self.interval)
+        return max(0, (moment - start) // step)
+
+    def _iter(self, start, index=0):
+        """Kolejne wystąpienia od numeru `index` z uwzględnieniem COUNT i UNTIL"""
+        # COUNT liczy tylko istniejące dni, więc serie z pominięciami liczymy od początku
+        counted = 0 if self.count is not None and self._skips(start) else None
+        if counted is not None:
+            index = 0
+        while True:
+            if self.count is not None and (counted if counted is not None else index) >= self.count:
+                return
+            occurrence = self.occurrence(start, index)
+            index += 1
+            if occurrence is None:
+                continue
+            if self.until is not None and occurrence > self.until:
+                return
+            if counted is not None:
+                counted += 1
+            yield occurrence
+
+    def last_occurrence(self, start):
+        """Początek ostatniego wystąpienia (None gdy seria jest nieskończona)"""
+        if self.count is None:
+            return self.until
+        if self._skips(start):
+            last = None
+            for last in self._iter(start):
+                pass
+            return last
+        last = self.occurrence(start, self.count - 1)
+        return min(last, self.until) if self.until is not None else last
+
+    def between(self, start, duration, window_start, window_end):
+        """Początki wystąpień nachodzących na okno [window_start, window_end).
+
+        Koszt zależy od liczby wystąpień w oknie, nie od długości historii serii
+        (poza miesięcznymi seriami z COUNT od 29. dnia, ograniczonymi przez COUNT).
+        """
+        for occurrence in self._iter(start, self._first_index(start, window_start - duration)):
+            if occurrence >= window_end:
+                return
+            if occurrence + duration >= window_start:
+                yield occurrence
+
+
+def _parse_until(value):
+    for fmt in ('%Y%m%dT%H%M%SZ', '%Y%m%dT%H%M%S', '%Y%m%d'):
+        try:
+            until = datetime.strptime(value, fmt)
+            # Sama data obejmuje cały dzień
+            return until.replace(hour=23, minute=59, second=59) if fmt == '%Y%m%d' else until
+        except ValueError:
+            continue
+    return datetime.fromisoformat(value)
@@ -0,0 +1,227 @@
+"""Cache odpowiedzi mentorów - pamięć LRU + opcjonalna warstwa SQLite"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_message(message):
+    """Normalizacja pytania: wielkość liter, białe znaki i końcowa interpunkcja"""
+    return ' '.join(message.casefold().split()).rstrip(' ?!.')
+
+
+def make_cache_key(mentor_name, message, model, options):
+    """Klucz cache z mentora, znormalizowanego pytania, modelu i parametrów"""
+    raw = json.dumps({
+        'mentor': mentor_name,
+        'message': normalize_message(message),
+        'model': model,
+        'options': options
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """Trwające obliczenie - pozostali pytający czekają na jego wynik"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """Cache odpowiedzi z eksmisją LRU i TTL oraz łączeniem identycznych zapytań"""
+
+    def __init__(self, max_entries=1000, ttl=24 * 3600, sqlite_path=None, sqlite_max_entries=20000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_max_entries = sqlite_max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {'hits': 0, 'sqlite_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._puts_since_trim = 0
+        if sqlite_path:
+            self._open_sqlite(sqlite_path)
+
+    def _open_sqlite(self, path):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._db.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_accessed ON response_cache (accessed_at)')
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Nie udało się otworzyć cache SQLite {path}: {str(e)}")
+            self._db = None
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    # Warstwa pamięci
+
+    def _memory_get(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if now - created_at > self.ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    # Warstwa SQLite
+
+    def _sqlite_get(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT value, created_at FROM response_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.ttl:
+                    self._db.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute('UPDATE response_cache SET accessed_at = ? WHERE key = ?', (now, key))
+                self._db.commit()
+                return row
+        except sqlite3.Error as e:
+            logger.warning(f"Błąd odczytu cache SQLite: {str(e)}")
+            return None
+
+    def _sqlite_put(self, key, value, now):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, value, now, now)
+                )
+                self._puts_since_trim += 1
+                # Sprzątanie co jakiś czas, nie przy każdym zapisie
+                if self._puts_since_trim >= 100:
+                    self._puts_since_trim = 0
+                    self._sqlite_trim(now)
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Błąd zapisu cache SQLite: {str(e)}")
+
+    def _sqlite_trim(self, now):
+        self._db.execute('DELETE FROM response_cache WHERE created_at < ?', (now - self.ttl,))
+        self._db.execute("""
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.sqlite_max_entries,))
+
+    # API
+
+    def get(self, key):
+        """Odczyt z cache (pamięć, potem SQLite) - None gdy brak"""
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                self._counters['hits'] += 1
+                return value
+
+        row = self._sqlite_get(key, now)
+        if row is not None:
+            with self._lock:
+                self._counters['sqlite_hits'] += 1
+                self._memory_put(key, row[0], row[1])
+            return row[0]
+        return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, value, now)
+        self._sqlite_put(key, value, now)
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        """Wynik z cache albo z `compute()`; identyczne równoległe zapytania czekają na jedno obliczenie"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            if should_cache is None or should_cache(flight.value):
+                self.put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def record_miss(self):
+        """Pominięcie cache przez żądanie (np. strumień lub świeża odpowiedź)"""
+        self._count('misses')
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute('DELETE FROM response_cache')
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._memory)
+            stats['inflight'] = len(self._inflight)
+        stats['sqlite_enabled'] = self._db is not None
+        return stats
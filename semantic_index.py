@@ -0,0 +1,545 @@
+"""Indeks semantyczny notatek, zadań i rozmów - embeddingi Ollama w macierzy float32 (memmap)"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+try:
+    import numpy as np
+except ImportError:  # numpy jest opcjonalny - bez niego wyszukiwanie semantyczne jest wyłączone
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Poza systemami POSIX bez blokady pliku - serwer działa w jednym procesie
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _note_text(row):
+    title, content, tags = row[2], row[3], row[4]
+    return f"Notatka: {title}\n{content or ''}" + (f"\nTagi: {tags}" if tags else '')
+
+
+def _task_text(row):
+    title, description, status, priority, due_date = row[2:7]
+    details = f"{status}, priorytet {priority}" + (f", termin {str(due_date)[:10]}" if due_date else '')
+    return f"Zadanie: {title} ({details})" + (f"\n{description}" if description else '')
+
+
+def _chat_text(row):
+    return f"Użytkownik: {row[2]}\nMentor: {row[3]}"
+
+
+# Źródła indeksu: tabela, zapytanie (id, zakres, ...pola), tekst do embeddingu i kolumny,
+# których zmiana wymaga ponownego embeddingu. Zakres (scope) rozmów to mentor_id.
+SOURCES = {
+    'note': {
+        'table': 'note',
+        'sql': "SELECT id, NULL, title, content, tags FROM note",
+        'render': _note_text,
+        'columns': ('title', 'content', 'tags')
+    },
+    'task': {
+        'table': 'task',
+        'sql': "SELECT id, NULL, title, description, status, priority, due_date FROM task",
+        'render': _task_text,
+        'columns': ('title', 'description', 'status', 'priority', 'due_date')
+    },
+    'chat': {
+        'table': 'chat_message',
+        'sql': "SELECT id, mentor_id, user_message, mentor_response FROM chat_message",
+        'render': _chat_text,
+        'columns': ('user_message', 'mentor_response')
+    }
+}
+
+KIND_CODES = {kind: code for code, kind in enumerate(SOURCES)}
+KIND_NAMES = {code: kind for kind, code in KIND_CODES.items()}
+
+
+def _setup_statements():
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS retrieval_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS retrieval_vector (
+            row INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            scope INTEGER,
+            hash TEXT NOT NULL,
+            UNIQUE (kind, item_id)
+        )
+        """
+    ]
+    # Kolejka zmian wypełniana triggerami - obejmuje też zapisy paczkami (import)
+    for kind, source in SOURCES.items():
+        table = source['table']
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS retrieval_{table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO retrieval_queue(kind, item_id) VALUES ('{kind}', new.id);
+        END
+        """)
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS retrieval_{table}_au AFTER UPDATE OF {', '.join(source['columns'])} ON {table} BEGIN
+            INSERT INTO retrieval_queue(kind, item_id) VALUES ('{kind}', new.id);
+        END
+        """)
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS retrieval_{table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO retrieval_queue(kind, item_id) VALUES ('{kind}', old.id);
+        END
+        """)
+    return statements
+
+
+def _drop_statements():
+    statements = [
+        f"DROP TRIGGER IF EXISTS retrieval_{source['table']}_{suffix}"
+        for source in SOURCES.values() for suffix in ('ai', 'au', 'ad')
+    ]
+    statements.append("DROP TABLE IF EXISTS retrieval_queue")
+    return statements
+
+
+def content_hash(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+class SemanticIndex:
+    """Wektory znormalizowane (float32) w pliku mapowanym do pamięci.
+
+    Wiersz macierzy odpowiada jednemu elementowi (notatka, zadanie, wymiana
+    w czacie); metadane wierszy są w tabeli retrieval_vector. Zmiany trafiają
+    do kolejki przez triggery i są embeddowane w tle paczkami - tylko gdy
+    zmienił się skrót treści. Zapytanie top-k to jedno mnożenie macierzy.
+    """
+
+    def __init__(self, embed, path, model, batch_size=32, poll_interval=5, max_text_chars=2000,
+                 query_cache_size=256):
+        self.embed = embed
+        self.path = path
+        self.model = model
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_text_chars = max_text_chars
+        self.query_cache_size = query_cache_size
+
+        self.engine = None
+        self._lock = threading.RLock()
+        self._started = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._writer_lock = None
+        self._retry_at = 0
+        self._last_error = None
+        # Długość kolejki zmian z ostatniego przebiegu wątku indeksującego - health nie pyta bazy
+        self._queued = None
+        self._query_cache = OrderedDict()
+        self._reset_memory(dim=None)
+
+    @property
+    def enabled(self):
+        return np is not None
+
+    def _reset_memory(self, dim):
+        self.dim = dim
+        self._capacity = 0
+        self._size = 0  # Najwyższy użyty wiersz + 1
+        self._matrix = None
+        self._kinds = None
+        self._scopes = None
+        self._items = None
+        self._rows = {}  # (kind, item_id) -> wiersz
+        self._hashes = {}  # (kind, item_id) -> skrót treści
+        self._by_hash = {}  # skrót treści -> wiersz (wektor do ponownego użycia)
+        self._free = []
+
+    # --- Plik macierzy ---
+
+    def _matrix_path(self):
+        return self.path + '.f32'
+
+    def _header_path(self):
+        return self.path + '.json'
+
+    def _write_header(self):
+        with open(self._header_path(), 'w') as f:
+            json.dump({'model': self.model, 'dim': self.dim, 'capacity': self._capacity}, f)
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(1024, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self._matrix_path(), 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self._matrix_path(), dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+        kinds = np.full(capacity, -1, dtype=np.int8)
+        scopes = np.full(capacity, -1, dtype=np.int64)
+        items = np.zeros(capacity, dtype=np.int64)
+        if self._kinds is not None:
+            kinds[:self._capacity] = self._kinds
+            scopes[:self._capacity] = self._scopes
+            items[:self._capacity] = self._items
+        self._kinds, self._scopes, self._items = kinds, scopes, items
+        self._capacity = capacity
+        self._write_header()
+
+    # --- Inicjalizacja ---
+
+    def setup(self, engine):
+        """Tabele, triggery i wczytanie indeksu; przy pierwszym uruchomieniu kolejkuje wszystkie dane"""
+        if not self.enabled:
+            logger.warning("Brak numpy - wyszukiwanie semantyczne wyłączone")
+            return
+        with self._lock:
+            if self.engine is not None:
+                return
+            with engine.begin() as conn:
+                # Bez kolejki: pierwsze uruchomienie albo wyszukiwanie było wyłączone (detach)
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'retrieval_queue'")
+                ).first() is not None
+                for statement in _setup_statements():
+                    conn.execute(text(statement))
+                if not exists:
+                    self._enqueue_all(conn)
+            self.engine = engine
+            self._load()
+
+    def _enqueue_all(self, conn):
+        for kind, source in SOURCES.items():
+            conn.execute(text(
+                f"INSERT INTO retrieval_queue(kind, item_id) SELECT '{kind}', id FROM {source['table']}"
+            ))
+        # Elementy usunięte, gdy nie było triggerów - kolejka usunie je z indeksu
+        conn.execute(text("INSERT INTO retrieval_queue(kind, item_id) SELECT kind, item_id FROM retrieval_vector"))
+        logger.info("Zakolejkowano wszystkie dane do indeksu semantycznego")
+
+    def detach(self, engine):
+        """Usunięcie triggerów i kolejki zmian, gdy wyszukiwanie jest wyłączone.
+
+        Inaczej każdy zapis notatki, zadania i wiadomości dopisywałby wiersz
+        do kolejki, której nikt nie opróżnia. Po ponownym włączeniu setup()
+        kolejkuje wszystko od nowa, a niezmienione treści nie są embeddowane.
+        """
+        with engine.begin() as conn:
+            for statement in _drop_statements():
+                conn.execute(text(statement))
+
+    def _load(self):
+        header = None
+        if os.path.exists(self._header_path()) and os.path.exists(self._matrix_path()):
+            with open(self._header_path()) as f:
+                header = json.load(f)
+
+        with self.engine.begin() as conn:
+            if header is None or header.get('model') != self.model or not header.get('dim'):
+                # Nowy model embeddingów (albo brak pliku) - budujemy indeks od nowa
+                conn.execute(text("DELETE FROM retrieval_vector"))
+                conn.execute(text("DELETE FROM retrieval_queue"))
+                self._enqueue_all(conn)
+                for path in (self._matrix_path(), self._header_path()):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._reset_memory(dim=None)
+                return
+            rows = conn.execute(text("SELECT row, kind, item_id, scope, hash FROM retrieval_vector")).all()
+
+        self._reset_memory(dim=header['dim'])
+        self._ensure_capacity(max(header.get('capacity', 0), max((row[0] for row in rows), default=-1) + 1))
+        for row, kind, item_id, scope, hash_ in rows:
+            self._assign(row, kind, item_id, scope, hash_)
+        self._size = max((row[0] for row in rows), default=-1) + 1
+        used = set(self._rows.values())
+        self._free = [row for row in range(self._size) if row not in used]
+        logger.info(f"Wczytano indeks semantyczny: {len(self._rows)} wektorów ({self.dim} wymiarów)")
+
+    def _assign(self, row, kind, item_id, scope, hash_):
+        key = (kind, item_id)
+        self._rows[key] = row
+        self._hashes[key] = hash_
+        self._by_hash.setdefault(hash_, row)
+        self._kinds[row] = KIND_CODES[kind]
+        self._scopes[row] = scope if scope is not None else -1
+        self._items[row] = item_id
+
+    def _release(self, key):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return None
+        hash_ = self._hashes.pop(key)
+        if self._by_hash.get(hash_) == row:
+            del self._by_hash[hash_]
+        self._kinds[row] = -1
+        self._matrix[row] = 0
+        self._free.append(row)
+        return row
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        self._ensure_capacity(self._size + 1)
+        self._size += 1
+        return self._size - 1
+
+    # --- Aktualizacja w tle ---
+
+    def ensure_started(self, engine):
+        """Uruchomienie wątku indeksującego (tylko raz na proces)"""
+        if self._started or not self.enabled:
+            return
+        self.setup(engine)
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if not self._acquire_writer():
+                logger.warning("Indeks semantyczny aktualizuje inny proces - ten proces go nie zapisuje")
+                return
+            self._thread = threading.Thread(target=self._run, name='semantic-index', daemon=True)
+            self._thread.start()
+
+    def _acquire_writer(self):
+        """Wyłączność na zapis plików indeksu - kilka procesów nadpisywałoby memmap i kolejkę"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        handle = open(f'{self.path}.lock', 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Blokada trwa do końca procesu
+        self._writer_lock = handle
+        return True
+
+    def notify(self):
+        """Przyspieszenie indeksowania po zapisie (bez czekania na poll_interval)"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while self.process_queue():
+                    pass
+                self._last_error = None
+                wait = self.poll_interval
+            except Exception as e:
+                self._last_error = str(e)
+                logger.warning(f"Indeksowanie semantyczne wstrzymane: {str(e)}")
+                wait = max(self.poll_interval, 30)
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _fetch_sources(self, conn, kind, ids):
+        source = SOURCES[kind]
+        placeholders = ', '.join(f':id{i}' for i in range(len(ids)))
+        rows = conn.execute(
+            text(f"{source['sql']} WHERE id IN ({placeholders})"),
+            {f'id{i}': item_id for i, item_id in enumerate(ids)}
+        ).all()
+        return {row[0]: (row[1], source['render'](row)[:self.max_text_chars]) for row in rows}
+
+    def process_queue(self):
+        """Jedna paczka zmian z kolejki - zwraca liczbę przetworzonych wpisów"""
+        with self.engine.connect() as conn:
+            queued = conn.execute(
+                text("SELECT id, kind, item_id FROM retrieval_queue ORDER BY id LIMIT :limit"),
+                {'limit': self.batch_size * 4}
+            ).all()
+            if not queued:
+                self._queued = 0
+                return 0
+            last_id = queued[-1][0]
+
+            by_kind = {}
+            for _, kind, item_id in queued:
+                if kind in SOURCES:
+                    by_kind.setdefault(kind, set()).add(item_id)
+            current = {}
+            for kind, ids in by_kind.items():
+                for item_id, (scope, content) in self._fetch_sources(conn, kind, sorted(ids)).items():
+                    current[(kind, item_id)] = (scope, content)
+
+        deleted = [(kind, item_id) for kind, ids in by_kind.items() for item_id in ids
+                   if (kind, item_id) not in current]
+        changed = {}
+        for key, (scope, content) in current.items():
+            hash_ = content_hash(content)
+            if self._hashes.get(key) != hash_:
+                changed[key] = (scope, content, hash_)
+
+        # Embeddingi tylko dla treści, których wektora jeszcze nie mamy
+        missing = list(dict.fromkeys(
+            hash_ for scope, content, hash_ in changed.values() if hash_ not in self._by_hash
+        ))
+        contents = {hash_: content for scope, content, hash_ in changed.values()}
+        vectors = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            for hash_, vector in zip(batch, self.embed([contents[h] for h in batch])):
+                vectors[hash_] = vector
+
+        with self._lock:
+            # Wektory do ponownego użycia kopiujemy zanim zwolnimy jakiekolwiek wiersze
+            for scope, content, hash_ in changed.values():
+                if hash_ not in vectors and hash_ in self._by_hash:
+                    vectors[hash_] = np.array(self._matrix[self._by_hash[hash_]])
+            writes = []
+            for key in deleted:
+                if self._release(key) is not None:
+                    writes.append(('delete', key, None))
+            for key, (scope, content, hash_) in changed.items():
+                vector = np.asarray(vectors[hash_], dtype=np.float32)
+                if self.dim is None:
+                    self.dim = len(vector)
+                norm = np.linalg.norm(vector)
+                vector = vector / norm if norm else vector
+                self._release(key)
+                row = self._allocate()
+                self._matrix[row] = vector
+                self._assign(row, key[0], key[1], scope, hash_)
+                writes.append(('upsert', key, (row, scope, hash_)))
+            if self._matrix is not None:
+                self._matrix.flush()
+
+        # Metadane i usunięcie z kolejki w jednej transakcji (po zapisaniu wektorów)
+        with self.engine.begin() as conn:
+            for action, (kind, item_id), values in writes:
+                conn.execute(
+                    text("DELETE FROM retrieval_vector WHERE kind = :kind AND item_id = :item_id"),
+                    {'kind': kind, 'item_id': item_id}
+                )
+                if action == 'upsert':
+                    row, scope, hash_ = values
+                    conn.execute(
+                        text("INSERT OR REPLACE INTO retrieval_vector(row, kind, item_id, scope, hash) "
+                             "VALUES (:row, :kind, :item_id, :scope, :hash)"),
+                        {'row': row, 'kind': kind, 'item_id': item_id, 'scope': scope, 'hash': hash_}
+                    )
+            conn.execute(text("DELETE FROM retrieval_queue WHERE id <= :last_id"), {'last_id': last_id})
+            self._queued = conn.execute(text("SELECT COUNT(*) FROM retrieval_queue")).scalar()
+
+        if changed or deleted:
+            logger.info(f"Indeks semantyczny: {len(changed)} zmienionych "
+                        f"({len(missing)} nowych embeddingów), {len(deleted)} usuniętych")
+        return len(queued)
+
+    # --- Wyszukiwanie ---
+
+    def _query_vector(self, query, timeout=None):
+        key = content_hash(query)
+        with self._lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                return cached
+        embeddings = self.embed([query]) if timeout is None else self.embed([query], timeout=timeout)
+        vector = np.asarray(embeddings[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        with self._lock:
+            self._query_cache[key] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def search(self, query, k=4, scope=None, exclude=None, min_score=0.0, timeout=None):
+        """Top-k elementów najbardziej podobnych do zapytania: [(kind, item_id, score)].
+
+        Rozmowy są brane tylko z zakresu `scope` (mentor); `exclude` to zbiór
+        kluczy (kind, item_id) pomijanych w wynikach. `timeout` ogranicza
+        czekanie na embedding zapytania.
+        """
+        if not self.enabled or self.engine is None or self.dim is None or not self._rows:
+            return []
+        # Po błędzie Ollama nie spowalniamy kolejnych żądań
+        if time.monotonic() < self._retry_at:
+            return []
+        try:
+            query_vector = self._query_vector(query, timeout)
+        except Exception as e:
+            self._retry_at = time.monotonic() + 60
+            logger.warning(f"Nie udało się obliczyć embeddingu zapytania: {str(e)}")
+            return []
+        if len(query_vector) != self.dim:
+            return []
+
+        exclude = exclude or set()
+        with self._lock:
+            size = self._size
+            scores = self._matrix[:size] @ query_vector
+            kinds = self._kinds[:size]
+            valid = kinds >= 0
+            chat = kinds == KIND_CODES['chat']
+            valid &= ~chat | (self._scopes[:size] == (scope if scope is not None else -2))
+            scores = np.where(valid, scores, -np.inf)
+
+            wanted = min(k + len(exclude), int(valid.sum()))
+            if wanted <= 0:
+                return []
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            top = top[np.argsort(-scores[top])]
+            hits = []
+            for row in top:
+                score = float(scores[row])
+                if score < min_score:
+                    break
+                key = (KIND_NAMES[int(kinds[row])], int(self._items[row]))
+                if key in exclude:
+                    continue
+                hits.append((key[0], key[1], score))
+                if len(hits) >= k:
+                    break
+        return hits
+
+    def texts(self, hits):
+        """Aktualne treści trafień w kolejności wyników"""
+        if not hits:
+            return []
+        by_kind = {}
+        for kind, item_id, _ in hits:
+            by_kind.setdefault(kind, []).append(item_id)
+        contents = {}
+        with self.engine.connect() as conn:
+            for kind, ids in by_kind.items():
+                for item_id, (_, content) in self._fetch_sources(conn, kind, ids).items():
+                    contents[(kind, item_id)] = content
+        return [contents[(kind, item_id)] for kind, item_id, _ in hits if (kind, item_id) in contents]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'model': self.model,
+                'vectors': len(self._rows),
+                'dim': self.dim,
+                'capacity': self._capacity,
+                'queued': self._queued,
+                'last_error': self._last_error
+            }
@@ -0,0 +1,75 @@
+"""Szybka serializacja list - projekcja kolumn do krotek, daty ISO bez obiektów datetime, orjson/MessagePack"""
+import json
+from datetime import datetime
+
+from flask import Response
+from sqlalchemy import Text, type_coerce
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego standardowy json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack jest opcjonalny - bez niego zawsze JSON
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def projection(model, names, timestamps=()):
+    """Kolumny do zapytania; znaczniki czasu jako surowy tekst z SQLite (bez parsowania do datetime)"""
+    columns = []
+    for name in names:
+        column = getattr(model, name)
+        columns.append(type_coerce(column, Text).label(name) if name in timestamps else column)
+    return columns
+
+
+def iso_timestamp(value):
+    """Tekst daty z SQLite ('2024-01-02 10:00:00.000000') w formacie datetime.isoformat()"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        # Bazy inne niż SQLite zwracają datetime mimo type_coerce
+        return value.isoformat()
+    if value.endswith('.000000'):
+        value = value[:-7]
+    return value.replace(' ', 'T', 1)
+
+
+def rows_to_dicts(rows, names, timestamps=(), derived=None):
+    """Krotki z zapytania jako słowniki; kolumny czasu są przeliczane hurtem, kolumna po kolumnie"""
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    for index, name in enumerate(names):
+        if name in timestamps:
+            columns[index] = [iso_timestamp(value) for value in columns[index]]
+    items = [dict(zip(names, values)) for values in zip(*columns)]
+    if derived:
+        for name, compute in derived.items():
+            for item in items:
+                item[name] = compute(item)
+    return items
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def payload_response(payload, request):
+    """JSON (orjson) albo MessagePack, gdy klient woli go w nagłówku Accept"""
+    if msgpack is not None:
+        best = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE], default=JSON_MIMETYPE)
+        if best == MSGPACK_MIMETYPE:
+            response = Response(msgpack.packb(payload, use_bin_type=True), mimetype=MSGPACK_MIMETYPE)
+            response.vary.add('Accept')
+            return response
+    response = Response(dumps(payload), mimetype=JSON_MIMETYPE)
+    response.vary.add('Accept')
+    return response
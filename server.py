@@ -0,0 +1,171 @@
+"""Uruchomienie aplikacji produkcyjnie - wiele procesów (gunicorn) albo jeden wielowątkowy (werkzeug).
+
+    python server.py --workers 4 --threads 8 --port 5002
+
+Baza jest inicjalizowana raz, w procesie nadrzędnym przed startem workerów.
+SIGTERM kończy przyjmowanie nowych połączeń, czeka na trwające żądania
+i generacje modelu (LLM_SHUTDOWN_TIMEOUT), a potem zapisuje zaległe dane.
+Konfiguracja pochodzi ze zmiennych środowiskowych (config.py).
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None  # Bez gunicorn - jeden proces na serwerze werkzeug
+
+import app as application
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveRequests:
+    """Middleware WSGI liczący żądania w toku (strumień kończy się przy zamknięciu odpowiedzi)"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._condition = threading.Condition()
+        self._active = 0
+
+    def __call__(self, environ, start_response):
+        with self._condition:
+            self._active += 1
+        try:
+            return ClosingIterator(self.wsgi_app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout):
+        """Czekanie na koniec żądań w toku; False gdy minął timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._active == 0, timeout)
+
+
+def prepare(workers):
+    """Konfiguracja aplikacji i jednorazowa inicjalizacja bazy w bieżącym procesie"""
+    overrides = {}
+    if workers > 1:
+        # Indeks semantyczny to pliki mapowane w pamięci jednego procesu - workery nadpisywałyby je nawzajem
+        if application.SETTINGS['RETRIEVAL_ENABLED']:
+            logger.warning("Wyszukiwanie semantyczne wyłączone - wymaga jednego procesu (--workers 1)")
+        overrides['RETRIEVAL_ENABLED'] = False
+        logger.info(f"Limity kolejki modelu obowiązują w każdym z {workers} workerów osobno "
+                    f"(łącznie do {workers * application.SETTINGS['LLM_MAX_IN_FLIGHT']} generacji)")
+    application.create_app(overrides)
+    with application.app.app_context():
+        application.init_db()
+        # Workery nie mogą dziedziczyć otwartych połączeń SQLite po fork()
+        application.db.engine.dispose()
+
+
+def graceful_timeout():
+    """Czas na zamknięcie: trwające żądania (najdłużej termin modelu), potem generacje w tle"""
+    return int(application.SETTINGS['LLM_REQUEST_TIMEOUT'] + application.SETTINGS['LLM_SHUTDOWN_TIMEOUT']) + 5
+
+
+def run_gunicorn(args):
+    def post_fork(server, worker):
+        with application.app.app_context():
+            # Pula skopiowana z procesu nadrzędnego jest pusta, ale close=False nie rusza cudzych połączeń
+            application.db.engine.dispose(close=False)
+        # Zaległości wyciągania zadań zgłasza tylko pierwszy worker
+        application.start_worker(run_backlog=worker.age == 1)
+
+    def worker_exit(server, worker):
+        application.shutdown()
+
+    options = {
+        'bind': args.bind or f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        # Aplikacja i baza są przygotowane w procesie nadrzędnym
+        'preload_app': True,
+        # Strumienie odpowiedzi trwają tyle, ile generacja - heartbeat wysyła wątek główny workera
+        'timeout': graceful_timeout(),
+        'graceful_timeout': graceful_timeout(),
+        'keepalive': 5,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit
+    }
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application.app
+
+    Server().run()
+
+
+def run_werkzeug(args):
+    application.start_worker()
+    wsgi_app = ActiveRequests(application.app.wsgi_app)
+    application.app.wsgi_app = wsgi_app
+    server = make_server(args.host, args.port, application.app, threaded=True)
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        logger.info("Zamykanie serwera - nowe połączenia nie są przyjmowane")
+        # shutdown() czeka na koniec pętli serve_forever, więc nie może działać w jej wątku
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Serwer werkzeug na http://{args.host}:{args.port} (jeden proces, wątek na żądanie)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if not wsgi_app.wait_idle(application.SETTINGS['LLM_REQUEST_TIMEOUT']):
+            logger.warning("Zamykanie mimo żądań w toku")
+        application.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--bind', help='Adres gunicorn (np. unix:/run/mentors.sock) zamiast --host/--port')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 2)),
+                        help='Procesy obsługujące żądania (gunicorn)')
+    parser.add_argument('--threads', type=int, default=8, help='Wątki na proces')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'werkzeug'), default='auto')
+    args = parser.parse_args()
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if BaseApplication is not None and os.name == 'posix' else 'werkzeug'
+    if server == 'gunicorn' and BaseApplication is None:
+        parser.error("gunicorn nie jest zainstalowany (pip install gunicorn)")
+    if server == 'werkzeug' and args.workers > 1:
+        logger.warning("Serwer werkzeug działa w jednym procesie - pomijam --workers")
+        args.workers = 1
+
+    prepare(args.workers)
+    if server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_werkzeug(args)
+
+
+if __name__ == '__main__':
+    main()
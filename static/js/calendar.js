@@ -3,6 +3,9 @@
 let currentDate = new Date();
 let currentView = 'month';
 let events = [];
+let upcomingEvents = [];
+let eventsRequestId = 0;
+let syncToken = null;
 
 // Inicjalizacja kalendarza
 document.addEventListener('DOMContentLoaded', function() {
@@ -23,18 +26,21 @@ function setupEventListeners() {
         currentDate.setMonth(currentDate.getMonth() - 1);
         generateCalendar();
         updateCalendarHeader();
+        loadEvents();
     });
 
     document.getElementById('nextMonth').addEventListener('click', () => {
         currentDate.setMonth(currentDate.getMonth() + 1);
         generateCalendar();
         updateCalendarHeader();
+        loadEvents();
     });
 
     document.getElementById('todayBtn').addEventListener('click', () => {
         currentDate = new Date();
         generateCalendar();
         updateCalendarHeader();
+        loadEvents();
     });
 
     // Przełączanie widoków
@@ -44,6 +50,7 @@ function setupEventListeners() {
             btn.classList.add('active');
             currentView = btn.dataset.view;
             generateCalendar();
+            loadEvents();
         });
     });
 
@@ -60,6 +67,7 @@ function setupEventListeners() {
             currentDate = new Date();
             generateCalendar();
             updateCalendarHeader();
+            loadEvents();
         });
     }
 
@@ -281,14 +289,14 @@ function generateDayView() {
 
 function getEventsForDate(date) {
     return events.filter(event => {
-        const eventDate = new Date(event.date);
+        const eventDate = new Date(event.start_date);
         return eventDate.toDateString() === date.toDateString();
     });
 }
 
 function getEventsForDateTime(dateTime) {
     return events.filter(event => {
-        const eventDate = new Date(event.date);
+        const eventDate = new Date(event.start_date);
         return eventDate.toDateString() === dateTime.toDateString() && 
                eventDate.getHours() === dateTime.getHours();
     });
@@ -317,21 +325,25 @@ function closeModal() {
     document.getElementById('eventModal').style.display = 'none';
 }
 
-function handleEventSubmit(e) {
-    e.preventDefault();
-    
-    const formData = new FormData(e.target);
-    const eventData = {
+// Dane formularza w formacie API (start_date łączy datę i godzinę)
+function buildEventPayload(formData) {
+    const date = formData.get('date');
+    return {
         title: formData.get('title'),
         description: formData.get('description'),
-        date: formData.get('date'),
-        time: formData.get('time'),
-        type: formData.get('type'),
-        reminder: formData.get('reminder')
+        start_date: date ? `${date}T${formData.get('time') || '00:00'}` : null,
+        event_type: formData.get('type'),
+        recurrence: formData.get('recurrence') || null
     };
+}
+
+function handleEventSubmit(e) {
+    e.preventDefault();
+    
+    const eventData = buildEventPayload(new FormData(e.target));
     
     // Walidacja
-    if (!eventData.title || !eventData.date) {
+    if (!eventData.title || !eventData.start_date) {
         showNotification('Proszę wypełnić wymagane pola', 'error');
         return;
     }
@@ -352,11 +364,9 @@ function addEvent(eventData) {
     .then(data => {
         if (data.success) {
             showNotification('Wydarzenie zostało dodane!', 'success');
-            loadEvents(); // Przeładuj wydarzenia
-            generateCalendar(); // Odśwież kalendarz
-            updateUpcomingEvents();
+            syncEvents(); // Pobierz tylko zmiany i odśwież kalendarz
         } else {
-            showNotification('Błąd podczas dodawania wydarzenia', 'error');
+            showNotification(data.error || 'Błąd podczas dodawania wydarzenia', 'error');
         }
     })
     .catch(error => {
@@ -365,29 +375,128 @@ function addEvent(eventData) {
     });
 }
 
+// Data lokalna w formacie ISO bez strefy (tak jak daty w API)
+function toLocalISO(date) {
+    const pad = value => value.toString().padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}` +
+        `T${pad(date.getHours())}:${pad(date.getMinutes())}:00`;
+}
+
+// Zakres dat widoczny w bieżącym widoku - tylko on jest pobierany z serwera
+function getVisibleRange() {
+    let start;
+    let days;
+    if (currentView === 'week') {
+        start = new Date(currentDate);
+        const day = start.getDay();
+        start.setDate(start.getDate() - day + (day === 0 ? -6 : 1));
+        days = 7;
+    } else if (currentView === 'day') {
+        start = new Date(currentDate);
+        days = 1;
+    } else {
+        // Siatka miesiąca: 42 dni od poniedziałku przed pierwszym dniem miesiąca
+        start = new Date(currentDate.getFullYear(), currentDate.getMonth(), 1);
+        const dayOfWeek = start.getDay() === 0 ? 7 : start.getDay();
+        start.setDate(start.getDate() - (dayOfWeek - 1));
+        days = 42;
+    }
+    start.setHours(0, 0, 0, 0);
+    const end = new Date(start);
+    end.setDate(start.getDate() + days);
+    return { from: toLocalISO(start), to: toLocalISO(end) };
+}
+
+// Pola używane przez widoki kalendarza wyliczone z odpowiedzi API
+function normalizeEvent(event) {
+    return {
+        ...event,
+        date: event.start_date.slice(0, 10),
+        time: event.start_date.slice(11, 16),
+        type: event.event_type
+    };
+}
+
 function loadEvents() {
-    fetch('/api/events')
+    const { from, to } = getVisibleRange();
+    const requestId = ++eventsRequestId;
+    
+    // no-cache: przeglądarka wysyła If-None-Match i przy 304 używa swojej kopii
+    fetch(`/api/events?from=${encodeURIComponent(from)}&to=${encodeURIComponent(to)}`, { cache: 'no-cache' })
     .then(response => response.json())
     .then(data => {
-        events = data.events || [];
+        // Ignoruj odpowiedź dla widoku, który został już przełączony
+        if (requestId !== eventsRequestId) return;
+        events = (data.events || []).map(normalizeEvent);
+        syncToken = data.success ? data.sync_token : null;
         generateCalendar();
-        updateUpcomingEvents();
     })
     .catch(error => {
         console.error('Error loading events:', error);
     });
+    
+    loadUpcomingEvents();
+}
+
+// Po zmianie pobieramy tylko zmienione wydarzenia z widocznego zakresu, nie cały zakres
+async function syncEvents() {
+    if (syncToken === null) {
+        return loadEvents();
+    }
+    
+    const { from, to } = getVisibleRange();
+    const requestId = eventsRequestId;
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const params = new URLSearchParams({ since: syncToken, entities: 'events', from, to });
+            const response = await fetch(`/api/sync?${params}`);
+            const data = await response.json();
+            // Widok przełączony w trakcie - loadEvents pobiera już nowy zakres
+            if (requestId !== eventsRequestId) return;
+            // Token zbyt stary (usunięcia już wyczyszczone) - pełne przeładowanie
+            if (!data.success || data.reset) {
+                return loadEvents();
+            }
+            applyEventChanges(data.changes.events);
+            syncToken = data.token;
+            hasMore = data.has_more;
+        }
+        generateCalendar();
+        loadUpcomingEvents();
+    } catch (error) {
+        console.error('Error syncing events:', error);
+        loadEvents();
+    }
+}
+
+// Serie przychodzą jako wystąpienia z zakresu - zastępują wszystkie poprzednie wystąpienia
+function applyEventChanges(changes) {
+    const changedIds = new Set(changes.ids);
+    events = events.filter(event => !changedIds.has(event.id))
+        .concat(changes.upserted.map(normalizeEvent));
+    events.sort((a, b) => a.start_date.localeCompare(b.start_date) || a.id - b.id);
+}
+
+function loadUpcomingEvents() {
+    fetch('/api/events/upcoming?days=7')
+    .then(response => response.json())
+    .then(data => {
+        upcomingEvents = (data.events || []).map(normalizeEvent);
+        updateUpcomingEvents();
+    })
+    .catch(error => {
+        console.error('Error loading upcoming events:', error);
+    });
 }
 
 function updateUpcomingEvents() {
-    const upcomingContainer = document.getElementById('upcomingEvents');
+    const upcomingContainer = document.getElementById('upcomingEvents') || document.getElementById('eventsList');
+    if (!upcomingContainer) return;
     const today = new Date();
     
-    // Znajdź nadchodzące wydarzenia (następne 7 dni)
-    const upcoming = events.filter(event => {
-        const eventDate = new Date(event.date);
-        const daysDiff = Math.ceil((eventDate - today) / (1000 * 60 * 60 * 24));
-        return daysDiff >= 0 && daysDiff <= 7;
-    }).sort((a, b) => new Date(a.date) - new Date(b.date));
+    // Nadchodzące wydarzenia (następne 7 dni) są już posortowane przez serwer
+    const upcoming = upcomingEvents;
     
     if (upcoming.length === 0) {
         upcomingContainer.innerHTML = `
@@ -400,7 +509,7 @@ function updateUpcomingEvents() {
     }
     
     upcomingContainer.innerHTML = upcoming.map(event => {
-        const eventDate = new Date(event.date);
+        const eventDate = new Date(event.start_date);
         const isToday = eventDate.toDateString() === today.toDateString();
         const dayName = eventDate.toLocaleDateString('pl-PL', { weekday: 'short', day: 'numeric', month: 'short' });
         
@@ -411,7 +520,7 @@ function updateUpcomingEvents() {
                     <span class="time">${event.time || ''}</span>
                 </div>
                 <div class="event-info">
-                    <div class="event-title">${event.title}</div>
+                    <div class="event-title">${event.title}${event.recurrence ? ' <i class="fas fa-redo" title="Wydarzenie cykliczne"></i>' : ''}</div>
                     <div class="event-type ${event.type}">${getEventTypeLabel(event.type)}</div>
                 </div>
                 <div class="event-actions">
@@ -438,17 +547,32 @@ function getEventTypeLabel(type) {
     return labels[type] || type;
 }
 
+// Reguła z API jako wartość pola "Powtarzanie" (niestandardowe reguły dostają własną opcję)
+function setRecurrenceField(rule) {
+    const select = document.getElementById('eventRecurrence');
+    if (!select) return;
+    const shortcuts = { 'FREQ=DAILY': 'daily', 'FREQ=WEEKLY': 'weekly', 'FREQ=MONTHLY': 'monthly' };
+    const value = rule ? (shortcuts[rule] || rule) : '';
+    if (value && !Array.from(select.options).some(option => option.value === value)) {
+        select.add(new Option(value, value));
+    }
+    select.value = value;
+}
+
 function editEvent(eventId) {
-    const event = events.find(e => e.id === eventId);
+    const event = events.find(e => e.id === eventId) || upcomingEvents.find(e => e.id === eventId);
     if (!event) return;
     
+    // Edycja wydarzenia cyklicznego zmienia całą serię - formularz dostaje jej początek
+    const start = event.series_start || event.start_date;
+    
     // Wypełnij formularz danymi wydarzenia
     document.getElementById('eventTitle').value = event.title;
     document.getElementById('eventDescription').value = event.description || '';
-    document.getElementById('eventDate').value = event.date;
-    document.getElementById('eventTime').value = event.time || '';
+    document.getElementById('eventDate').value = start.slice(0, 10);
+    document.getElementById('eventTime').value = start.slice(11, 16);
     document.getElementById('eventType').value = event.type;
-    document.getElementById('eventReminder').value = event.reminder || '';
+    setRecurrenceField(event.recurrence);
     
     // Pokaż modal z danymi do edycji
     const modal = document.getElementById('eventModal');
@@ -463,14 +587,7 @@ function editEvent(eventId) {
 }
 
 function updateEvent(eventId, formData) {
-    const eventData = {
-        title: formData.get('title'),
-        description: formData.get('description'),
-        date: formData.get('date'),
-        time: formData.get('time'),
-        type: formData.get('type'),
-        reminder: formData.get('reminder')
-    };
+    const eventData = buildEventPayload(formData);
     
     fetch(`/api/events/${eventId}`, {
         method: 'PUT',
@@ -483,14 +600,14 @@ function updateEvent(eventId, formData) {
     .then(data => {
         if (data.success) {
             showNotification('Wydarzenie zostało zaktualizowane!', 'success');
-            loadEvents();
+            syncEvents();
             closeModal();
             
             // Przywróć normalny handler
             const form = document.getElementById('eventForm');
             form.onsubmit = handleEventSubmit;
         } else {
-            showNotification('Błąd podczas aktualizacji wydarzenia', 'error');
+            showNotification(data.error || 'Błąd podczas aktualizacji wydarzenia', 'error');
         }
     })
     .catch(error => {
@@ -511,7 +628,7 @@ function deleteEvent(eventId) {
     .then(data => {
         if (data.success) {
             showNotification('Wydarzenie zostało usunięte!', 'success');
-            loadEvents();
+            syncEvents();
         } else {
             showNotification('Błąd podczas usuwania wydarzenia', 'error');
         }
@@ -4,6 +4,10 @@ let messageInput;
 let sendButton;
 let chatMessages;
 let charCount;
+let quickTasks = [];
+let tasksSyncToken = null;
+// Zadania z odpowiedzi mentora serwer zapisuje w tle - odświeżamy listę z opóźnieniem
+const EXTRACTED_TASKS_DELAY = 4000;
 
 // Inicjalizacja
 document.addEventListener('DOMContentLoaded', function() {
@@ -15,8 +19,51 @@ document.addEventListener('DOMContentLoaded', function() {
     setupEventListeners();
     scrollToBottom();
     autoResizeTextarea();
+    
+    // Starsze wiadomości doładowujemy przy przewinięciu do góry
+    chatMessages.addEventListener('scroll', function() {
+        if (chatMessages.scrollTop < 80) {
+            loadOlderMessages();
+        }
+    });
 });
 
+let isLoadingHistory = false;
+
+// Doładowanie starszej strony historii (paginacja kursorem)
+async function loadOlderMessages() {
+    if (isLoadingHistory || !hasMoreHistory || !historyCursor) return;
+    isLoadingHistory = true;
+    
+    try {
+        const response = await fetch(`/api/chat/history?mentor_id=${MENTOR_ID}&before=${encodeURIComponent(historyCursor)}`);
+        if (!response.ok) throw new Error('Network response was not ok');
+        
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error);
+        
+        // Zachowaj pozycję przewinięcia po wstawieniu wiadomości na górze
+        const previousHeight = chatMessages.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        
+        data.messages.forEach(message => {
+            const time = formatTime(message.timestamp);
+            fragment.appendChild(createMessageElement(message.user_message, true, false, time));
+            fragment.appendChild(createMessageElement(message.mentor_response, false, false, time));
+        });
+        
+        chatMessages.insertBefore(fragment, chatMessages.firstChild);
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        
+        historyCursor = data.page.first_cursor || historyCursor;
+        hasMoreHistory = data.page.has_more;
+    } catch (error) {
+        console.error('Error loading chat history:', error);
+    } finally {
+        isLoadingHistory = false;
+    }
+}
+
 // Konfiguracja event listenerów
 function setupEventListeners() {
     // Auto-resize textarea
@@ -82,11 +129,12 @@ async function sendMessage() {
     showTypingIndicator();
     
     try {
-        // Wyślij wiadomość do serwera
-        const response = await fetch('/api/chat', {
+        // Wyślij wiadomość do serwera - odpowiedź przychodzi strumieniowo (SSE)
+        const response = await fetch('/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
             },
             body: JSON.stringify({
                 mentor_id: MENTOR_ID,
@@ -94,17 +142,62 @@ async function sendMessage() {
             })
         });
         
-        if (!response.ok) {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.includes('application/json')) {
+            // Błąd walidacji albo pełna kolejka - serwer odpowiada JSON-em zamiast strumienia
+            const data = await response.json();
+            hideTypingIndicator();
+            if (response.status === 429) {
+                // Kolejka modelu pełna - serwer podaje kiedy spróbować ponownie
+                addMessageToUI(`${data.error} (za ok. ${data.retry_after} s)`, false, true);
+            } else if (data.success && data.response) {
+                addMessageToUI(data.response, false);
+            } else {
+                addMessageToUI(data.error || 'Przepraszam, wystąpił błąd. Spróbuj ponownie.', false, true);
+            }
+            return;
+        }
+        
+        if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
             throw new Error('Network response was not ok');
         }
         
-        const data = await response.json();
+        let bubble = null;
+        let text = '';
+        let finished = false;
         
-        // Symuluj opóźnienie odpowiedzi
-        setTimeout(() => {
-            hideTypingIndicator();
-            addMessageToUI(data.response, false);
-        }, 1000 + Math.random() * 2000);
+        await readEventStream(response, (event, data) => {
+            if (event === 'token') {
+                // Pierwszy token - zamień wskaźnik pisania na dymek wiadomości
+                if (!bubble) {
+                    hideTypingIndicator();
+                    isTyping = true;
+                    updateSendButton();
+                    bubble = addMessageToUI('', false);
+                }
+                text += data.token;
+                bubble.textContent = text;
+                scrollToBottom();
+            } else if (event === 'done') {
+                finished = true;
+                if (!bubble) {
+                    bubble = addMessageToUI(data.response, false);
+                } else {
+                    bubble.textContent = data.response;
+                }
+                if (tasksSyncToken !== null) {
+                    setTimeout(syncQuickTasks, EXTRACTED_TASKS_DELAY);
+                }
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
+        
+        if (!finished && !bubble) {
+            // Strumień zakończył się bez żadnego zdarzenia
+            throw new Error('Empty event stream');
+        }
+        hideTypingIndicator();
         
     } catch (error) {
         console.error('Error sending message:', error);
@@ -113,8 +206,53 @@ async function sendMessage() {
     }
 }
 
+// Odczyt strumienia Server-Sent Events z odpowiedzi fetch
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Zdarzenia SSE są oddzielone pustą linią
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
 // Dodawanie wiadomości do UI
 function addMessageToUI(message, isUser, isError = false) {
+    const messageDiv = createMessageElement(message, isUser, isError, getCurrentTime());
+    
+    chatMessages.appendChild(messageDiv);
+    scrollToBottom();
+    
+    return messageDiv.querySelector('.message-bubble');
+}
+
+// Tworzenie elementu wiadomości
+function createMessageElement(message, isUser, isError, time) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${isUser ? 'user' : 'mentor'}`;
     
@@ -137,7 +275,7 @@ function addMessageToUI(message, isUser, isError = false) {
     
     const timeDiv = document.createElement('div');
     timeDiv.className = 'message-time';
-    timeDiv.textContent = getCurrentTime();
+    timeDiv.textContent = time;
     
     contentDiv.appendChild(bubbleDiv);
     contentDiv.appendChild(timeDiv);
@@ -145,8 +283,7 @@ function addMessageToUI(message, isUser, isError = false) {
     messageDiv.appendChild(avatarDiv);
     messageDiv.appendChild(contentDiv);
     
-    chatMessages.appendChild(messageDiv);
-    scrollToBottom();
+    return messageDiv;
 }
 
 // Wskaźnik pisania
@@ -175,6 +312,14 @@ function getCurrentTime() {
     });
 }
 
+// Formatowanie znacznika czasu z serwera (UTC bez strefy)
+function formatTime(isoTimestamp) {
+    return new Date(isoTimestamp + 'Z').toLocaleTimeString('pl-PL', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+}
+
 // Wstawianie sugestii
 function insertSuggestion(suggestion) {
     messageInput.value = suggestion;
@@ -239,39 +384,76 @@ function toggleSidebar() {
 // Ładowanie szybkich zadań
 async function loadQuickTasks() {
     try {
-        const response = await fetch('/api/tasks');
-        const tasks = await response.json();
-        
-        const quickTasksDiv = document.getElementById('quickTasks');
-        quickTasksDiv.innerHTML = '';
-        
-        const incompleteTasks = tasks.filter(task => !task.is_completed).slice(0, 5);
-        
-        if (incompleteTasks.length === 0) {
-            quickTasksDiv.innerHTML = '<p>Brak aktywnych zadań</p>';
-            return;
-        }
+        // no-cache: przeglądarka wysyła If-None-Match i przy 304 używa swojej kopii
+        const response = await fetch('/api/tasks', { cache: 'no-cache' });
+        const data = await response.json();
         
-        incompleteTasks.forEach(task => {
-            const taskDiv = document.createElement('div');
-            taskDiv.className = 'quick-task';
-            taskDiv.innerHTML = `
-                <div class="task-content">
-                    <h4>${task.title}</h4>
-                    <p>${task.description || 'Brak opisu'}</p>
-                </div>
-                <button onclick="completeTask(${task.id})" class="complete-btn">
-                    <i class="fas fa-check"></i>
-                </button>
-            `;
-            quickTasksDiv.appendChild(taskDiv);
-        });
+        quickTasks = data.success ? data.tasks : [];
+        tasksSyncToken = data.success ? data.sync_token : null;
+        renderQuickTasks();
         
     } catch (error) {
         console.error('Error loading tasks:', error);
     }
 }
 
+// Po zmianie pobieramy tylko zmienione zadania zamiast całej listy
+async function syncQuickTasks() {
+    if (tasksSyncToken === null) {
+        return loadQuickTasks();
+    }
+    
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const response = await fetch(`/api/sync?since=${tasksSyncToken}&entities=tasks`);
+            const data = await response.json();
+            if (!data.success || data.reset) {
+                return loadQuickTasks();
+            }
+            const changedIds = new Set(data.changes.tasks.ids);
+            quickTasks = quickTasks.filter(task => !changedIds.has(task.id)).concat(data.changes.tasks.upserted);
+            tasksSyncToken = data.token;
+            hasMore = data.has_more;
+        }
+        quickTasks.sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id);
+        renderQuickTasks();
+    } catch (error) {
+        console.error('Error syncing tasks:', error);
+        loadQuickTasks();
+    }
+}
+
+function renderQuickTasks() {
+    const quickTasksDiv = document.getElementById('quickTasks');
+    quickTasksDiv.innerHTML = '';
+    
+    const incompleteTasks = quickTasks.filter(task => !task.is_completed).slice(0, 5);
+        
+    if (incompleteTasks.length === 0) {
+        quickTasksDiv.innerHTML = '<p>Brak aktywnych zadań</p>';
+        return;
+    }
+    
+    incompleteTasks.forEach(task => {
+        const taskDiv = document.createElement('div');
+        taskDiv.className = 'quick-task';
+        taskDiv.innerHTML = `
+            <div class="task-content">
+                <h4></h4>
+                <p></p>
+            </div>
+            <button onclick="completeTask(${task.id})" class="complete-btn">
+                <i class="fas fa-check"></i>
+            </button>
+        `;
+        // Tytuł i opis mogą pochodzić z odpowiedzi modelu - tylko jako tekst, nigdy jako HTML
+        taskDiv.querySelector('h4').textContent = task.title;
+        taskDiv.querySelector('p').textContent = task.description || 'Brak opisu';
+        quickTasksDiv.appendChild(taskDiv);
+    });
+}
+
 // Oznaczanie zadania jako ukończone
 async function completeTask(taskId) {
     try {
@@ -280,7 +462,7 @@ async function completeTask(taskId) {
         });
         
         if (response.ok) {
-            loadQuickTasks(); // Odśwież listę zadań
+            syncQuickTasks(); // Odśwież listę zadań
             showNotification('Zadanie ukończone!', 'success');
         }
     } catch (error) {
@@ -315,7 +497,7 @@ async function createTask(title, description = '') {
         });
         
         if (response.ok) {
-            loadQuickTasks();
+            syncQuickTasks();
             showNotification('Zadanie utworzone!', 'success');
         }
     } catch (error) {
@@ -4,6 +4,10 @@ let notes = [];
 let currentView = 'grid';
 let searchTerm = '';
 let selectedCategory = 'all';
+let searchResults = null;
+let searchTimer = null;
+let searchRequestId = 0;
+let syncToken = null;
 
 // Inicjalizacja notatek
 document.addEventListener('DOMContentLoaded', function() {
@@ -23,7 +27,7 @@ function setupEventListeners() {
     if (searchInput) {
         searchInput.addEventListener('input', (e) => {
             searchTerm = e.target.value.toLowerCase();
-            filterAndDisplayNotes();
+            scheduleSearch();
         });
     }
 
@@ -72,10 +76,13 @@ function setupEventListeners() {
     if (categoryFilter) {
         categoryFilter.addEventListener('change', (e) => {
             selectedCategory = e.target.value;
-            filterAndDisplayNotes();
+            if (searchTerm.trim()) {
+                runSearch();
+            } else {
+                filterAndDisplayNotes();
+            }
         });
     }
-    });
 
     // Licznik znaków
     const noteContent = document.getElementById('noteContent');
@@ -190,20 +197,51 @@ function updateNotesDisplay() {
 }
 
 function filterAndDisplayNotes() {
+    // Wyniki wyszukiwania pochodzą z serwera (FTS5) - już przefiltrowane
+    if (searchTerm.trim() && searchResults !== null) {
+        displayNotes(searchResults);
+        return;
+    }
+    
     let filteredNotes = notes.filter(note => {
-        const matchesSearch = searchTerm === '' || 
-            note.title.toLowerCase().includes(searchTerm) ||
-            note.content.toLowerCase().includes(searchTerm) ||
-            (note.tags && note.tags.some(tag => tag.toLowerCase().includes(searchTerm)));
-        
-        const matchesCategory = selectedCategory === 'all' || note.category === selectedCategory;
-        
-        return matchesSearch && matchesCategory;
+        return selectedCategory === 'all' || note.category === selectedCategory;
     });
     
     displayNotes(filteredNotes);
 }
 
+// Wyszukiwanie po stronie serwera z opóźnieniem (debounce)
+function scheduleSearch() {
+    clearTimeout(searchTimer);
+    if (!searchTerm.trim()) {
+        searchResults = null;
+        filterAndDisplayNotes();
+        return;
+    }
+    searchTimer = setTimeout(runSearch, 250);
+}
+
+function runSearch() {
+    const requestId = ++searchRequestId;
+    const params = new URLSearchParams({ q: searchTerm, limit: 50 });
+    if (selectedCategory !== 'all') {
+        params.set('category', selectedCategory);
+    }
+    
+    fetch(`/api/notes/search?${params}`)
+    .then(response => response.json())
+    .then(data => {
+        // Ignoruj odpowiedzi na nieaktualne zapytania
+        if (requestId !== searchRequestId) return;
+        searchResults = data.success ? data.notes : [];
+        filterAndDisplayNotes();
+    })
+    .catch(error => {
+        console.error('Error searching notes:', error);
+        showNotification('Błąd podczas wyszukiwania', 'error');
+    });
+}
+
 function displayNotes(notesToDisplay) {
     const notesGrid = document.getElementById('notesGrid');
     
@@ -237,6 +275,12 @@ function createNoteCard(note) {
     // Usuń formatowanie markdown z podglądu
     contentPreview = contentPreview.replace(/[*_#\[\]()]/g, '');
     
+    // Wynik wyszukiwania - fragment z podświetleniem (HTML escapowany przez serwer)
+    if (note.snippet !== undefined) {
+        contentPreview = note.snippet || '';
+    }
+    const noteTitle = note.title_highlight || note.title;
+    
     const tags = note.tags ? note.tags.split(',').map(tag => 
         `<span class="note-tag">${tag.trim()}</span>`
     ).join('') : '';
@@ -244,7 +288,7 @@ function createNoteCard(note) {
     return `
         <div class="note-card ${currentView === 'list' ? 'list-view' : ''}" onclick="openNoteModal(${note.id})">
             <div class="note-header">
-                <h3 class="note-title">${note.title}</h3>
+                <h3 class="note-title">${noteTitle}</h3>
                 <div class="note-actions">
                     <button class="note-btn edit" onclick="event.stopPropagation(); editNote(${note.id})" title="Edytuj">
                         <i class="fas fa-edit"></i>
@@ -346,7 +390,7 @@ function addNote(noteData) {
     .then(data => {
         if (data.success) {
             showNotification('Notatka została dodana!', 'success');
-            loadNotes();
+            syncNotes();
             closeModal();
         } else {
             showNotification('Błąd podczas dodawania notatki', 'error');
@@ -370,7 +414,7 @@ function updateNote(noteId, noteData) {
     .then(data => {
         if (data.success) {
             showNotification('Notatka została zaktualizowana!', 'success');
-            loadNotes();
+            syncNotes();
             closeModal();
         } else {
             showNotification('Błąd podczas aktualizacji notatki', 'error');
@@ -398,7 +442,7 @@ function deleteNote(noteId) {
     .then(data => {
         if (data.success) {
             showNotification('Notatka została usunięta!', 'success');
-            loadNotes();
+            syncNotes();
         } else {
             showNotification('Błąd podczas usuwania notatki', 'error');
         }
@@ -410,12 +454,13 @@ function deleteNote(noteId) {
 }
 
 function loadNotes() {
-    fetch('/api/notes')
+    // no-cache: przeglądarka wysyła If-None-Match i przy 304 używa swojej kopii
+    fetch('/api/notes', { cache: 'no-cache' })
     .then(response => response.json())
     .then(data => {
         notes = data.notes || [];
-        filterAndDisplayNotes();
-        updateNotesStats();
+        syncToken = data.success ? data.sync_token : null;
+        refreshNotesView();
     })
     .catch(error => {
         console.error('Error loading notes:', error);
@@ -423,6 +468,48 @@ function loadNotes() {
     });
 }
 
+function refreshNotesView() {
+    if (searchTerm.trim()) {
+        runSearch();
+    } else {
+        filterAndDisplayNotes();
+    }
+    updateNotesStats();
+}
+
+// Po zmianie pobieramy tylko zmienione notatki (i usunięte id), nie całą listę
+async function syncNotes() {
+    if (syncToken === null) {
+        return loadNotes();
+    }
+    
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const response = await fetch(`/api/sync?since=${syncToken}&entities=notes`);
+            const data = await response.json();
+            // Token zbyt stary (usunięcia już wyczyszczone) - pełne przeładowanie
+            if (!data.success || data.reset) {
+                return loadNotes();
+            }
+            applyNoteChanges(data.changes.notes);
+            syncToken = data.token;
+            hasMore = data.has_more;
+        }
+        refreshNotesView();
+    } catch (error) {
+        console.error('Error syncing notes:', error);
+        loadNotes();
+    }
+}
+
+function applyNoteChanges(changes) {
+    const changedIds = new Set(changes.ids);
+    notes = notes.filter(note => !changedIds.has(note.id)).concat(changes.upserted);
+    // Kolejność jak z /api/notes - ostatnio zmienione pierwsze
+    notes.sort((a, b) => b.updated_at.localeCompare(a.updated_at) || b.id - a.id);
+}
+
 function updateNotesStats() {
     const stats = {
         total: notes.length,
@@ -442,63 +529,48 @@ function updateNotesStats() {
 }
 
 function exportNotes() {
-    const exportData = {
-        exported_at: new Date().toISOString(),
-        total_notes: notes.length,
-        notes: notes
-    };
-    
-    const blob = new Blob([JSON.stringify(exportData, null, 2)], { type: 'application/json' });
-    const url = URL.createObjectURL(blob);
-    
+    // Eksport generuje serwer (NDJSON) - plik można potem zaimportować z powrotem
     const a = document.createElement('a');
-    a.href = url;
-    a.download = `notatki_${new Date().toISOString().split('T')[0]}.json`;
+    a.href = '/api/export/notes?format=ndjson';
+    a.download = `notatki_${new Date().toISOString().split('T')[0]}.ndjson`;
     document.body.appendChild(a);
     a.click();
     document.body.removeChild(a);
-    URL.revokeObjectURL(url);
     
-    showNotification('Notatki zostały wyeksportowane!', 'success');
+    showNotification('Eksport notatek rozpoczęty!', 'success');
 }
 
 function importNotes(file) {
-    const reader = new FileReader();
-    reader.onload = function(e) {
-        try {
-            const data = JSON.parse(e.target.result);
-            if (data.notes && Array.isArray(data.notes)) {
-                // Wyślij notatki do serwera
-                fetch('/api/notes/import', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ notes: data.notes })
-                })
-                .then(response => response.json())
-                .then(result => {
-                    if (result.success) {
-                        showNotification(`Zaimportowano ${result.imported} notatek!`, 'success');
-                        loadNotes();
-                    } else {
-                        showNotification('Błąd podczas importu notatek', 'error');
-                    }
-                });
-            } else {
-                showNotification('Nieprawidłowy format pliku', 'error');
-            }
-        } catch (error) {
-            showNotification('Błąd podczas odczytywania pliku', 'error');
+    // Plik trafia na serwer bez parsowania w przeglądarce - serwer czyta go strumieniowo
+    const isNdjson = /\.(ndjson|jsonl)$/i.test(file.name);
+    
+    fetch('/api/notes/import', {
+        method: 'POST',
+        headers: {
+            'Content-Type': isNdjson ? 'application/x-ndjson' : 'application/json',
+        },
+        body: file
+    })
+    .then(response => response.json())
+    .then(result => {
+        if (result.success) {
+            const skipped = result.skipped ? `, pominięto ${result.skipped} duplikatów` : '';
+            showNotification(`Zaimportowano ${result.imported} notatek${skipped}!`, 'success');
+            syncNotes();
+        } else {
+            showNotification(result.error || 'Błąd podczas importu notatek', 'error');
         }
-    };
-    reader.readAsText(file);
+    })
+    .catch(error => {
+        console.error('Error importing notes:', error);
+        showNotification('Błąd podczas odczytywania pliku', 'error');
+    });
 }
 
 function searchNotes(query) {
     searchTerm = query.toLowerCase();
     document.getElementById('notesSearch').value = query;
-    filterAndDisplayNotes();
+    scheduleSearch();
 }
 
 function showNotification(message, type = 'info') {
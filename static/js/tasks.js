@@ -3,6 +3,7 @@ let allTasks = [];
 let filteredTasks = [];
 let currentFilter = 'all';
 let currentView = 'list';
+let syncToken = null;
 
 // Inicjalizacja po załadowaniu strony
 document.addEventListener('DOMContentLoaded', function() {
@@ -39,12 +40,14 @@ function setupEventListeners() {
 // Ładowanie zadań z serwera
 async function loadTasks() {
     try {
-        const response = await fetch('/api/tasks');
+        // no-cache: przeglądarka wysyła If-None-Match i przy 304 używa swojej kopii
+        const response = await fetch('/api/tasks', { cache: 'no-cache' });
         if (!response.ok) throw new Error('Network response was not ok');
         
         const data = await response.json();
         if (data.success) {
             allTasks = data.tasks;
+            syncToken = data.sync_token;
         } else {
             allTasks = [];
         }
@@ -57,6 +60,43 @@ async function loadTasks() {
     }
 }
 
+// Po zmianie pobieramy tylko zmienione zadania (i usunięte id), nie całą listę
+async function syncTasks() {
+    if (syncToken === null) {
+        return loadTasks();
+    }
+    
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const response = await fetch(`/api/sync?since=${syncToken}&entities=tasks`);
+            if (!response.ok) throw new Error('Network response was not ok');
+            
+            const data = await response.json();
+            // Token zbyt stary (usunięcia już wyczyszczone) - pełne przeładowanie
+            if (!data.success || data.reset) {
+                return loadTasks();
+            }
+            applyTaskChanges(data.changes.tasks);
+            syncToken = data.token;
+            hasMore = data.has_more;
+        }
+        applyFilter();
+        updateStats();
+        renderTasks();
+    } catch (error) {
+        console.error('Error syncing tasks:', error);
+        loadTasks();
+    }
+}
+
+function applyTaskChanges(changes) {
+    const changedIds = new Set(changes.ids);
+    allTasks = allTasks.filter(task => !changedIds.has(task.id)).concat(changes.upserted);
+    // Kolejność jak z /api/tasks - najnowsze pierwsze
+    allTasks.sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id);
+}
+
 // Aktualizacja statystyk
 function updateStats() {
     const total = allTasks.length;
@@ -126,7 +166,7 @@ function createTaskElement(task) {
     
     taskDiv.innerHTML = `
         <div class="task-header">
-            <h3 class="task-title">${task.title}</h3>
+            <h3 class="task-title"></h3>
             <div class="task-actions-inline">
                 ${!task.is_completed ? `
                     <button class="task-btn complete" onclick="completeTask(${task.id})" title="Oznacz jako ukończone">
@@ -141,13 +181,18 @@ function createTaskElement(task) {
                 </button>
             </div>
         </div>
-        ${task.description ? `<p class="task-description">${task.description}</p>` : ''}
+        ${task.description ? '<p class="task-description"></p>' : ''}
         <div class="task-meta">
             <span class="task-priority ${priority}">${getPriorityLabel(priority)}</span>
             ${dueDate ? `<span>Termin: ${dueDate}</span>` : ''}
             <span>Utworzone: ${new Date(task.created_at).toLocaleDateString('pl-PL')}</span>
         </div>
     `;
+    // Tytuł i opis mogą pochodzić z odpowiedzi modelu - tylko jako tekst, nigdy jako HTML
+    taskDiv.querySelector('.task-title').textContent = task.title;
+    if (task.description) {
+        taskDiv.querySelector('.task-description').textContent = task.description;
+    }
     
     return taskDiv;
 }
@@ -212,7 +257,7 @@ async function createNewTask() {
         const result = await response.json();
         showNotification('Zadanie utworzone pomyślnie!', 'success');
         closeNewTaskModal();
-        loadTasks();
+        syncTasks();
         
     } catch (error) {
         console.error('Error creating task:', error);
@@ -230,7 +275,7 @@ async function completeTask(taskId) {
         if (!response.ok) throw new Error('Network response was not ok');
         
         showNotification('Zadanie ukończone!', 'success');
-        loadTasks();
+        syncTasks();
         
     } catch (error) {
         console.error('Error completing task:', error);
@@ -252,7 +297,7 @@ async function deleteTask(taskId) {
         if (!response.ok) throw new Error('Network response was not ok');
         
         showNotification('Zadanie usunięte', 'success');
-        loadTasks();
+        syncTasks();
         
     } catch (error) {
         console.error('Error deleting task:', error);
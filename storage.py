@@ -0,0 +1,213 @@
+"""Profil SQLite do serwowania wielowątkowego - WAL, pragmy na każdym połączeniu i zapis wsadowy w tle"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pragmy ustawiane na każdym nowym połączeniu (journal_mode=WAL jest trwały w pliku bazy,
+# pozostałe obowiązują tylko dla połączenia)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Czytelnicy nie blokują piszącego i odwrotnie
+    'synchronous': 'NORMAL',  # W trybie WAL fsync tylko przy checkpoincie - bez ryzyka uszkodzenia bazy
+    'busy_timeout': 5000,  # ms czekania na blokadę zamiast natychmiastowego "database is locked"
+    'cache_size': -65536,  # Ujemna wartość = KiB (64 MiB na połączenie)
+    'mmap_size': 268435456,  # 256 MiB odczytów przez mmap zamiast read()
+    'temp_store': 'MEMORY'
+}
+
+
+def is_sqlite_file(uri):
+    """Czy URI wskazuje plik SQLite (baza w pamięci ma własną pulę połączeń)"""
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') not in ('sqlite:', 'sqlite:/')
+
+
+def sqlite_engine_options(uri, pool_size=10, max_overflow=20, pool_timeout=30, busy_timeout=5000):
+    """SQLALCHEMY_ENGINE_OPTIONS dla pliku SQLite współdzielonego przez wątki serwera"""
+    if not is_sqlite_file(uri):
+        return {}
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        # Połączenia wracają do puli i są używane przez inne wątki
+        'connect_args': {'check_same_thread': False, 'timeout': busy_timeout / 1000}
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Ustawienie pragm na świeżym połączeniu (pomija inne bazy niż SQLite)"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+class WriteBehindQueue:
+    """Zapis w tle łączący elementy z wielu żądań w jedną transakcję (group commit).
+
+    `handler(items)` zapisuje całą partię w jednej transakcji i jest ponawiany
+    przy błędzie, więc nie może mieć skutków ubocznych poza tą transakcją.
+    Te uruchamia `after_write(result)` - raz, po udanym zapisie. Partia zbiera
+    się do `max_batch` elementów albo `max_delay` sekund od pierwszego.
+    Partia, której nie udało się zapisać, jest zapisywana element po elemencie,
+    a elementy nadal odrzucane - w `retry_rounds` kolejnych rundach z przerwą;
+    dopiero potem trafiają do logu błędów (i statystyki `failed`).
+    `flush()` czeka na zapis wszystkiego, co zgłoszono przed wywołaniem,
+    a `stop()` opróżnia kolejkę przed zamknięciem procesu.
+    """
+
+    def __init__(self, handler, max_batch=200, max_delay=0.05, max_pending=5000, retries=3, name='write-behind',
+                 after_write=None, retry_rounds=5, retry_delay=1.0):
+        self.handler = handler
+        self.after_write = after_write
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self.retry_rounds = retry_rounds
+        self.retry_delay = retry_delay
+        self.name = name
+        # Pełna kolejka blokuje zgłaszającego - pamięć nie rośnie bez ograniczeń
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._submitted = 0
+        self._done = 0
+        self._failed = 0
+        self._retried = 0
+        self._batches = 0
+        self._started = False
+        self._stopped = False
+        self._thread = None
+
+    def submit(self, item, block=True):
+        """Zgłoszenie elementu; block=False przy pełnej kolejce rzuca queue.Full zamiast czekać"""
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError(f"Kolejka {self.name} jest zatrzymana")
+            if not block and self._queue.full():
+                raise queue.Full
+            if not self._started:
+                self._started = True
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._submitted += 1
+        self._queue.put(item)
+
+    def flush(self, timeout=None):
+        """Czekanie na zapis elementów zgłoszonych do tej chwili; False gdy minął timeout"""
+        with self._lock:
+            target = self._submitted
+            return self._written.wait_for(lambda: self._done >= target, timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Zatrzymanie - zapisujemy to, co już zebrane, i kończymy
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _attempt(self, items):
+        """Zapis z ponowieniami i skutki uboczne po udanym zapisie; False gdy wszystkie próby zawiodły"""
+        for attempt in range(self.retries):
+            try:
+                result = self.handler(items)
+                break
+            except Exception as e:
+                logger.error(f"Błąd zapisu partii {self.name} ({len(items)} elementów, próba {attempt + 1}): {str(e)}")
+                time.sleep(0.1 * (attempt + 1))
+        else:
+            return False
+        if self.after_write is not None:
+            try:
+                self.after_write(result)
+            except Exception as e:
+                # Dane są już zapisane - błąd skutków ubocznych nie może powtórzyć zapisu
+                logger.error(f"Błąd po zapisie partii {self.name}: {str(e)}")
+        return True
+
+    def _write(self, batch):
+        """Zapis partii, a gdy cała zawiedzie - elementów po jednym; zwraca (zapisane, utracone)"""
+        if self._attempt(batch):
+            return len(batch), 0
+        if len(batch) == 1:
+            failed = batch
+        else:
+            # Jeden wadliwy element nie blokuje zapisu pozostałych
+            failed = [item for item in batch if not self._attempt([item])]
+        for step in range(self.retry_rounds):
+            if not failed:
+                break
+            # Baza może być chwilowo niedostępna (blokada, dysk) - kolejne rundy z rosnącą przerwą
+            with self._lock:
+                self._retried += len(failed)
+            time.sleep(self.retry_delay * (step + 1))
+            failed = [item for item in failed if not self._attempt([item])]
+        for item in failed:
+            logger.error(f"Kolejka {self.name} porzuca element po {self.retry_rounds + 1} rundach zapisu: {item!r}")
+        return len(batch) - len(failed), len(failed)
+
+    def _record(self, written, lost):
+        with self._lock:
+            self._done += written + lost
+            self._failed += lost
+            self._batches += 1
+            self._written.notify_all()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._record(*self._write(self._collect(item)))
+
+    def stop(self, timeout=30):
+        """Zapis zaległych elementów i zatrzymanie wątku (wywoływane przy zamykaniu procesu)"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            started = self._started
+        if not started:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Kolejka {self.name} nie zapisała zaległych elementów w {timeout}s")
+            return
+        # Elementy zgłoszone równolegle z zatrzymaniem (za znacznikiem końca)
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            self._record(*self._write(leftover))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._submitted - self._done,
+                'written': self._done - self._failed,
+                'failed': self._failed,
+                'retried': self._retried,
+                'batches': self._batches
+            }
@@ -0,0 +1,220 @@
+"""Wyciąganie zadań i terminów z odpowiedzi mentorów - heurystyki regex i opcjonalny model.
+
+Heurystyki są tanie i działają dla każdej wiadomości: jawne znaczniki
+("Zadanie:", "Do zrobienia:"), punkty listy pod nagłówkiem z takim
+znacznikiem oraz punkty listy z terminem ("do piątku", "jutro", "15.03").
+Model dostaje jedną wspólną prośbę dla całej partii wiadomości.
+"""
+import json
+import re
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+ExtractedTask = namedtuple('ExtractedTask', ['title', 'due_date', 'source'])
+
+MAX_TITLE_LENGTH = 200
+
+# Jawne znaczniki zadania w treści odpowiedzi (również jako nagłówek listy)
+TASK_MARKER = re.compile(
+    r'^(?:twoje\s+)?(?:zadani[ea]|do\s+zrobienia|todo|wyzwanie|plan\s+działania|następne\s+kroki|kolejne\s+kroki)'
+    r'(?:\s+na\s+[^:]{1,40})?\s*:\s*',
+    re.IGNORECASE
+)
+LIST_ITEM = re.compile(r'^\s*(?:[-*•]|\d{1,2}[.)])\s+')
+MARKDOWN = re.compile(r'[*_`]+')
+# Znaczniki HTML w odpowiedzi modelu - zadanie to zwykły tekst
+HTML_TAG = re.compile(r'<[^>]*>?')
+HIGH_PRIORITY = re.compile(r'\b(?:pilne|pilnie|koniecznie|najważniejsze|priorytet)\b', re.IGNORECASE)
+
+WEEKDAYS = {
+    'poniedział': 0, 'wtor': 1, 'środ': 2, 'czwart': 3, 'piąt': 4, 'sobot': 5, 'niedziel': 6
+}
+WEEKDAY_PATTERN = '|'.join(WEEKDAYS)
+UNITS = {'dzień': 1, 'dni': 1, 'tydzień': 7, 'tygodnie': 7, 'tygodni': 7}
+
+DUE_PATTERNS = [
+    ('iso', re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')),
+    ('dotted', re.compile(r'(?<![\d.,])(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?(?![\d,]|\.\d)')),
+    ('relative', re.compile(r'\bza\s+(\d{1,2}|jeden|dwa|trzy)\s+(dzień|dni|tydzień|tygodnie|tygodni)\b', re.IGNORECASE)),
+    ('weekday', re.compile(rf'\b(?:do|w|we|na)\s+({WEEKDAY_PATTERN})\w*', re.IGNORECASE)),
+    ('week_end', re.compile(r'\b(?:do\s+końca\s+tygodnia|w\s+tym\s+tygodniu)\b', re.IGNORECASE)),
+    ('day_after', re.compile(r'\bpojutrze\b', re.IGNORECASE)),
+    ('tomorrow', re.compile(r'\bjutr[oa]\b', re.IGNORECASE)),
+    ('today', re.compile(r'\b(?:dziś|dzisiaj)\b', re.IGNORECASE)),
+]
+NUMBER_WORDS = {'jeden': 1, 'dwa': 2, 'trzy': 3}
+# Liczba z kropką, po której stoi jednostka, to wielkość, a nie data ("1.5 litra", "2.50 zł")
+NUMBER_UNIT = re.compile(
+    r'\s*(?:%|(?:km|m|cm|kg|g|l|ml|h|min|s|zł|x|kcal|litr\w*|kilo\w*|godz\w*|minut\w*|sekund\w*|'
+    r'raz\w*|procent\w*|tys\w*|serii|seri[ae]|powtórze\w*)\b)',
+    re.IGNORECASE
+)
+# Godzina albo tempo przed liczbą z kropką ("o 7.30", "w tempie 5.30")
+TIME_PREFIX = re.compile(r'(?:\bo|\bod|\bgodz\.?|\bgodzin\w*|\btempi\w*)\s*$', re.IGNORECASE)
+
+
+def _end_of_day(day):
+    return datetime.combine(day, time(23, 59))
+
+
+def _dotted_date(text, pattern, today):
+    """Pierwsza data w formacie DD.MM albo DD.MM.RRRR - liczby dziesiętne, godziny i wielkości są pomijane"""
+    for match in pattern.finditer(text):
+        # Bez roku miesiąc ma dwie cyfry ("5.03"), a "1.5" to liczba
+        if not match[3] and len(match[2]) != 2:
+            continue
+        if NUMBER_UNIT.match(text, match.end()) or TIME_PREFIX.search(text, 0, match.start()):
+            continue
+        year = int(match[3]) if match[3] else today.year
+        try:
+            day = datetime(year, int(match[2]), int(match[1])).date()
+        except ValueError:
+            continue
+        # Data bez roku, która już minęła, dotyczy przyszłego roku
+        if not match[3] and day < today:
+            day = day.replace(year=year + 1)
+        return day
+    return None
+
+
+def parse_due_date(text, now):
+    """Termin z fragmentu tekstu względem chwili wysłania odpowiedzi (None gdy brak)"""
+    today = now.date()
+    for kind, pattern in DUE_PATTERNS:
+        if kind == 'dotted':
+            day = _dotted_date(text, pattern, today)
+            if day is not None:
+                return _end_of_day(day)
+            continue
+        match = pattern.search(text)
+        if not match:
+            continue
+        if kind == 'iso':
+            try:
+                return _end_of_day(datetime(int(match[1]), int(match[2]), int(match[3])).date())
+            except ValueError:
+                continue
+        if kind == 'relative':
+            count = NUMBER_WORDS.get(match[1].lower()) or int(match[1])
+            return _end_of_day(today + timedelta(days=count * UNITS[match[2].lower()]))
+        if kind == 'weekday':
+            weekday = next(value for prefix, value in WEEKDAYS.items() if match[1].lower().startswith(prefix))
+            return _end_of_day(today + timedelta(days=(weekday - today.weekday() - 1) % 7 + 1))
+        if kind == 'week_end':
+            return _end_of_day(today + timedelta(days=6 - today.weekday()))
+        if kind == 'day_after':
+            return _end_of_day(today + timedelta(days=2))
+        if kind == 'tomorrow':
+            return _end_of_day(today + timedelta(days=1))
+        if kind == 'today':
+            return _end_of_day(today)
+    return None
+
+
+def clean_title(text):
+    """Tytuł zadania: bez znaczników listy i markdown, z wielką literą, w limicie długości"""
+    title = MARKDOWN.sub('', HTML_TAG.sub(' ', LIST_ITEM.sub('', text))).strip().rstrip('.:;,!')
+    title = ' '.join(title.split())
+    if len(title) > MAX_TITLE_LENGTH:
+        title = title[:MAX_TITLE_LENGTH - 1].rsplit(' ', 1)[0] + '…'
+    return title[:1].upper() + title[1:]
+
+
+def task_key(title):
+    """Klucz do wykrywania powtórzeń tego samego zadania"""
+    return ' '.join(title.lower().split()).rstrip('.…')
+
+
+def extract_tasks(text, now):
+    """Zadania znalezione heurystykami w jednej odpowiedzi mentora"""
+    tasks = []
+    in_task_list = False
+    for raw_line in (text or '').splitlines():
+        line = ' '.join(MARKDOWN.sub('', HTML_TAG.sub(' ', raw_line)).split())
+        if not line:
+            continue
+        is_item = bool(LIST_ITEM.match(line))
+        marker = TASK_MARKER.match(LIST_ITEM.sub('', line))
+
+        if marker:
+            rest = LIST_ITEM.sub('', line)[marker.end():].strip()
+            # Sam nagłówek ("Twoje zadania na ten tydzień:") otwiera listę zadań
+            in_task_list = not rest
+            if rest:
+                tasks.append(ExtractedTask(clean_title(rest), parse_due_date(line, now), line))
+            continue
+
+        if is_item:
+            due_date = parse_due_date(line, now)
+            if in_task_list or due_date is not None:
+                tasks.append(ExtractedTask(clean_title(line), due_date, line))
+            continue
+        # Zwykły akapit kończy listę pod nagłówkiem
+        in_task_list = False
+
+    unique = {}
+    for task in tasks:
+        if len(task.title) >= 3:
+            unique.setdefault(task_key(task.title), task)
+    return list(unique.values())
+
+
+def task_priority(task, now):
+    """Wysoki priorytet dla pilnych zadań i terminów w ciągu dwóch dni"""
+    if HIGH_PRIORITY.search(task.source):
+        return 'high'
+    if task.due_date is not None and task.due_date - now <= timedelta(days=2):
+        return 'high'
+    return 'medium'
+
+
+def build_extraction_prompt(replies):
+    """Jedna prośba do modelu dla partii odpowiedzi - `replies` to lista (klucz, tekst)"""
+    parts = [
+        "Wypisz konkretne zadania do wykonania, które mentor zlecił użytkownikowi w poniższych odpowiedziach.",
+        "Pomiń ogólne rady. Odpowiedz wyłącznie tablicą JSON obiektów "
+        '{"message": <numer odpowiedzi>, "title": "<krótki tytuł zadania>", "due": "<RRRR-MM-DD albo null>"}. '
+        "Gdy zadań nie ma, odpowiedz [].",
+        ""
+    ]
+    for key, text in replies:
+        parts.append(f"### Odpowiedź {key}\n{text.strip()}")
+    return "\n".join(parts)
+
+
+def parse_extraction_response(text, keys, now):
+    """Zadania z odpowiedzi modelu pogrupowane po kluczu wiadomości (błędny JSON = brak zadań)"""
+    result = {key: [] for key in keys}
+    start, end = (text or '').find('['), (text or '').rfind(']')
+    if start < 0 or end <= start:
+        return result
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return result
+
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not isinstance(item.get('title'), str):
+            continue
+        try:
+            key = int(item.get('message'))
+        except (TypeError, ValueError):
+            continue
+        if key not in result:
+            continue
+        source = ' '.join(HTML_TAG.sub(' ', item['title']).split())
+        title = clean_title(source)
+        if len(title) < 3:
+            continue
+        due_date = parse_due_date(str(item['due']), now) if item.get('due') else None
+        result[key].append(ExtractedTask(title, due_date, source))
+    return result
+
+
+def merge_tasks(*groups):
+    """Połączenie wyników heurystyk i modelu bez powtórzeń (pierwszy wynik wygrywa)"""
+    unique = {}
+    for group in groups:
+        for task in group:
+            unique.setdefault(task_key(task.title), task)
+    return list(unique.values())
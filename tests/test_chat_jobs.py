@@ -0,0 +1,97 @@
+"""Testy kolejki zadań czatu - anulowanie i licznik zakończonych zadań"""
+import threading
+
+from chat_jobs import ChatJob, ChatJobQueue
+
+
+def blocking_queue():
+    started, release = threading.Event(), threading.Event()
+
+    def handler(job):
+        started.set()
+        release.wait(5)
+        return 'odpowiedź'
+
+    return ChatJobQueue(handler, max_workers=1), started, release
+
+
+def test_cancelled_running_job_is_finished_once_by_worker():
+    jobs, started, release = blocking_queue()
+    job = jobs.submit({})
+    assert started.wait(5)
+
+    jobs.cancel(job.id)
+    assert job.status == ChatJob.CANCELLED
+    assert job.finished_at is None
+    release.set()
+    jobs.shutdown(wait=True)
+
+    assert job.status == ChatJob.CANCELLED
+    assert job.result is None
+    assert job.finished_at is not None
+    assert jobs.stats()['completed'] == 1
+
+
+def test_cancelled_queued_job_counts_as_completed():
+    jobs, started, release = blocking_queue()
+    running = jobs.submit({})
+    assert started.wait(5)
+    queued = jobs.submit({})
+
+    jobs.cancel(queued.id)
+    assert queued.finished_at is not None
+    release.set()
+    jobs.shutdown(wait=True)
+
+    assert running.status == ChatJob.DONE
+    assert queued.status == ChatJob.CANCELLED
+    assert jobs.stats()['completed'] == 2
+
+
+def test_shutdown_without_wait_cancels_queued_jobs():
+    jobs, started, release = blocking_queue()
+    jobs.submit({})
+    assert started.wait(5)
+    queued = [jobs.submit({}) for _ in range(3)]
+
+    jobs.shutdown(wait=False)
+    release.set()
+
+    assert all(job.status == ChatJob.CANCELLED and job.finished_at for job in queued)
+    assert jobs.stats()['queued'] == 0
+
+
+def test_cancel_after_commit_does_not_discard_saved_result():
+    committed, release = threading.Event(), threading.Event()
+    saved = []
+
+    def handler(job):
+        if not jobs.commit(job):
+            return None
+        committed.set()
+        release.wait(5)
+        saved.append(job.id)
+        return 'odpowiedź'
+
+    jobs = ChatJobQueue(handler, max_workers=1)
+    job = jobs.submit({})
+    assert committed.wait(5)
+
+    assert jobs.cancel(job.id).status == ChatJob.RUNNING
+    release.set()
+    jobs.shutdown(wait=True)
+
+    assert saved == [job.id]
+    assert job.status == ChatJob.DONE
+    assert job.result == 'odpowiedź'
+
+
+def test_commit_fails_for_cancelled_job():
+    jobs, started, release = blocking_queue()
+    job = jobs.submit({})
+    assert started.wait(5)
+
+    jobs.cancel(job.id)
+    assert not jobs.commit(job)
+    release.set()
+    jobs.shutdown(wait=True)
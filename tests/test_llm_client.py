@@ -0,0 +1,48 @@
+"""Testy bezpiecznika klienta Ollama - co liczy się jako awaria modelu"""
+import time
+
+import pytest
+
+from llm_client import CircuitBreaker, LLMClient, LLMQueueTimeout
+
+
+class BrokenStream:
+    """Odpowiedź 200 urwana w połowie obiektu JSON"""
+
+    status_code = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        yield b'{"response": "Dzie'
+
+
+def test_queue_timeout_does_not_count_as_model_failure():
+    client = LLMClient('http://ollama.invalid', max_in_flight=1, failure_threshold=1)
+    payload = {'model': 'llama', 'prompt': 'Cześć'}
+    with client.slot('llama', client.deadline()):
+        for _ in range(3):
+            with pytest.raises(LLMQueueTimeout):
+                client.generate(payload, deadline=time.monotonic() + 0.05)
+
+    assert client.breaker('llama').snapshot() == {'state': 'closed', 'failures': 0, 'retry_in': None}
+
+
+def test_broken_stream_settles_half_open_probe():
+    client = LLMClient('http://ollama.invalid', failure_threshold=1, reset_timeout=0)
+    client.session.post = lambda *args, **kwargs: BrokenStream()
+    breaker = client.breaker('llama')
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(ValueError):
+        list(client.stream({'model': 'llama', 'prompt': 'Cześć'}))
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.probe_in_flight
+    # Kolejna próba jest możliwa - bezpiecznik nie utknął w half_open
+    breaker.before_call('llama')
@@ -0,0 +1,35 @@
+"""Testy monitora modeli - rozgrzewanie nie wstrzymuje odpytywania Ollama"""
+import threading
+import time
+
+from model_monitor import ModelMonitor
+
+
+class SlowOllama:
+    def __init__(self):
+        self.loading = threading.Event()
+        self.release = threading.Event()
+        self.checks = 0
+
+    def list_models(self, timeout):
+        self.checks += 1
+        return ['llama3.2:latest']
+
+    def warm_up(self, model, keep_alive):
+        self.loading.set()
+        self.release.wait(5)
+
+
+def test_health_poll_continues_while_model_loads():
+    ollama = SlowOllama()
+    monitor = ModelMonitor(ollama, ['llama3.2'], interval=0.02)
+    monitor.ensure_started()
+    try:
+        assert ollama.loading.wait(5)
+        checks = ollama.checks
+        time.sleep(0.2)
+        assert ollama.checks > checks
+        assert monitor.snapshot()['warmed_models'] == []
+    finally:
+        ollama.release.set()
+        monitor.stop()
@@ -0,0 +1,67 @@
+"""Testy zapisu w tle - skutki uboczne raz po zapisie, bez dublowania i gubienia elementów"""
+from storage import WriteBehindQueue
+
+
+def make_queue(handler, after_write=None):
+    return WriteBehindQueue(handler, max_batch=10, max_delay=0.01, after_write=after_write,
+                            retry_rounds=2, retry_delay=0.01, name='test')
+
+
+def test_after_write_runs_once_and_its_error_does_not_repeat_write():
+    written, calls = [], []
+
+    def handler(items):
+        written.extend(items)
+        return list(items)
+
+    def after_write(result):
+        calls.append(result)
+        raise RuntimeError('kolejka podsumowań pełna')
+
+    log = make_queue(handler, after_write)
+    for item in range(3):
+        log.submit(item)
+    assert log.flush(timeout=5)
+    log.stop()
+
+    assert sorted(written) == [0, 1, 2]
+    assert sorted(item for result in calls for item in result) == [0, 1, 2]
+    assert log.stats()['failed'] == 0
+
+
+def test_failed_batch_is_written_item_by_item():
+    written = []
+
+    def handler(items):
+        if 'zły' in items:
+            raise ValueError('odrzucony element')
+        written.extend(items)
+
+    log = make_queue(handler)
+    for item in ('a', 'zły', 'b'):
+        log.submit(item)
+    assert log.flush(timeout=10)
+    log.stop()
+
+    assert sorted(written) == ['a', 'b']
+    stats = log.stats()
+    assert stats['written'] == 2
+    assert stats['failed'] == 1
+
+
+def test_transient_failure_is_retried_until_written():
+    written = []
+    failures = iter(range(4))
+
+    def handler(items):
+        if next(failures, None) is not None:
+            raise RuntimeError('database is locked')
+        written.extend(items)
+
+    log = make_queue(handler)
+    log.submit('wiadomość')
+    assert log.flush(timeout=10)
+    log.stop()
+
+    assert written == ['wiadomość']
+    assert log.stats()['failed'] == 0
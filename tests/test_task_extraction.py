@@ -0,0 +1,98 @@
+"""Testy wyciągania zadań i terminów z odpowiedzi mentorów"""
+from datetime import datetime
+
+import pytest
+
+from task_extraction import extract_tasks, parse_due_date, parse_extraction_response
+
+# Niedziela, 18 października 2026
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Wyślij CV do 2026-11-02', datetime(2026, 11, 2, 23, 59)),
+    ('Wyślij CV do 15.03', datetime(2027, 3, 15, 23, 59)),
+    ('Raport na 3.11', datetime(2026, 11, 3, 23, 59)),
+    ('Spotkanie 05.11.2026 o 7.30', datetime(2026, 11, 5, 23, 59)),
+    ('Zrób to jutro', datetime(2026, 10, 19, 23, 59)),
+    ('Zadzwoń pojutrze', datetime(2026, 10, 20, 23, 59)),
+    ('Skończ do piątku', datetime(2026, 10, 23, 23, 59)),
+    ('Przeczytaj rozdział za 2 dni', datetime(2026, 10, 20, 23, 59)),
+    ('Posprzątaj biurko do końca tygodnia', datetime(2026, 10, 18, 23, 59)),
+])
+def test_parse_due_date(text, expected):
+    assert parse_due_date(text, NOW) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'Pij 1.5 litra wody dziennie',
+    'Biegaj 2.5 km w tempie 5.30',
+    'Wstań o 7.30',
+    'Odłóż 2.50 zł dziennie',
+    'Zrób 3.12 serii',
+    'Termin 31.02',
+    'Wersja 1.2.3 aplikacji',
+    'Bez żadnego terminu',
+])
+def test_parse_due_date_ignores_numbers_that_are_not_dates(text):
+    assert parse_due_date(text, NOW) is None
+
+
+def test_extract_tasks_from_marker_and_list_with_due_dates():
+    reply = (
+        "Świetnie Ci idzie!\n"
+        "Zadanie: Zapisz trzy cele na **jutro**.\n"
+        "\n"
+        "Twoje zadania na ten tydzień:\n"
+        "- Przejdź 10 tysięcy kroków\n"
+        "- Przeczytaj rozdział książki\n"
+        "\n"
+        "Pamiętaj o odpoczynku.\n"
+        "- Wyślij CV do 15.03\n"
+    )
+    tasks = extract_tasks(reply, NOW)
+    assert [task.title for task in tasks] == [
+        'Zapisz trzy cele na jutro', 'Przejdź 10 tysięcy kroków', 'Przeczytaj rozdział książki', 'Wyślij CV do 15.03'
+    ]
+    assert tasks[0].due_date == datetime(2026, 10, 19, 23, 59)
+    assert tasks[1].due_date is None
+    assert tasks[3].due_date == datetime(2027, 3, 15, 23, 59)
+
+
+@pytest.mark.parametrize('reply', [
+    '- Pij 1.5 litra wody dziennie',
+    '- Biegaj 2.5 km w tempie 5.30',
+    '- Wstawaj o 6.45 i medytuj',
+    'Jutro będzie lepiej, trzymaj się.',
+    '- Regularny sen\n- Zdrowa dieta',
+])
+def test_extract_tasks_ignores_ordinary_advice(reply):
+    assert extract_tasks(reply, NOW) == []
+
+
+def test_extract_tasks_deduplicates_titles():
+    reply = "Zadanie: Napisz plan\n- Napisz plan jutro\nZadanie: napisz  plan"
+    assert [task.title for task in extract_tasks(reply, NOW)] == ['Napisz plan', 'Napisz plan jutro']
+
+
+def test_extract_tasks_strips_markup():
+    tasks = extract_tasks('- Rozciągaj się <img src=x onerror=alert(1)> jutro', NOW)
+    assert [task.title for task in tasks] == ['Rozciągaj się jutro']
+    assert '<' not in tasks[0].source
+
+
+def test_parse_extraction_response_strips_markup_and_skips_invalid_items():
+    text = (
+        'Oto zadania: [{"message": 1, "title": "<b>Pisz</b> dziennik", "due": "2026-10-20"},'
+        ' {"message": 7, "title": "Nieznana wiadomość"}, {"message": 2, "title": 5}, "tekst"]'
+    )
+    result = parse_extraction_response(text, [1, 2], NOW)
+    assert result[2] == []
+    assert [(task.title, task.due_date, task.source) for task in result[1]] == [
+        ('Pisz dziennik', datetime(2026, 10, 20, 23, 59), 'Pisz dziennik')
+    ]
+
+
+def test_parse_extraction_response_with_invalid_json():
+    assert parse_extraction_response('nie wiem', [1], NOW) == {1: []}
+    assert parse_extraction_response('[{"message": 1,', [1], NOW) == {1: []}
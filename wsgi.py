@@ -0,0 +1,22 @@
+"""Punkt wejścia dla zewnętrznych serwerów WSGI (np. gunicorn wsgi:app).
+
+Schemat bazy tworzy się raz przed startem serwera: flask --app wsgi init-db
+"""
+import logging
+import os
+
+from app import SETTINGS, create_app, start_worker
+
+logger = logging.getLogger(__name__)
+
+overrides = {}
+# Indeks semantyczny to pliki mapowane w pamięci jednego procesu - jak w server.py, tylko dla jednego workera
+if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+    if SETTINGS['RETRIEVAL_ENABLED']:
+        logger.warning("Wyszukiwanie semantyczne wyłączone - wymaga jednego procesu (WEB_CONCURRENCY=1)")
+    overrides['RETRIEVAL_ENABLED'] = False
+
+app = create_app(overrides)
+# Monitor modeli i indeks startują przy imporcie w każdym workerze - przy preload_app wątki procesu
+# nadrzędnego nie przeżyłyby fork(), wtedy start_worker() trzeba wywołać w post_fork (jak server.py)
+start_worker(run_backlog=False)